@@ -5,7 +5,7 @@ import mimetypes
 from datetime import timedelta
 
 from dotenv import load_dotenv
-from flask import Flask, g, jsonify, request
+from flask import Flask, g, jsonify, request, session
 from flask_cors import CORS
 from flask_wtf.csrf import CSRFError
 from werkzeug.exceptions import HTTPException
@@ -13,9 +13,12 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 
 import database
 from extensions import csrf, limiter
+from utils.db_profiler import current_request_profile, finish_request_profile, start_request_profile
+from utils.env import env_int
 from utils.errors import AppError
 from utils.logging_config import configure_logging
 from utils.security import validate_request_input
+from utils.serialization import MongoJSONProvider
 
 
 logger = logging.getLogger(__name__)
@@ -37,13 +40,6 @@ BLUEPRINT_IMPORTS = (
 )
 
 
-def _env_int(name, default):
-    try:
-        return int(os.environ.get(name, default))
-    except (TypeError, ValueError):
-        return default
-
-
 def _env_bool(name, default=False):
     value = os.environ.get(name)
     if value is None:
@@ -51,6 +47,16 @@ def _env_bool(name, default=False):
     return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 
+def _server_timing_allowed(app):
+    """Server-Timing 會透露查詢次數與耗時；預設只給已登入的管理員，SERVER_TIMING_ENABLED 開啟時才對所有人送出。"""
+    if app.config.get('SERVER_TIMING_ENABLED'):
+        return True
+    # 只在後台與 API 路徑讀 session，避免靜態檔因讀取 session 多出 Vary: Cookie
+    if request.path != '/admin' and not request.path.startswith('/api/'):
+        return False
+    return app.config['SESSION_COOKIE_NAME'] in request.cookies and 'admin_logged_in' in session
+
+
 def _set_default_header(response, name, value):
     if name not in response.headers:
         response.headers[name] = value
@@ -103,8 +109,9 @@ def create_app():
     load_dotenv()
     configure_logging()
     app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
 
-    slow_request_ms = _env_int('SLOW_REQUEST_MS', 750)
+    slow_request_ms = env_int('SLOW_REQUEST_MS', 750)
     is_production = os.environ.get('RENDER') is not None
     if is_production or _env_bool('TRUST_PROXY_HEADERS', False):
         app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
@@ -139,26 +146,43 @@ def create_app():
     @app.before_request
     def start_request_timer():
         g.request_started_at = time.perf_counter()
+        g.db_profile_token = start_request_profile()
         return validate_request_input()
 
+    @app.teardown_request
+    def stop_db_profile(error=None):
+        token = g.pop('db_profile_token', None)
+        if token is not None:
+            try:
+                finish_request_profile(token)
+            except ValueError:
+                pass
+
     @app.after_request
     def add_response_headers(response):
         started_at = getattr(g, 'request_started_at', None)
         if started_at is not None:
             elapsed_ms = (time.perf_counter() - started_at) * 1000
             response.headers['X-Response-Time'] = f'{elapsed_ms:.1f}ms'
+            # 本次請求的 MongoDB 指令數與耗時，方便在瀏覽器 DevTools 直接看出 N+1 查詢
+            db_profile = current_request_profile()
+            if _server_timing_allowed(app):
+                server_timing = [f'app;dur={elapsed_ms:.1f}']
+                if db_profile is not None:
+                    server_timing.append(db_profile.server_timing())
+                response.headers.add('Server-Timing', ', '.join(server_timing))
             if elapsed_ms >= slow_request_ms:
-                logger.warning(
-                    "Slow request",
-                    extra={
-                        "event": "slow_request",
-                        "method": request.method,
-                        "path": request.path,
-                        "status_code": response.status_code,
-                        "elapsed_ms": round(elapsed_ms, 1),
-                        "remote_addr": request.remote_addr,
-                    },
-                )
+                extra = {
+                    "event": "slow_request",
+                    "method": request.method,
+                    "path": request.path,
+                    "status_code": response.status_code,
+                    "elapsed_ms": round(elapsed_ms, 1),
+                    "remote_addr": request.remote_addr,
+                }
+                if db_profile is not None:
+                    extra.update(db_profile.log_fields())
+                logger.warning("Slow request", extra=extra)
 
         for name, value in secure_headers.items():
             _set_default_header(response, name, value)
@@ -179,8 +203,8 @@ def create_app():
     app.config['SESSION_COOKIE_SECURE'] = is_production
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-    app.config['MAX_CONTENT_LENGTH'] = _env_int('MAX_CONTENT_LENGTH', 1_000_000)
-    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = _env_int(
+    app.config['MAX_CONTENT_LENGTH'] = env_int('MAX_CONTENT_LENGTH', 1_000_000)
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = env_int(
         'STATIC_CACHE_SECONDS',
         31536000 if is_production else 0,
     )
@@ -198,6 +222,7 @@ def create_app():
     app.config['LINE_CALLBACK_URL'] = os.environ.get('LINE_CALLBACK_URL')
     app.config['ADMIN_PASSWORD_HASH'] = os.environ.get('ADMIN_PASSWORD_HASH')
     app.config['ALLOW_LEGACY_ADMIN'] = _env_bool('ALLOW_LEGACY_ADMIN', False)
+    app.config['SERVER_TIMING_ENABLED'] = _env_bool('SERVER_TIMING_ENABLED', False)
     ratelimit_storage_uri = (
         os.environ.get('RATELIMIT_STORAGE_URI')
         or os.environ.get('REDIS_URL')
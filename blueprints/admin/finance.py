@@ -1,11 +1,15 @@
-from flask import Blueprint, jsonify, request
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from datetime import date
+
+from flask import Blueprint, jsonify, request, session
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 from services.finance_service import (
     get_finance_pending as get_finance_pending_service,
     get_finance_summary as get_finance_summary_service,
 )
+from services.reconciliation_service import STATEMENT_ENCODINGS, reconcile_statement
 from utils.decorators import admin_required
+from utils.errors import ValidationError
 from utils.validation import validate_payload
 
 
@@ -28,10 +32,46 @@ class FinancePendingQuerySchema(BaseModel):
 
 
 class FinanceSummaryQuerySchema(BaseModel):
-    """目前 summary 無查詢參數，保留 Schema 讓 Controller 結構一致。"""
+    """可選的台北日期區間（YYYY-MM-DD，含迄日）；都不給時統計全部訂單。"""
 
     model_config = ConfigDict(extra="ignore")
 
+    start_date: date | None = None
+    end_date: date | None = None
+
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
+    def empty_date_as_none(cls, value):
+        if value == "":
+            return None
+        return value
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValueError("end_date must be greater than or equal to start_date")
+        return self
+
+
+class ReconcileFormSchema(BaseModel):
+    """multipart 表單欄位；欄位名稱留空時依常見銀行表頭自動辨識。"""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    encoding: str = Field(default="utf-8-sig", max_length=20)
+    confirm: bool = False
+    amountColumn: str = Field(default="", max_length=40)
+    accountColumn: str = Field(default="", max_length=40)
+    memoColumn: str = Field(default="", max_length=40)
+    dateColumn: str = Field(default="", max_length=40)
+
+    @field_validator("encoding")
+    @classmethod
+    def check_encoding(cls, value):
+        if value not in STATEMENT_ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(STATEMENT_ENCODINGS)}")
+        return value
+
 
 @admin_finance_bp.route("/api/admin/finance/pending")
 @admin_required(roles=["super_admin", "finance"])
@@ -46,6 +86,30 @@ def get_finance_pending():
 @admin_required(roles=["super_admin", "finance"])
 def get_finance_summary():
     """Controller 只負責 API 邊界，不直接寫 aggregation。"""
-    validate_payload(FinanceSummaryQuerySchema, request.args.to_dict(flat=True))
-    summary = get_finance_summary_service()
+    query = validate_payload(FinanceSummaryQuerySchema, request.args.to_dict(flat=True))
+    summary = get_finance_summary_service(start_date=query.start_date, end_date=query.end_date)
     return jsonify(summary)
+
+
+@admin_finance_bp.route("/api/admin/finance/reconcile", methods=["POST"])
+@admin_required(roles=["super_admin", "finance"])
+def reconcile_bank_statement():
+    """上傳銀行明細 CSV 與待收款訂單對帳；confirm=true 時唯一命中的訂單直接走批次確認收款。"""
+    form = validate_payload(ReconcileFormSchema, request.form.to_dict(flat=True))
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        raise ValidationError("請上傳銀行明細 CSV 檔")
+    columns = {
+        "amount": form.amountColumn,
+        "account": form.accountColumn,
+        "memo": form.memoColumn,
+        "date": form.dateColumn,
+    }
+    result = reconcile_statement(
+        upload.stream,
+        encoding=form.encoding,
+        columns=columns,
+        confirm=form.confirm,
+        admin_user=session.get("admin_username", "admin"),
+    )
+    return jsonify(result)
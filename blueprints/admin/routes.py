@@ -1,11 +1,8 @@
-import csv
-import io
 import logging
 from datetime import datetime, timedelta
 
-from bson import ObjectId
-from flask import Blueprint, Response, jsonify, request, session
-from pymongo import UpdateOne
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
 from werkzeug.security import generate_password_hash
 
@@ -14,13 +11,36 @@ from repositories.committee_quota_repository import (
     release_committee_quota_for_order,
     sync_committee_quota_usages,
 )
+from repositories.export_job_repository import find_export_job, open_export_download
+from repositories.finance_rollup_repository import mark_finance_days_dirty
+from repositories.fund_total_repository import record_fund_order_change
+from repositories.member_repository import record_member_feedback, record_member_orders
+from services.cache_service import FEEDBACK_CACHE, bump_version
 from services.committee_service import get_default_committee_roles, merge_committee_roles
-from utils.decorators import admin_required
+from services.export_service import (
+    EXPORT_JOB_ROLES,
+    EXPORT_KINDS,
+    expire_stale_export_job,
+    export_kind_allowed,
+    history_export_filename,
+    iter_history_csv,
+    parse_donation_report_params,
+    serialize_export_job,
+)
+from services.member_service import fetch_members_page
+from services.user_summary_service import (
+    refresh_summary_for_removed_feedback,
+    refresh_summary_for_removed_order,
+)
+from tasks.exports import submit_export_job
+from utils.decorators import admin_required, current_admin_permissions
 from utils.helpers import get_object_id
+from utils.search_tokens import feedback_search_tokens, order_search_tokens
 from utils.security import as_string, get_json_object, get_json_value, safe_regex_contains
-from utils.timezone import format_taipei, taipei_date_range_query, taipei_now, utc_now
+from utils.serialization import taipei_text, to_jsonable
+from utils.timezone import taipei_date_range_query, taipei_now, utc_now
 # 記得在檔案最上方引入我們剛剛寫的 Service
-from services.history_service import fetch_history_data
+from services.history_service import fetch_history_cursor_page, fetch_history_data
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -32,36 +52,9 @@ logger = logging.getLogger(__name__)
 # 工具函式
 # =========================================================
 
-def _serialize_doc(obj):
-    """強化版遞迴序列化：把所有不認識的物件強制轉字串"""
-    if isinstance(obj, dict):
-        return {k: _serialize_doc(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_serialize_doc(v) for v in obj]
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    # 🛡️ 終極防線：如果不是基本 JSON 支援的型別，一律暴力轉成字串！
-    # 這樣 jsonify 絕對不可能再因為型別錯誤而崩潰
-    if not isinstance(obj, (int, float, str, bool, type(None))):
-        return str(obj)
-    return obj
-
-
-def _safe_csv_cell(value):
-    if value is None:
-        text = ''
-    else:
-        text = str(value)
-    if text.lstrip()[:1] in ('=', '+', '-', '@'):
-        return "'" + text
-    return text
-
-
 def _tw_time(dt):
     """UTC datetime → 台灣時間字串（相容 legacy 字串資料）"""
-    return format_taipei(dt)
+    return taipei_text(dt)
 
 
 def _get_sort_ts(dt):
@@ -278,6 +271,21 @@ def get_data_history():
         page = 1
         per_page = 50
 
+    # cursor 模式：深頁不再 $skip + 全量 $count，總數改為選填的快取估計值
+    cursor = as_string(request.args.get('cursor')).strip()
+    if cursor or request.args.get('paging') == 'cursor':
+        with_total = as_string(request.args.get('with_total')).strip() in ('1', 'true')
+        results, next_cursor, total = fetch_history_cursor_page(
+            order_type, order_id, name, status, start, end, cursor, per_page, with_total
+        )
+        return jsonify({
+            "results": results,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "total": total,
+        })
+
     # 核心邏輯交給 Service 處理
     results, total = fetch_history_data(
         order_type, order_id, name, status, start, end, page, per_page
@@ -334,137 +342,144 @@ def mark_donations_reported():
 # =========================================================
 
 
+def _history_export_filters(source):
+    """解析匯出篩選條件；回傳 (filters, error_message)。"""
+    filters = {
+        "order_type": as_string(source.get('type')).strip(),
+        "order_id": as_string(source.get('orderId')).strip(),
+        "name": as_string(source.get('name')).strip(),
+        "status": as_string(source.get('status')).strip(),
+        "start": as_string(source.get('start')).strip(),
+        "end": as_string(source.get('end')).strip(),
+    }
+    if filters["order_type"] and filters["order_type"] not in VALID_HISTORY_TYPES:
+        return None, "不支援的查詢類型"
+    if filters["status"] and filters["status"] not in VALID_STATUSES:
+        return None, "不支援的狀態"
+    return filters, None
+
+
 @admin_bp.route('/api/admin/data/export-csv')
 @admin_required(roles=['super_admin', 'data', 'finance'])
 def export_data_csv():
-    """匯出歷史資料為 CSV (所見即所得)"""
+    """匯出歷史資料為 CSV (所見即所得)；以 cursor 串流輸出，不設筆數上限。"""
     if database.db is None:
         return jsonify({"error": "資料庫未連線"}), 500
 
-    order_type = as_string(request.args.get('type')).strip()
-    order_id = as_string(request.args.get('orderId')).strip()
-    if order_type and order_type not in VALID_HISTORY_TYPES:
-        return jsonify({"error": "不支援的查詢類型"}), 400
-    status = as_string(request.args.get('status')).strip()
-    if status and status not in VALID_STATUSES:
-        return jsonify({"error": "不支援的狀態"}), 400
-    name = as_string(request.args.get('name')).strip()
-    start = as_string(request.args.get('start')).strip()
-    end = as_string(request.args.get('end')).strip()
-    results, _total = fetch_history_data(
-        order_type, order_id, name, status, start, end, 1, 5000
+    filters, error = _history_export_filters(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return Response(
+        stream_with_context(iter_history_csv(filters)),
+        mimetype='text/csv; charset=utf-8',
+        headers={"Content-Disposition": f"attachment; filename={history_export_filename()}"}
     )
 
-    si = io.StringIO()
-    si.write('\ufeff')  # BOM for Excel
-    writer = csv.writer(si, lineterminator='\n')
-    writer.writerow(['資料類型', '單號', '類型', '狀態', '姓名', '電話', 'Email', '地址', '項目/內容', '金額', '建立日期', '付款/核准日期'])
-
-    for doc in results:
-        is_feedback = doc.get('orderType') == 'feedback'
-        cust = doc.get('customer', {})
-        if is_feedback:
-            data_type = '回饋'
-            type_label = _TYPE_LABELS['feedback']
-            name_text = doc.get('realName') or doc.get('nickname') or cust.get('name', '')
-            phone = doc.get('phone', '')
-            email = doc.get('email', '')
-            address = doc.get('address', '')
-            items_str = doc.get('content', '')
-            amount = '0'
-            settled_at = doc.get('approvedAt') or doc.get('sentAt') or ''
-        else:
-            data_type = '訂單'
-            type_label = _TYPE_LABELS.get(doc.get('orderType', ''), '')
-            name_text = cust.get('name', '')
-            phone = cust.get('phone', '')
-            email = cust.get('email', '')
-            address = cust.get('address', '')
-            items_str = '；'.join([
-                f"{i.get('name', '')}{'('+i.get('variantName', '')+')' if i.get('variantName') else ''}x{i.get('qty', 1)}"
-                for i in doc.get('items', [])
-            ])
-            amount = str(doc.get('total', 0))
-            settled_at = doc.get('paidAt', '')
-        row = [
-            data_type,
-            doc.get('orderId', ''),
-            type_label,
-            doc.get('status', ''),
-            name_text,
-            phone,
-            email,
-            address,
-            items_str,
-            amount,
-            doc.get('createdAt', ''),
-            settled_at,
-        ]
-        writer.writerow([_safe_csv_cell(value) for value in row])
+
+def _export_job_params(kind, source):
+    """依匯出種類解析參數；回傳 (params, error_message)。"""
+    if kind == "history_csv":
+        return _history_export_filters(source)
+    if kind == "donations_txt":
+        return parse_donation_report_params(source)
+    return {}, None
+
+
+@admin_bp.route('/api/admin/data/export-jobs', methods=['POST'])
+@admin_required(roles=EXPORT_JOB_ROLES)
+def create_export_job():
+    """大範圍匯出改走背景任務，前端輪詢進度，完成後再以 job id 下載。"""
+    if database.db is None:
+        return jsonify({"error": "資料庫未連線"}), 500
+
+    data = get_json_object()
+    kind = as_string(data.get('kind'), 'history_csv') or 'history_csv'
+    if kind not in EXPORT_KINDS:
+        return jsonify({"error": "不支援的匯出類型"}), 400
+    if not export_kind_allowed(kind, current_admin_permissions()):
+        return jsonify({"error": "權限不足，您的角色無法執行此操作"}), 403
+
+    params, error = _export_job_params(kind, data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    admin_name = session.get('admin_username', 'admin')
+    try:
+        job = submit_export_job(kind, params, admin_name)
+    except Exception:
+        return jsonify({"error": "背景匯出排程失敗，請稍後再試"}), 503
+
+    database.write_audit_log(admin_name, '建立匯出任務', str(job["_id"]), job["kind"])
+    return jsonify(serialize_export_job(job)), 202
+
+
+def _find_allowed_export_job(job_id):
+    """回傳 (job, error_response)；角色不符的任務一律視為找不到。"""
+    job = find_export_job(job_id)
+    if not job or not export_kind_allowed(job.get("kind"), current_admin_permissions()):
+        return None, (jsonify({"error": "找不到匯出任務"}), 404)
+    return job, None
+
+
+@admin_bp.route('/api/admin/data/export-jobs/<job_id>')
+@admin_required(roles=EXPORT_JOB_ROLES)
+def get_export_job(job_id):
+    job, error = _find_allowed_export_job(job_id)
+    if error:
+        return error
+    return jsonify(serialize_export_job(expire_stale_export_job(job)))
+
+
+@admin_bp.route('/api/admin/data/export-jobs/<job_id>/download')
+@admin_required(roles=EXPORT_JOB_ROLES)
+def download_export_job(job_id):
+    job, error = _find_allowed_export_job(job_id)
+    if error:
+        return error
+    if job.get("status") != "done" or not job.get("fileId"):
+        return jsonify({"error": "匯出尚未完成"}), 409
+
+    stream = open_export_download(job["fileId"])
+    if stream is None:
+        return jsonify({"error": "匯出檔案已不存在"}), 410
+
+    def generate():
+        with stream:
+            while True:
+                chunk = stream.readchunk()
+                if not chunk:
+                    break
+                yield chunk
 
     return Response(
-        si.getvalue(),
-        mimetype='text/csv; charset=utf-8',
-        headers={"Content-Disposition": f"attachment; filename=export_{taipei_now().strftime('%Y%m%d')}.csv"}
+        generate(),
+        mimetype=EXPORT_KINDS[job["kind"]]["mimetype"],
+        headers={"Content-Disposition": f"attachment; filename={job.get('filename') or 'export'}"}
     )
 
 
 @admin_bp.route('/api/admin/data/members')
 @admin_required(roles=['super_admin', 'data', 'finance'])
 def get_data_members():
-    """會員資料庫 — 效能極致優化版 (解決 OOM 問題)"""
+    """會員資料庫：keyset 分頁 + 前綴搜尋，訂單/回饋數讀 users 上的計數欄位。"""
     if database.db is None:
-        return jsonify([])
+        return jsonify({"results": [], "per_page": 0, "next_cursor": None, "has_more": False})
 
+    search = as_string(request.args.get('q')).strip()[:50]
+    cursor = as_string(request.args.get('cursor')).strip()
     try:
-        projection = {
-            "displayName": 1,
-            "lineId": 1,
-            "lastLoginAt": 1,
-            "createdAt": 1,
-            "pictureUrl": 1,
-            "realName": 1,
-        }
-        users = list(database.db.users.find({}, projection).sort("lastLoginAt", -1).limit(3000))
-        line_ids = [user.get("lineId") for user in users if user.get("lineId")]
-
-        order_counts = {}
-        feedback_counts = {}
-        if line_ids:
-            order_pipeline = [
-                {"$match": {"lineId": {"$in": line_ids}}},
-                {"$group": {"_id": "$lineId", "count": {"$sum": 1}}},
-            ]
-            feedback_pipeline = [
-                {"$match": {"lineId": {"$in": line_ids}}},
-                {"$group": {"_id": "$lineId", "count": {"$sum": 1}}},
-            ]
-            order_counts = {
-                item["_id"]: item["count"]
-                for item in database.db.orders.aggregate(order_pipeline)
-                if item.get("_id")
-            }
-            feedback_counts = {
-                item["_id"]: item["count"]
-                for item in database.db.feedback.aggregate(feedback_pipeline)
-                if item.get("_id")
-            }
-
-        results = []
-        for user in users:
-            user['_id'] = str(user['_id'])
-            user['lastLoginAt'] = _tw_time(user.get('lastLoginAt'))
-            user['createdAt'] = _tw_time(user.get('createdAt'))
-            line_id = user.get('lineId')
-            user['orderCount'] = order_counts.get(line_id, 0)
-            user['feedbackCount'] = feedback_counts.get(line_id, 0)
-            results.append(_serialize_doc(user))
-
-        return jsonify(results)
+        per_page = min(max(int(request.args.get('per_page', 50)), 1), 100)
+    except (TypeError, ValueError):
+        per_page = 50
 
-    except Exception as e:
-        logger.exception("Member list failed", extra={"event": "admin_member_list_failed"})
-        return jsonify({"error": f"資料庫查詢錯誤: {str(e)}"}), 500
+    results, next_cursor = fetch_members_page(search, cursor, per_page)
+    return jsonify({
+        "results": results,
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    })
 
 
 @admin_bp.route('/api/admin/data/member/<line_id>/history')
@@ -495,8 +510,8 @@ def get_member_history(line_id):
         feedback.append(doc)
 
     return jsonify({
-        "orders": _serialize_doc(orders),
-        "feedback": _serialize_doc(feedback)
+        "orders": to_jsonable(orders),
+        "feedback": to_jsonable(feedback)
     })
 
 
@@ -604,6 +619,8 @@ def get_audit_log():
         limit = min(max(int(request.args.get('limit', 200)), 1), 500)
     except (TypeError, ValueError):
         limit = 200
+    # 本 worker 緩衝中的紀錄先寫入，剛做完的操作才查得到
+    database.flush_audit_log()
     cursor = database.db.audit_log.find({}).sort("timestamp", -1).limit(limit)
 
     results = []
@@ -699,7 +716,7 @@ def query_receipt(receipt_id):
     if not doc:
         return jsonify({"error": f"找不到單號：{clean_id}"}), 404
 
-    return jsonify(_serialize_doc(doc))
+    return jsonify(to_jsonable(doc))
 
 
 @admin_bp.route('/api/admin/receipt/<receipt_id>', methods=['PUT'])
@@ -716,18 +733,40 @@ def update_receipt(receipt_id):
         update_data, ignored_fields = _clean_receipt_update(payload, FEEDBACK_RECEIPT_ALLOWED_FIELDS)
         if not update_data:
             return jsonify({"error": "沒有可更新的合法欄位", "ignoredFields": ignored_fields}), 400
-        result = database.db.feedback.update_one({"feedbackId": clean_id}, {"$set": update_data})
+        before = database.db.feedback.find_one_and_update(
+            {"feedbackId": clean_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            return jsonify({"error": f"找不到單號：{clean_id}"}), 404
+        if {'nickname', 'realName'} & update_data.keys():
+            database.db.feedback.update_one(
+                {"_id": before["_id"]},
+                {"$set": {"searchTokens": feedback_search_tokens({**before, **update_data})}},
+            )
     elif clean_id.startswith(('ORD', 'DON', 'FND', 'COM')):
         update_data, ignored_fields = _clean_receipt_update(payload, ORDER_RECEIPT_ALLOWED_FIELDS)
         if not update_data:
             return jsonify({"error": "沒有可更新的合法欄位", "ignoredFields": ignored_fields}), 400
         update_data["updatedAt"] = utc_now()
-        result = database.db.orders.update_one({"orderId": clean_id}, {"$set": update_data})
+        before = database.db.orders.find_one_and_update(
+            {"orderId": clean_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            return jsonify({"error": f"找不到單號：{clean_id}"}), 404
+        # 改金額時同步基金累計；欄位名稱不含 '.'，直接合併即為更新後內容。
+        after = {**before, **update_data}
+        record_fund_order_change(before, after)
+        if 'customer' in update_data:
+            database.db.orders.update_one({"_id": before["_id"]}, {"$set": {"searchTokens": order_search_tokens(after)}})
     else:
         return jsonify({"error": f"無法識別的單號格式：{clean_id}"}), 400
 
-    if result.matched_count == 0:
-        return jsonify({"error": f"找不到單號：{clean_id}"}), 404
+    if clean_id.startswith('FB'):
+        bump_version(FEEDBACK_CACHE)
 
     admin_name = session.get('admin_username', 'admin')
     ignored_text = f"，忽略欄位：{', '.join(ignored_fields)}" if ignored_fields else ''
@@ -749,8 +788,11 @@ def force_delete_receipt(receipt_id):
     clean_id = receipt_id.strip().upper()
 
     if clean_id.startswith('FB'):
-        result = database.db.feedback.delete_one({"feedbackId": clean_id})
-        if result.deleted_count > 0:
+        feedback = database.db.feedback.find_one_and_delete({"feedbackId": clean_id})
+        if feedback:
+            record_member_feedback([feedback], -1)
+            refresh_summary_for_removed_feedback(feedback)
+            bump_version(FEEDBACK_CACHE)
             database.write_audit_log(session.get('admin_username', 'admin'), '強制刪除單據', clean_id)
             return jsonify({"success": True, "message": f"已成功刪除回饋單：{clean_id}"})
         else:
@@ -761,6 +803,10 @@ def force_delete_receipt(receipt_id):
         result = database.db.orders.delete_one({"orderId": clean_id})
         if result.deleted_count > 0:
             release_committee_quota_for_order(order)
+            record_fund_order_change(order, None)
+            mark_finance_days_dirty([order])
+            record_member_orders([order], -1)
+            refresh_summary_for_removed_order(order)
             database.write_audit_log(session.get('admin_username', 'admin'), '強制刪除單據', clean_id)
             return jsonify({"success": True, "message": f"已成功刪除單據：{clean_id}"})
         else:
@@ -826,7 +872,7 @@ def fix_feedback_snapshots():
 
     feedback = list(database.db.feedback.find(
         {"$or": [{"realName": {"$exists": False}}, {"realName": ""}]},
-        {"lineId": 1},
+        {"lineId": 1, "feedbackId": 1, "nickname": 1},
     ))
     line_ids = list({fb.get('lineId') for fb in feedback if fb.get('lineId')})
     users = {
@@ -842,10 +888,13 @@ def fix_feedback_snapshots():
         user_info = users.get(fb.get('lineId'))
         if not user_info:
             continue
+        real_name = user_info.get('realName', '')
         operations.append(UpdateOne(
             {"_id": fb['_id']},
             {"$set": {
-                "realName": user_info.get('realName', ''),
+                "realName": real_name,
+                # 補上 realName 後 token 也要重算，否則歷史查詢用真實姓名找不到這筆回饋單
+                "searchTokens": feedback_search_tokens({**fb, "realName": real_name}),
                 "phone": user_info.get('phone', ''),
                 "address": user_info.get('address', ''),
                 "email": user_info.get('email', ''),
@@ -1,12 +1,22 @@
+import hashlib
 import random
 import re
 from datetime import datetime, timedelta
 
-from flask import Blueprint, jsonify, request, session, Response
+from flask import Blueprint, current_app, jsonify, request, session, Response
 
 import database
 from extensions import limiter
 from repositories.committee_quota_repository import calculate_committee_usage
+from repositories.fund_total_repository import get_fund_total
+from services.cache_service import (
+    ANNOUNCEMENTS_CACHE,
+    FAQ_CACHE,
+    LINKS_CACHE,
+    PRODUCTS_CACHE,
+    bump_version,
+    get_or_build,
+)
 from utils.decorators import admin_required
 from utils.helpers import get_object_id, get_tw_now, calculate_business_d2, mask_name
 from utils.security import as_string, get_json_object
@@ -15,6 +25,19 @@ from utils.timezone import utc_now
 content_bp = Blueprint('content', __name__)
 VICE_CHAIR_ROLE_NAME = "[本府] 副主委"
 VICE_CHAIR_DEFAULT_LIMIT = 7
+# 前台 shop / donation 頁面實際用到的欄位
+PUBLIC_PRODUCT_PROJECTION = {
+    "name": 1,
+    "category": 1,
+    "series": 1,
+    "seriesSort": 1,
+    "price": 1,
+    "description": 1,
+    "image": 1,
+    "isActive": 1,
+    "isDonation": 1,
+    "variants": 1,
+}
 
 
 class Core:
@@ -169,19 +192,35 @@ def get_ship_clothes_list():
 
 # --- Products ---
 
-def _serialize_products(query):
+def _serialize_products(query, projection=None):
     if database.db is None:
         return []
-    products = list(database.db.products.find(query).sort([("category", 1), ("createdAt", -1)]))
+    products = list(database.db.products.find(query, projection).sort([("category", 1), ("createdAt", -1)]))
     for p in products:
         p['_id'] = str(p['_id'])
     return products
 
 
+def _build_public_products_body():
+    products = _serialize_products({"isActive": True}, PUBLIC_PRODUCT_PROJECTION)
+    body = current_app.json.dumps(products).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def _public_products_response():
+    if database.db is None:
+        return jsonify([])
+    # 內容雜湊當作 strong ETag，各 worker 對同一份資料給出相同 ETag。
+    _, (body, etag) = get_or_build(PRODUCTS_CACHE, _build_public_products_body)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
 @content_bp.route('/api/public/products', methods=['GET'])
 def get_public_products():
-    products = _serialize_products({"isActive": True})
-    return jsonify(products)
+    return _public_products_response()
 
 
 @content_bp.route('/api/admin/products', methods=['GET'])
@@ -194,8 +233,7 @@ def get_admin_products():
 @content_bp.route('/api/products', methods=['GET'])
 def get_products():
     # 舊前台路由保留為安全相容入口，不再回傳未上架商品。
-    products = _serialize_products({"isActive": True})
-    return jsonify(products)
+    return _public_products_response()
 
 
 @content_bp.route('/api/products', methods=['POST'])
@@ -213,6 +251,7 @@ def add_product():
         "createdAt": utc_now()
     }
     database.db.products.insert_one(new_product)
+    bump_version(PRODUCTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -234,6 +273,7 @@ def update_product(pid):
     if 'isDonation' in fields: fields['isDonation'] = _to_bool(fields['isDonation'], False)
     if 'variants' in fields: fields['variants'] = _clean_variants(fields['variants'])
     database.db.products.update_one({'_id': oid}, {'$set': fields})
+    bump_version(PRODUCTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -245,6 +285,7 @@ def delete_product(pid):
         return jsonify({"error": "無效的 ID 格式"}), 400
 
     database.db.products.delete_one({'_id': oid})
+    bump_version(PRODUCTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -285,6 +326,7 @@ def add_announcement():
         "isPinned": _to_bool(data.get('isPinned'), False),
         "createdAt": utc_now()
     })
+    bump_version(ANNOUNCEMENTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -307,6 +349,7 @@ def update_announcement(aid):
         "content": as_string(data.get('content')).strip(),
         "isPinned": _to_bool(data.get('isPinned'), False)
     }})
+    bump_version(ANNOUNCEMENTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -318,6 +361,7 @@ def delete_announcement(aid):
         return jsonify({"error": "無效的 ID 格式"}), 400
 
     database.db.announcements.delete_one({'_id': oid})
+    bump_version(ANNOUNCEMENTS_CACHE)
     return jsonify({"success": True})
 
 
@@ -362,6 +406,7 @@ def add_faq():
         "isPinned": _to_bool(data.get('isPinned'), False),
         "createdAt": utc_now()
     })
+    bump_version(FAQ_CACHE)
     return jsonify({"success": True})
 
 
@@ -377,6 +422,7 @@ def update_faq(fid):
         "question": as_string(data.get('question')).strip(), "answer": as_string(data.get('answer')).strip(),
         "category": as_string(data.get('category')).strip(), "isPinned": _to_bool(data.get('isPinned'), False)
     }})
+    bump_version(FAQ_CACHE)
     return jsonify({"success": True})
 
 
@@ -388,6 +434,7 @@ def delete_faq(fid):
         return jsonify({"error": "無效的 ID 格式"}), 400
 
     database.db.faq.delete_one({'_id': oid})
+    bump_version(FAQ_CACHE)
     return jsonify({"success": True})
 
 
@@ -402,22 +449,9 @@ def get_fund_settings():
             "vice_chair_remain": 7
         })
     settings = database.db.temple_fund.find_one({"type": "main_fund"}) or {"goal_amount": 10000000}
-
-    pipeline = [
-        {"$match": {"status": "paid", "orderType": "fund"}},
-        {"$group": {"_id": None, "total_current": {"$sum": "$total"}}}
-    ]
-
-    if database.db is not None:
-        result = list(database.db.orders.aggregate(pipeline))
-        calculated_current = result[0]['total_current'] if result else 0
-
-        settings['vice_chair_remain'] = _get_vice_chair_remain()
-    else:
-        calculated_current = 0
-        settings['vice_chair_remain'] = 7
-
-    settings['current_amount'] = calculated_current
+    # 累計金額由付款/刪除/改單時增量維護，避免每次輪詢都聚合全部基金訂單。
+    settings['current_amount'] = get_fund_total()
+    settings['vice_chair_remain'] = _get_vice_chair_remain()
     if '_id' in settings:
         settings['_id'] = str(settings['_id'])
     return jsonify(settings)
@@ -453,4 +487,5 @@ def update_link(lid):
 
     data = get_json_object()
     database.db.links.update_one({'_id': oid}, {'$set': {'url': as_string(data.get('url')).strip()}})
+    bump_version(LINKS_CACHE)
     return jsonify({"success": True})
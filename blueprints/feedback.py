@@ -1,11 +1,15 @@
-import io
-
-from flask import Blueprint, jsonify, request, session, Response
+from flask import Blueprint, jsonify, request, session, Response, stream_with_context
 from pymongo.errors import DuplicateKeyError
 
 import database
 from extensions import limiter
+from repositories.member_repository import record_member_feedback
+from services.cache_service import FEEDBACK_CACHE, bump_version
+from services.export_service import iter_feedback_txt, iter_sent_feedback_txt, serialize_export_job
+from services.feedback_service import count_feedback, enrich_feedback_for_admin
+from services.user_summary_service import record_feedback_sent, refresh_summary_for_removed_feedback
 from services.sequence_service import generate_feedback_id, write_with_unique_id_retry
+from tasks.exports import submit_export_job
 from tasks.notifications import (
     delay_notification,
     send_feedback_rejected_email,
@@ -14,69 +18,13 @@ from tasks.notifications import (
 from utils.decorators import admin_required, user_login_required
 from utils.errors import ServiceUnavailableError
 from utils.helpers import get_object_id
+from utils.search_tokens import feedback_search_tokens
 from utils.security import as_string, get_json_object
-from utils.timezone import format_taipei, taipei_now, utc_now
+from utils.timezone import utc_now
 
 feedback_bp = Blueprint('feedback', __name__)
 
 
-def enrich_feedback_for_admin(cursor):
-    """解決 N+1 Query：批次取得 User 與 sent 狀態，避免在迴圈內反覆查詢資料庫"""
-    docs = list(cursor)
-    if not docs:
-        return []
-
-    line_ids = list({d.get('lineId') for d in docs if d.get('lineId')})
-
-    users_map = {}
-    if line_ids:
-        user_projection = {
-            "lineId": 1,
-            "realName": 1,
-            "phone": 1,
-            "address": 1,
-            "email": 1,
-            "lunarBirthday": 1,
-        }
-        for u in database.db.users.find({"lineId": {"$in": line_ids}}, user_projection):
-            users_map[u['lineId']] = u
-
-    sent_set = set()
-    if line_ids:
-        sent_counts = database.db.feedback.aggregate([
-            {"$match": {"lineId": {"$in": line_ids}, "status": "sent"}},
-            {"$group": {"_id": "$lineId"}}
-        ])
-        sent_set = {item['_id'] for item in sent_counts}
-
-    results = []
-    for doc in docs:
-        line_id = doc.get('lineId')
-        user = users_map.get(line_id, {})
-
-        doc['realName'] = doc.get('realName') or user.get('realName') or '未填寫'
-        doc['phone'] = doc.get('phone') or user.get('phone') or '未填寫'
-        doc['address'] = doc.get('address') or user.get('address') or '未填寫'
-        doc['email'] = doc.get('email') or user.get('email') or ''
-        doc['lunarBirthday'] = doc.get('lunarBirthday') or user.get('lunarBirthday') or '未提供'
-        doc['has_received'] = (line_id in sent_set)
-        doc['_id'] = str(doc['_id'])
-
-        for field, fmt in [('createdAt', '%Y-%m-%d %H:%M:%S'), ('approvedAt', '%Y-%m-%d %H:%M'), ('sentAt', '%Y-%m-%d %H:%M')]:
-            if field in doc:
-                val = doc[field]
-                if isinstance(val, str):
-                    pass  # already a string, keep as-is
-                else:
-                    try:
-                        doc[field] = format_taipei(val, fmt)
-                    except Exception:
-                        doc[field] = str(val) if val else ''
-
-        results.append(doc)
-    return results
-
-
 @feedback_bp.route('/api/feedback', methods=['POST'])
 @limiter.limit("10 per hour")
 @user_login_required
@@ -112,7 +60,9 @@ def add_feedback():
         "email": user_info.get('email', ''),
         "lunarBirthday": user_info.get('lunarBirthday', '')
     }
+    new_feedback["searchTokens"] = feedback_search_tokens(new_feedback)
     database.db.feedback.insert_one(new_feedback)
+    record_member_feedback([new_feedback])
     return jsonify({"success": True, "message": "回饋已送出"})
 
 
@@ -186,6 +136,7 @@ def approve_feedback(fid):
         return database.db.feedback.update_one({'_id': oid, 'status': 'pending'}, {'$set': {
             'status': 'approved',
             'feedbackId': candidate_feedback_id,
+            'searchTokens': feedback_search_tokens({**fb, 'feedbackId': candidate_feedback_id}),
             'approvedAt': now,
             'approvedBy': admin_user
         }})
@@ -202,6 +153,7 @@ def approve_feedback(fid):
         return jsonify({"error": "狀態已被其他操作變更"}), 409
     
     database.write_audit_log(admin_user, '核准回饋', fb_id)
+    bump_version(FEEDBACK_CACHE)
 
     delay_notification(send_feedback_status_email, str(oid), 'approved')
     return jsonify({"success": True})
@@ -247,6 +199,7 @@ def ship_feedback(fid):
     if result.matched_count == 0:
         return jsonify({"error": "狀態已被其他操作變更"}), 409
     
+    record_feedback_sent(fb)
     database.write_audit_log(admin_user, '寄出回饋禮', fb.get('feedbackId', fid), tracking)
 
     delay_notification(send_feedback_status_email, str(oid), 'sent', tracking)
@@ -262,6 +215,9 @@ def delete_feedback(fid):
     fb = database.db.feedback.find_one({'_id': oid})
     if not fb:
         return jsonify({"error": "No data"}), 404
+    if not database.db.feedback.delete_one({'_id': oid}).deleted_count:
+        # 並行的刪除已先完成，計數扣減與通知信都由那個請求負責
+        return jsonify({"error": "No data"}), 404
 
     user = database.db.users.find_one({"lineId": fb.get('lineId')}) if fb and fb.get('lineId') else {}
     email = user.get('email') or (fb.get('email') if fb else None)
@@ -276,7 +232,10 @@ def delete_feedback(fid):
         })
 
     database.write_audit_log(session.get('admin_username', 'admin'), '刪除回饋', fb.get('feedbackId', fid) if fb else fid)
-    database.db.feedback.delete_one({'_id': oid})
+    record_member_feedback([fb], -1)
+    refresh_summary_for_removed_feedback(fb)
+    if fb.get('status') in ('approved', 'sent'):
+        bump_version(FEEDBACK_CACHE)
     return jsonify({"success": True})
 
 
@@ -298,42 +257,38 @@ def update_feedback(fid):
         if field in data:
             update_fields[field] = as_string(data.get(field)).strip()
 
-    database.db.feedback.update_one({'_id': oid}, {'$set': update_fields})
+    current = database.db.feedback.find_one({'_id': oid}, {'feedbackId': 1, 'nickname': 1, 'realName': 1})
+    if current:
+        update_fields['searchTokens'] = feedback_search_tokens({**current, **update_fields})
+    result = database.db.feedback.update_one({'_id': oid}, {'$set': update_fields})
+    if result.modified_count:
+        bump_version(FEEDBACK_CACHE)
     return jsonify({"success": True})
 
 
+def _feedback_export_response(kind, status, empty_message, iter_chunks, filename):
+    """同步匯出以 generator 串流；請求帶 {"async": true} 時改建背景任務。"""
+    if get_json_object().get('async') is True:
+        admin_name = session.get('admin_username', 'admin')
+        try:
+            job = submit_export_job(kind, {}, admin_name)
+        except Exception:
+            return jsonify({"error": "背景匯出排程失敗，請稍後再試"}), 503
+        return jsonify(serialize_export_job(job)), 202
+
+    if not count_feedback(status):
+        return jsonify({"error": empty_message}), 404
+    return Response(stream_with_context(iter_chunks({})), mimetype='text/plain',
+                    headers={"Content-Disposition": f"attachment;filename={filename}"})
+
+
 @feedback_bp.route('/api/feedback/export-sent-txt', methods=['POST'])
 @admin_required(roles=['super_admin', 'ops', 'data'])
 def export_sent_feedback_txt():
-    cursor = database.db.feedback.find({"status": "sent"}).sort("sentAt", -1)
-    enriched = enrich_feedback_for_admin(cursor)
-    if not enriched:
-        return jsonify({"error": "無已寄送資料"}), 404
-
-    si = io.StringIO()
-    si.write(f"已寄送名單匯出\n匯出時間: {taipei_now().strftime('%Y-%m-%d %H:%M')}\n")
-    si.write("=" * 50 + "\n")
-    for doc in enriched:
-        si.write(f"{doc.get('realName', '')}\t{doc.get('phone', '')}\t{doc.get('address', '')}\n")
-    return Response(si.getvalue(), mimetype='text/plain',
-                    headers={"Content-Disposition": "attachment;filename=sent_feedback_list.txt"})
+    return _feedback_export_response("feedback_sent_txt", "sent", "無已寄送資料", iter_sent_feedback_txt, "sent_feedback_list.txt")
 
 
 @feedback_bp.route('/api/feedback/export-txt', methods=['POST'])
 @admin_required(roles=['super_admin', 'ops', 'data'])
 def export_feedback_txt():
-    cursor = database.db.feedback.find({"status": "approved"}).sort("approvedAt", 1)
-    enriched = enrich_feedback_for_admin(cursor)
-    if not enriched:
-        return jsonify({"error": "無資料"}), 404
-
-    si = io.StringIO()
-    si.write(f"匯出時間: {taipei_now().strftime('%Y-%m-%d %H:%M')}\n\n")
-    for doc in enriched:
-        si.write(f"【編號】{doc.get('feedbackId', '無')}\n")
-        si.write(f"姓名：{doc.get('realName', '')}\n")
-        si.write(f"電話：{doc.get('phone', '')}\n")
-        si.write(f"地址：{doc.get('address', '')}\n")
-        si.write("-" * 30 + "\n")
-    return Response(si.getvalue(), mimetype='text/plain',
-                    headers={"Content-Disposition": "attachment;filename=feedback_list.txt"})
+    return _feedback_export_response("feedback_txt", "approved", "無資料", iter_feedback_txt, "feedback_list.txt")
@@ -1,10 +1,22 @@
 import logging
 from datetime import datetime, timedelta
 
-from flask import Blueprint, jsonify, redirect, render_template, url_for
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, url_for
+from flask_wtf.csrf import generate_csrf
 
 import database
-from repositories.committee_quota_repository import calculate_committee_usage
+from repositories.committee_quota_repository import (
+    get_committee_status_snapshot,
+    rebuild_committee_status_snapshot,
+)
+from services.cache_service import (
+    ANNOUNCEMENTS_CACHE,
+    FAQ_CACHE,
+    FEEDBACK_CACHE,
+    LINKS_CACHE,
+    get_cached_page,
+    get_or_build,
+)
 from services.committee_service import get_default_committee_roles
 
 main_bp = Blueprint('main', __name__)
@@ -14,6 +26,13 @@ LINK_PROJECTION = {"name": 1, "url": 1}
 HOME_ANNOUNCEMENT_PROJECTION = {"date": 1, "title": 1, "content": 1, "isPinned": 1}
 FEEDBACK_PROJECTION = {"feedbackId": 1, "nickname": 1, "content": 1, "category": 1}
 FAQ_PROJECTION = {"question": 1, "answer": 1, "category": 1, "isPinned": 1, "createdAt": 1}
+# 快取的 HTML 先放佔位字串，回應前再換成該次請求的 CSRF token。
+CSRF_PLACEHOLDER = "__CSRF_TOKEN_PLACEHOLDER__"
+
+
+def _load_links():
+    links_cursor = database.db.links.find({}, LINK_PROJECTION)
+    return {link['name']: link['url'] for link in links_cursor}
 
 
 @main_bp.app_context_processor
@@ -21,35 +40,62 @@ def inject_links():
     if database.db is None:
         return dict(links={})
     try:
-        links_cursor = database.db.links.find({}, LINK_PROJECTION)
-        links_dict = {link['name']: link['url'] for link in links_cursor}
+        _, links_dict = get_or_build(LINKS_CACHE, _load_links)
         return dict(links=links_dict)
     except Exception:
         return dict(links={})
 
 
+def _render_cached_page(template, data_names, load_context, empty_context, label):
+    """SSR 頁面快取：key 為 template + 資料版本 + 不含查詢字串的網址 + ASSET_VERSION。
+
+    頁面內容不看查詢字串（utm、fbclid 等追蹤參數），一律共用同一份快取，避免每個參數組合各佔一筆。
+
+    讀取資料失敗時以空資料渲染且不寫入快取，避免把錯誤結果留到下次版本變動。
+    """
+    if database.db is None:
+        return render_template(template, **empty_context)
+
+    def render():
+        return render_template(template, csrf_token=lambda: CSRF_PLACEHOLDER, **load_context())
+
+    variant = f"{request.base_url}|{current_app.config.get('ASSET_VERSION', 'dev')}"
+    try:
+        html = get_cached_page(template, [*data_names, LINKS_CACHE], render, variant)
+    except Exception:
+        logger.exception(f"SSR {label} data failed", extra={"event": f"ssr_{label.lower()}_failed"})
+        return render_template(template, **empty_context)
+    return html.replace(CSRF_PLACEHOLDER, generate_csrf())
+
+
 @main_bp.route('/profile')
 def profile_page():
     return render_template('profile.html')
 
 
+def _load_home_announcements():
+    announcements_data = []
+    cursor = database.db.announcements.find(
+        {},
+        HOME_ANNOUNCEMENT_PROJECTION,
+    ).sort([("isPinned", -1), ("date", -1)]).limit(10)
+    for doc in cursor:
+        doc['_id'] = str(doc['_id'])
+        if 'date' in doc and isinstance(doc['date'], datetime):
+            doc['date'] = doc['date'].strftime('%Y/%m/%d')
+        announcements_data.append(doc)
+    return announcements_data
+
+
 @main_bp.route('/')
 def home():
-    announcements_data = []
-    try:
-        if database.db is not None:
-            cursor = database.db.announcements.find(
-                {},
-                HOME_ANNOUNCEMENT_PROJECTION,
-            ).sort([("isPinned", -1), ("date", -1)]).limit(10)
-            for doc in cursor:
-                doc['_id'] = str(doc['_id'])
-                if 'date' in doc and isinstance(doc['date'], datetime):
-                    doc['date'] = doc['date'].strftime('%Y/%m/%d')
-                announcements_data.append(doc)
-    except Exception:
-        logger.exception("SSR home data failed", extra={"event": "ssr_home_failed"})
-    return render_template('index.html', announcements=announcements_data)
+    return _render_cached_page(
+        'index.html',
+        [ANNOUNCEMENTS_CACHE],
+        lambda: {"announcements": _load_home_announcements()},
+        {"announcements": []},
+        "home",
+    )
 
 
 @main_bp.route('/services')
@@ -87,70 +133,70 @@ def get_public_committee_status():
     if database.db is None:
         return jsonify([])
 
-    # 取得後台設定
-    setting = database.db.settings.find_one({"type": "committee_quota"}, {"roles": 1}) or {}
-    roles = setting.get("roles") or get_default_committee_roles()
-    role_names = [role.get('name') for role in roles if role.get('name')]
-
-    used_counts = {}
-    if role_names:
-        used_counts = {
-            doc["_id"]: doc.get("used", 0)
-            for doc in database.db.committee_quota_usage.find(
-                {"_id": {"$in": role_names}},
-                {"used": 1},
-            )
-        }
+    # 預先計算好的快照：reserve/release 與後台設定變更時即時更新
+    snapshot = get_committee_status_snapshot()
+    if snapshot is None:
+        setting = database.db.settings.find_one({"type": "committee_quota"}, {"roles": 1}) or {}
+        roles = setting.get("roles") or get_default_committee_roles()
+        snapshot = rebuild_committee_status_snapshot(roles)
 
     results = []
-    for role in roles:
-        name = role.get('name')
+    for role in snapshot.get("roles", []):
         limit = role.get('limit', 0)
-        # 以 atomic usage 文件為主；若尚未初始化，退回歷史訂單計算。
-        used = used_counts.get(name)
-        if used is None:
-            used = calculate_committee_usage(name)
+        used = role.get('used', 0)
         results.append({
-            "name": name,
+            "name": role.get('name'),
             "remaining": max(0, limit - used),
             "price": role.get('price', 0) # 傳回後台設定的金額
         })
     return jsonify(results)
 
 
+def _load_public_feedbacks():
+    feedbacks_data = []
+    cursor = database.db.feedback.find(
+        {"status": {"$in": ["approved", "sent"]}},
+        FEEDBACK_PROJECTION,
+    ).sort("approvedAt", -1).limit(20)
+    for doc in cursor:
+        feedbacks_data.append({
+            'feedbackId': doc.get('feedbackId', ''),
+            'nickname': doc.get('nickname', '匿名'),
+            'content': doc.get('content', ''),
+            'category': doc.get('category', [])
+        })
+    return feedbacks_data
+
+
 @main_bp.route('/feedback')
 def feedback_page():
-    feedbacks_data = []
-    try:
-        if database.db is not None:
-            cursor = database.db.feedback.find(
-                {"status": {"$in": ["approved", "sent"]}},
-                FEEDBACK_PROJECTION,
-            ).sort("approvedAt", -1).limit(20)
-            for doc in cursor:
-                feedbacks_data.append({
-                    'feedbackId': doc.get('feedbackId', ''),
-                    'nickname': doc.get('nickname', '匿名'),
-                    'content': doc.get('content', ''),
-                    'category': doc.get('category', [])
-                })
-    except Exception:
-        logger.exception("SSR feedback data failed", extra={"event": "ssr_feedback_failed"})
-    return render_template('feedback.html', feedbacks=feedbacks_data)
+    return _render_cached_page(
+        'feedback.html',
+        [FEEDBACK_CACHE],
+        lambda: {"feedbacks": _load_public_feedbacks()},
+        {"feedbacks": []},
+        "feedback",
+    )
+
+
+def _load_faqs():
+    faq_data = []
+    cursor = database.db.faq.find({}, FAQ_PROJECTION).sort([('isPinned', -1), ('createdAt', -1)])
+    for doc in cursor:
+        doc['_id'] = str(doc['_id'])
+        faq_data.append(doc)
+    return faq_data
 
 
 @main_bp.route('/faq')
 def faq_page():
-    faq_data = []
-    try:
-        if database.db is not None:
-            cursor = database.db.faq.find({}, FAQ_PROJECTION).sort([('isPinned', -1), ('createdAt', -1)])
-            for doc in cursor:
-                doc['_id'] = str(doc['_id'])
-                faq_data.append(doc)
-    except Exception:
-        logger.exception("SSR FAQ data failed", extra={"event": "ssr_faq_failed"})
-    return render_template('faq.html', faqs=faq_data)
+    return _render_cached_page(
+        'faq.html',
+        [FAQ_CACHE],
+        lambda: {"faqs": _load_faqs()},
+        {"faqs": []},
+        "FAQ",
+    )
 
 
 @main_bp.route('/gongtan')
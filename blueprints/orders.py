@@ -1,31 +1,52 @@
-import io
 from collections import defaultdict
 from datetime import timedelta
-from flask import Blueprint, jsonify, request, session, Response
+from flask import Blueprint, jsonify, request, session, Response, stream_with_context
 from pymongo.errors import DuplicateKeyError
 
 import database
 from extensions import limiter
 from repositories.committee_quota_repository import (
     release_committee_quota_for_order,
-    reserve_committee_quota,
+    reserve_committee_quotas,
 )
-from schemas.orders import OrderCreateSchema, ResendEmailSchema, ShipOrderSchema
+from repositories.finance_rollup_repository import mark_finance_days_dirty
+from repositories.fund_total_repository import record_fund_order_change
+from repositories.member_repository import record_member_orders
+from schemas.orders import (
+    BulkConfirmOrdersSchema,
+    BulkShipOrdersSchema,
+    OrderCreateSchema,
+    ResendEmailSchema,
+    ShipOrderSchema,
+)
+from tasks.exports import submit_export_job
 from tasks.notifications import (
     delay_notification,
     send_order_cancelled_email,
     send_order_resend_email,
 )
 from services.order_service import (
+    bulk_confirm_payment,
+    bulk_mark_shipped,
     confirm_payment as confirm_payment_service,
     list_admin_donations,
     list_shop_orders,
     mark_shipped as mark_shipped_service,
     queue_order_created_email,
     queue_order_shipped_email,
+    queue_order_shipped_emails,
     queue_payment_confirmed_email,
+    queue_payment_confirmed_emails,
+)
+from services.export_service import (
+    has_donation_report_rows,
+    iter_donations_txt,
+    parse_donation_report_params,
+    serialize_export_job,
 )
+from services.cleanup_service import cleanup_unpaid_orders as run_unpaid_cleanup
 from services.committee_service import get_default_committee_roles
+from services.user_summary_service import refresh_summary_for_removed_order
 from services.sequence_service import (
     generate_order_id,
     write_with_unique_id_retry,
@@ -33,15 +54,15 @@ from services.sequence_service import (
 from utils.business_rules import (
     ORDER_PAYMENT_DEADLINE_HOURS,
     SHIPPED_ORDER_RETENTION_DAYS,
-    UNPAID_ORDER_GRACE_HOURS,
     get_shop_shipping_fee,
 )
 from utils.decorators import admin_required, user_login_required
 from utils.errors import ServiceUnavailableError, ValidationError
 from utils.helpers import get_object_id, validate_real_name, mask_name
 from utils.pagination import page_response, parse_pagination
+from utils.search_tokens import order_search_tokens
 from utils.security import as_string, get_json_object
-from utils.timezone import format_taipei, taipei_date_range_query, taipei_now, utc_now
+from utils.timezone import taipei_date_range_query, utc_now
 from utils.validation import validate_payload
 
 orders_bp = Blueprint('orders', __name__)
@@ -253,34 +274,24 @@ def _normalize_order_payload(data, order_type):
 def _insert_order_with_quota(order, quota_checks):
     if not quota_checks:
         database.db.orders.insert_one(order)
+        record_member_orders([order])
         return
 
-    reserved = []
-    try:
-        for check in quota_checks:
-            quantity = check.get("qty", 1)
-            if not reserve_committee_quota(check["name"], check["limit"], quantity):
-                raise OrderValidationError(f"非常抱歉，【{check['name']}】名額已額滿")
-            reserved.append(check)
+    failed = reserve_committee_quotas(quota_checks)
+    if failed:
+        raise OrderValidationError(f"非常抱歉，【{failed[0]}】名額已額滿")
 
+    try:
         database.db.orders.insert_one(order)
-    except DuplicateKeyError:
-        # insert 撞到唯一鍵時會由外層 retry 重新取單號；先補回本次已扣名額。
-        for check in reserved:
-            release_committee_quota_for_order({
-                "orderType": "committee",
-                "status": "pending",
-                "items": [{"name": check["name"], "qty": check.get("qty", 1)}],
-            })
-        raise
     except Exception:
-        for check in reserved:
-            release_committee_quota_for_order({
-                "orderType": "committee",
-                "status": "pending",
-                "items": [{"name": check["name"], "qty": check.get("qty", 1)}],
-            })
+        # insert 撞到唯一鍵時會由外層 retry 重新取單號；先補回本次已扣名額。
+        release_committee_quota_for_order({
+            "orderType": "committee",
+            "status": "pending",
+            "items": [{"name": check["name"], "qty": check.get("qty", 1)} for check in quota_checks],
+        })
         raise
+    record_member_orders([order])
 
 
 @orders_bp.route('/api/donations/public', methods=['GET'])
@@ -356,77 +367,33 @@ def get_admin_donations():
 @admin_required(roles=['super_admin', 'ops', 'data'])
 def export_donations_txt():
     data = get_json_object()
-    start_str = as_string(data.get('start')).strip()
-    end_str = as_string(data.get('end')).strip()
-
-    order_type = as_string(data.get('type'), 'donation')
-    if order_type not in ('donation', 'fund', 'committee'):
-        return jsonify({"error": "不支援的查詢類型"}), 400
-    query = {"orderType": order_type, "status": "paid"}
+    params, error = parse_donation_report_params(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    if start_str and end_str:
+    if data.get('async') is True:
+        admin_name = session.get('admin_username', 'admin')
         try:
-            query["updatedAt"] = taipei_date_range_query(start_str, end_str)
-        except ValueError:
-            pass
+            job = submit_export_job("donations_txt", params, admin_name)
+        except Exception:
+            return jsonify({"error": "背景匯出排程失敗，請稍後再試"}), 503
+        return jsonify(serialize_export_job(job)), 202
 
-    cursor = database.db.orders.find(query).sort("updatedAt", 1)
-    orders = list(cursor)
-    if not orders:
+    if not has_donation_report_rows(params):
         return jsonify({"error": "目前無資料"}), 404
-
-    title_map = {'fund': '建廟基金護持清單', 'committee': '委員會護持清單', 'donation': '捐贈稟報清單'}
-    report_title = title_map.get(order_type, '護持清單')
-
-    si = io.StringIO()
-    si.write(f"{report_title}\n匯出日期：{taipei_now().strftime('%Y-%m-%d')}\n")
-    si.write("=" * 40 + "\n\n")
-
-    idx = 1
-    for doc in orders:
-        cust = doc.get('customer', {})
-        # 加上規格名稱的判斷
-        items_str = "、".join([f"{i.get('name', '')}{'['+i.get('variantName', '')+']' if i.get('variantName') else ''}x{i.get('qty', 1)}" for i in doc.get('items', [])])
-        paid_date = format_taipei(doc.get('updatedAt'), '%Y/%m/%d')
-
-        si.write(f"【{idx}】\n")
-        si.write(f"日期：{paid_date}\n")
-        si.write(f"姓名：{cust.get('name', '')}\n")
-        si.write(f"農曆：{cust.get('lunarBirthday', '')}\n")
-        si.write(f"地址：{cust.get('address', '')}\n")
-
-        if order_type in ['fund', 'committee']:
-            si.write(f"金額：${doc.get('total', 0)}\n")
-            si.write(f"末五碼：{cust.get('last5', '無')}\n")
-
-        si.write(f"項目：{items_str}\n")
-        si.write("-" * 20 + "\n")
-        idx += 1
-
-    return Response(si.getvalue(), mimetype='text/plain',
-                    headers={"Content-Disposition": f"attachment; filename={order_type}_list.txt"})
+    return Response(stream_with_context(iter_donations_txt(params)), mimetype='text/plain',
+                    headers={"Content-Disposition": f"attachment; filename={params['type']}_list.txt"})
 
 
 @orders_bp.route('/api/donations/cleanup-unpaid', methods=['DELETE'])
 @admin_required(roles=['super_admin', 'finance', 'ops'])
 def cleanup_unpaid_orders():
-    cutoff = utc_now() - timedelta(hours=UNPAID_ORDER_GRACE_HOURS)
-    query = {"status": "pending", "createdAt": {"$lt": cutoff}}
-    orders_to_delete = list(database.db.orders.find(query))
-    for order in orders_to_delete:
-        if order.get('customer', {}).get('email'):
-            delay_notification(send_order_cancelled_email, {
-                "email": order['customer']['email'],
-                "orderId": order.get('orderId', ''),
-                "customerName": order.get('customer', {}).get('name', '信徒'),
-                "reason": "expired",
-            })
-
-    result = database.db.orders.delete_many(query)
-    if result.deleted_count:
-        for order in orders_to_delete:
-            release_committee_quota_for_order(order)
-    return jsonify({"success": True, "count": result.deleted_count})
+    if database.db is None:
+        return jsonify({"error": "DB Error"}), 500
+    result = run_unpaid_cleanup()
+    if result["skipped"]:
+        return jsonify({"error": "清理作業正在執行中，請稍後再試"}), 409
+    return jsonify({"success": True, "count": result["count"]})
 
 
 @orders_bp.route('/api/orders', methods=['POST'])
@@ -477,6 +444,7 @@ def create_order():
     def write_order(candidate_order_id):
         # 每次 retry 都用新的 dict，避免 PyMongo 在 insert 時加上的 _id 汙染下一次嘗試。
         order = {**order_template, "orderId": candidate_order_id}
+        order["searchTokens"] = order_search_tokens(order)
         _insert_order_with_quota(order, quota_checks)
         return order
 
@@ -505,8 +473,16 @@ def get_orders():
 @admin_required(roles=['super_admin', 'ops'])
 def cleanup_shipped_orders():
     cutoff = utc_now() - timedelta(days=SHIPPED_ORDER_RETENTION_DAYS)
-    result = database.db.orders.delete_many({"status": "shipped", "shippedAt": {"$lt": cutoff}})
-    return jsonify({"success": True, "count": result.deleted_count})
+    query = {"status": "shipped", "shippedAt": {"$lt": cutoff}}
+    candidates = list(database.db.orders.find(query, {"_id": 1, "createdAt": 1, "lineId": 1}))
+    # 逐筆刪除並以 deleted_count 判斷，只扣減這次真的刪掉的訂單；並行請求先刪掉的由該請求負責扣減
+    removed = [
+        order for order in candidates
+        if database.db.orders.delete_one({**query, "_id": order["_id"]}).deleted_count
+    ]
+    mark_finance_days_dirty(removed)
+    record_member_orders(removed, -1)
+    return jsonify({"success": True, "count": len(removed)})
 
 
 @orders_bp.route('/api/orders/<oid>/confirm', methods=['PUT'])
@@ -517,6 +493,16 @@ def confirm_order_payment(oid):
     queue_payment_confirmed_email(order)
     return jsonify({"success": True})
 
+@orders_bp.route('/api/orders/bulk-confirm', methods=['POST'])
+@admin_required(roles=['super_admin', 'finance'])
+def bulk_confirm_order_payment():
+    """批次確認收款：回傳每個編號的處理結果，通知信合併成一個任務。"""
+    payload = validate_payload(BulkConfirmOrdersSchema, get_json_object())
+    admin_user = session.get('admin_username', 'admin')
+    results, orders = bulk_confirm_payment(payload.ids, admin_user)
+    queue_payment_confirmed_emails(orders)
+    return jsonify({"success": True, "updated": len(orders), "results": results})
+
 @orders_bp.route('/api/orders/<oid>/resend-email', methods=['POST'])
 @admin_required(roles=['super_admin', 'finance', 'ops'])
 def resend_order_email(oid):
@@ -558,6 +544,10 @@ def delete_order(oid):
     result = database.db.orders.delete_one({'_id': oid_obj})
     if result.deleted_count:
         release_committee_quota_for_order(order)
+        record_fund_order_change(order, None)
+        mark_finance_days_dirty([order])
+        record_member_orders([order], -1)
+        refresh_summary_for_removed_order(order)
     return jsonify({"success": True})
 
 @orders_bp.route('/api/orders/<oid>/ship', methods=['PUT'])
@@ -569,3 +559,14 @@ def ship_order(oid):
     order = mark_shipped_service(oid, tracking_num, admin_user)
     queue_order_shipped_email(order, tracking_num)
     return jsonify({"success": True})
+
+@orders_bp.route('/api/orders/bulk-ship', methods=['POST'])
+@admin_required(roles=['super_admin', 'ops'])
+def bulk_ship_orders():
+    """批次出貨：每筆訂單各自帶物流單號。"""
+    payload = validate_payload(BulkShipOrdersSchema, get_json_object())
+    admin_user = session.get('admin_username', 'admin')
+    shipments = [(item.id, item.trackingNumber) for item in payload.orders]
+    results, orders = bulk_mark_shipped(shipments, admin_user)
+    queue_order_shipped_emails(orders)
+    return jsonify({"success": True, "updated": len(orders), "results": results})
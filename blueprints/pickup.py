@@ -1,11 +1,16 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, session
-from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, session
 import database
+from repositories.pickup_lock_repository import (
+    acquire_cloth_locks,
+    lock_expires_at,
+    release_cloth_locks,
+    release_pickup_locks,
+)
+from services.pickup_calendar_service import get_public_calendar, record_pickup_change
 from tasks.notifications import delay_notification, send_line_admin_notification
 from utils.decorators import user_login_required
-from utils.helpers import get_tw_now, get_object_id, mask_name
+from utils.helpers import get_tw_now, get_object_id
 from utils.security import as_string, get_json_object
 from utils.timezone import utc_now
 
@@ -44,23 +49,6 @@ def create_pickup_reservation():
     if len(set(incoming_ids)) != len(incoming_ids):
         return jsonify({"error": "同一張預約單內不可重複填寫衣服編號"}), 400
 
-    if database.db is not None:
-        today_str = get_tw_now().strftime('%Y-%m-%d')
-
-        duplicate_order = database.db.pickups.find_one({
-            "clothes.clothId": {"$in": incoming_ids},
-            "pickupDate": {"$gte": today_str}
-        }, {"clothes.clothId": 1})
-
-        if duplicate_order:
-            found_id = ""
-            for item in duplicate_order.get('clothes', []):
-                if item.get('clothId') in incoming_ids:
-                    found_id = item.get('clothId')
-                    break
-            error_msg = f"衣服編號【{found_id}】目前的預約尚未過期！如需重新安排，請先至「個人專區」刪除舊紀錄。"
-            return jsonify({"error": error_msg}), 400
-
     new_reservation = {
         "lineId": line_id,
         "pickupType": pickup_type,
@@ -70,40 +58,23 @@ def create_pickup_reservation():
     }
 
     if database.db is not None:
-        now = utc_now()
         try:
-            expires_at = datetime.strptime(pickup_date, '%Y-%m-%d') + timedelta(days=1)
+            expires_at = lock_expires_at(pickup_date)
         except ValueError:
             return jsonify({"error": "日期格式錯誤"}), 400
 
-        database.db.pickup_cloth_locks.delete_many({"expiresAt": {"$lt": now}})
-        locked_ids = []
-        try:
-            for cloth_id in incoming_ids:
-                database.db.pickup_cloth_locks.insert_one({
-                    "clothId": cloth_id,
-                    "lineId": line_id,
-                    "pickupDate": pickup_date,
-                    "createdAt": now,
-                    "expiresAt": expires_at,
-                })
-                locked_ids.append(cloth_id)
-        except DuplicateKeyError:
-            if locked_ids:
-                database.db.pickup_cloth_locks.delete_many({
-                    "clothId": {"$in": locked_ids},
-                    "lineId": line_id,
-                })
-            return jsonify({"error": "此衣服編號已被預約"}), 409
+        # 唯一鍵鎖同時負責重複預約檢查：一次 insert_many 就知道哪些編號已被占用。
+        token, conflicts = acquire_cloth_locks(incoming_ids, line_id, pickup_date, expires_at)
+        if conflicts:
+            error_msg = f"衣服編號【{conflicts[0]}】目前的預約尚未過期！如需重新安排，請先至「個人專區」刪除舊紀錄。"
+            return jsonify({"error": error_msg, "conflicts": conflicts}), 409
 
         try:
             database.db.pickups.insert_one(new_reservation)
         except Exception:
-            database.db.pickup_cloth_locks.delete_many({
-                "clothId": {"$in": incoming_ids},
-                "lineId": line_id,
-            })
+            release_cloth_locks(token)
             raise
+        record_pickup_change(pickup_date)
         cloth_count = len(clothes)
         notify_msg = (
             f"🔔 收到一筆新的寄衣服預約！\n"
@@ -126,45 +97,12 @@ def get_public_pickups():
     if database.db is None:
         return jsonify([])
 
-    threshold_date = (get_tw_now() - timedelta(days=1)).strftime('%Y-%m-%d')
-    projection = {
-        "pickupDate": 1,
-        "pickupType": 1,
-        "clothes.clothId": 1,
-        "clothes.name": 1,
-        "clothes.birthYear": 1,
-    }
-    cursor = database.db.pickups.find(
-        {"pickupDate": {"$gte": threshold_date}},
-        projection,
-    ).sort("pickupDate", 1)
-
-    results = defaultdict(lambda: {'self': [], 'delivery': []})
-
-    for doc in cursor:
-        date_str = doc['pickupDate']
-        p_type = doc['pickupType']
-
-        masked_clothes = []
-        for c in doc.get('clothes', []):
-            masked_clothes.append({
-                "clothId": c.get('clothId', ''),
-                "name": mask_name(c.get('name', '')),
-                "birthYear": c.get('birthYear', '')
-            })
-
-        if masked_clothes:
-            results[date_str][p_type].append({"clothes": masked_clothes})
-
-    formatted_results = []
-    for d in sorted(results.keys()):
-        formatted_results.append({
-            "date": d,
-            "self": results[d]['self'],
-            "delivery": results[d]['delivery']
-        })
-
-    return jsonify(formatted_results)
+    # 預先分組、遮罩好的每日行事曆；預約異動時才重算，內容雜湊當作 ETag。
+    body, etag = get_public_calendar()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @pickup_bp.route('/api/pickup/<pid>', methods=['DELETE'])
@@ -190,9 +128,7 @@ def delete_pickup(pid):
 
     cloth_ids = [item.get('clothId') for item in pickup.get('clothes', []) if item.get('clothId')]
     database.db.pickups.delete_one({"_id": oid})
+    record_pickup_change(pickup.get('pickupDate'))
     if cloth_ids:
-        database.db.pickup_cloth_locks.delete_many({
-            "clothId": {"$in": cloth_ids},
-            "lineId": line_id,
-        })
+        release_pickup_locks(cloth_ids, line_id)
     return jsonify({"success": True})
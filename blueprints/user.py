@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request, session
 
 import database
+from repositories.member_repository import member_search_fields
+from services.user_summary_service import refresh_profile_summary
 from utils.decorators import user_login_required
 from utils.helpers import get_tw_now, validate_real_name
 from utils.security import as_string, get_json_object
@@ -33,33 +35,10 @@ def get_current_user():
     if database.db is not None:
         user = database.db.users.find_one({'lineId': line_id}, {'_id': 0})
         if user:
-            has_received = database.db.feedback.find_one(
-                {"lineId": line_id, "status": "sent"},
-                {"_id": 1},
-            ) is not None
-            user['has_received_gift'] = has_received
-
-            user['title'] = ""
-            committee_orders = database.db.orders.find({
-                "lineId": line_id,
-                "orderType": "committee",
-                "status": "paid"
-            }, {"items.name": 1})
-
-            highest_title = ""
-            current_rank = 99
-            rank_map = {"主委": 1, "副主委": 2, "顧問": 3, "委員": 4, "功德主": 5}
-
-            for order in committee_orders:
-                for item in order.get('items', []):
-                    name = item.get('name', '')
-                    clean_title = name.replace('[本府] ', '').replace('[建廟] ', '').replace('籌備', '')
-                    rank = rank_map.get(clean_title, 99)
-                    if rank < current_rank:
-                        current_rank = rank
-                        highest_title = clean_title
-
-            user['title'] = highest_title
+            # 頭銜與回饋禮狀態由 profileSummary 預先維護；舊資料第一次讀取時補算。
+            summary = user.pop('profileSummary', None) or refresh_profile_summary(line_id)
+            user['has_received_gift'] = bool(summary.get('hasReceivedGift'))
+            user['title'] = summary.get('title', '')
             return jsonify({"logged_in": True, "user": user})
 
     return jsonify({"logged_in": False})
@@ -90,6 +69,7 @@ def update_user_profile():
         "gender": as_string(data.get('gender')).strip(),
         "updatedAt": utc_now()
     }
+    update_data.update(member_search_fields(real_name=update_data["realName"]))
 
     database.db.users.update_one(
         {"lineId": line_id},
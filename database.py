@@ -1,9 +1,12 @@
+import atexit
 import logging
-import os
 
 from pymongo import ASCENDING, DESCENDING, MongoClient
 from pymongo.errors import PyMongoError
 
+from utils.audit_writer import BufferedAuditWriter
+from utils.db_profiler import mongo_event_listeners
+from utils.env import env_int
 from utils.timezone import utc_now
 
 db = None
@@ -12,13 +15,6 @@ logger = logging.getLogger(__name__)
 INDEX_OPTION_KEYS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
 
 
-def _env_int(name, default):
-    try:
-        return int(os.environ.get(name, default))
-    except (TypeError, ValueError):
-        return default
-
-
 def _single_field_name(keys):
     if len(keys) != 1:
         return None
@@ -111,6 +107,7 @@ INDEX_SPECS = (
     ('orders', [('lineId', ASCENDING), ('orderType', ASCENDING), ('createdAt', DESCENDING)], {'name': 'orders_line_type_created'}),
     ('orders', [('lineId', ASCENDING), ('orderType', ASCENDING), ('status', ASCENDING)], {'name': 'orders_line_type_status'}),
     ('orders', [('orderType', ASCENDING), ('createdAt', DESCENDING)], {'name': 'orders_type_created'}),
+    ('orders', [('createdAt', DESCENDING), ('_id', DESCENDING)], {'name': 'orders_created_id'}),
     ('orders', [('orderType', ASCENDING), ('status', ASCENDING), ('updatedAt', DESCENDING)], {'name': 'orders_type_status_updated'}),
     ('orders', [('orderType', ASCENDING), ('status', ASCENDING), ('createdAt', DESCENDING)], {'name': 'orders_type_status_created'}),
     ('orders', [('orderType', ASCENDING), ('status', ASCENDING), ('is_reported', ASCENDING), ('paidAt', ASCENDING)], {'name': 'orders_type_status_reported_paid'}),
@@ -121,6 +118,9 @@ INDEX_SPECS = (
     ('orders', [('status', ASCENDING), ('orderType', ASCENDING), ('updatedAt', DESCENDING)], {'name': 'orders_status_type_updated'}),
     ('orders', [('orderType', ASCENDING), ('status', ASCENDING), ('items.name', ASCENDING)], {'name': 'orders_type_status_item'}),
     ('orders', [('items.name', ASCENDING), ('orderType', ASCENDING), ('status', ASCENDING)], {'name': 'orders_item_type_status'}),
+    ('orders', [('updatedAt', ASCENDING)], {'name': 'orders_updated_at'}),
+    ('orders', [('searchTokens', ASCENDING), ('createdAt', DESCENDING)], {'name': 'orders_search_tokens_created'}),
+    ('finance_rollups', [('day', ASCENDING)], {'name': 'finance_rollups_day'}),
 
     ('feedback', [('feedbackId', ASCENDING)], {
         'name': 'feedback_feedback_id',
@@ -129,13 +129,19 @@ INDEX_SPECS = (
         'partialFilterExpression': {'feedbackId': {'$type': 'string', '$gt': ''}},
     }),
     ('feedback', [('lineId', ASCENDING), ('createdAt', DESCENDING)], {'name': 'feedback_line_created'}),
+    ('feedback', [('createdAt', DESCENDING), ('_id', DESCENDING)], {'name': 'feedback_created_id'}),
     ('feedback', [('lineId', ASCENDING), ('status', ASCENDING)], {'name': 'feedback_line_status'}),
     ('feedback', [('status', ASCENDING), ('createdAt', ASCENDING)], {'name': 'feedback_status_created'}),
     ('feedback', [('status', ASCENDING), ('approvedAt', DESCENDING)], {'name': 'feedback_status_approved'}),
     ('feedback', [('status', ASCENDING), ('sentAt', DESCENDING)], {'name': 'feedback_status_sent'}),
+    ('feedback', [('searchTokens', ASCENDING), ('createdAt', DESCENDING)], {'name': 'feedback_search_tokens_created'}),
 
     ('users', [('lineId', ASCENDING)], {'name': 'users_line_id', 'unique': True}),
-    ('users', [('lastLoginAt', DESCENDING)], {'name': 'users_last_login'}),
+    ('users', [('lastLoginAt', DESCENDING), ('_id', DESCENDING)], {'name': 'users_last_login_id'}),
+    ('users', [('displayName', ASCENDING)], {'name': 'users_display_name'}),
+    ('users', [('realName', ASCENDING)], {'name': 'users_real_name'}),
+    ('users', [('searchDisplayName', ASCENDING)], {'name': 'users_search_display_name'}),
+    ('users', [('searchRealName', ASCENDING)], {'name': 'users_search_real_name'}),
     ('admin_users', [('username', ASCENDING)], {'name': 'admin_users_username', 'unique': True}),
     ('counters', [('updatedAt', DESCENDING)], {'name': 'counters_updated_at'}),
     ('committee_quota_usage', [('updatedAt', DESCENDING)], {'name': 'committee_quota_usage_updated'}),
@@ -149,6 +155,7 @@ INDEX_SPECS = (
     ('pickup_cloth_locks', [('clothId', ASCENDING)], {'name': 'pickup_cloth_locks_cloth_id', 'unique': True}),
     ('pickup_cloth_locks', [('expiresAt', ASCENDING)], {'name': 'pickup_cloth_locks_expires_at', 'expireAfterSeconds': 0}),
     ('shipments', [('pickupDate', ASCENDING)], {'name': 'shipments_pickup_date'}),
+    ('store_cache', [('expiresAt', ASCENDING)], {'name': 'store_cache_expires_at', 'expireAfterSeconds': 0}),
 
     ('products', [('category', ASCENDING), ('createdAt', DESCENDING)], {'name': 'products_category_created'}),
     ('products', [('isActive', ASCENDING), ('category', ASCENDING), ('createdAt', DESCENDING)], {'name': 'products_active_category_created'}),
@@ -156,6 +163,7 @@ INDEX_SPECS = (
     ('announcements', [('isPinned', DESCENDING), ('date', DESCENDING)], {'name': 'announcements_pinned_date'}),
     ('faq', [('category', ASCENDING), ('isPinned', DESCENDING), ('createdAt', DESCENDING)], {'name': 'faq_category_pinned_created'}),
     ('audit_log', [('timestamp', DESCENDING)], {'name': 'audit_log_timestamp'}),
+    ('export_jobs', [('createdAt', DESCENDING)], {'name': 'export_jobs_created'}),
 )
 
 
@@ -178,12 +186,13 @@ def init_db(mongo_uri):
             _client = MongoClient(
                 mongo_uri,
                 appname='chentien-temple-api',
-                maxPoolSize=_env_int('MONGO_MAX_POOL_SIZE', 50),
-                minPoolSize=_env_int('MONGO_MIN_POOL_SIZE', 0),
-                connectTimeoutMS=_env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
-                serverSelectionTimeoutMS=_env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
-                socketTimeoutMS=_env_int('MONGO_SOCKET_TIMEOUT_MS', 20000),
+                maxPoolSize=env_int('MONGO_MAX_POOL_SIZE', 50),
+                minPoolSize=env_int('MONGO_MIN_POOL_SIZE', 0),
+                connectTimeoutMS=env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+                serverSelectionTimeoutMS=env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+                socketTimeoutMS=env_int('MONGO_SOCKET_TIMEOUT_MS', 20000),
                 retryWrites=True,
+                event_listeners=mongo_event_listeners(),
             )
             db = _client['ChentienTempleDB']
             _client.admin.command('ping')
@@ -208,17 +217,57 @@ def get_db():
     return db
 
 
+def _insert_audit_entries(entries):
+    if db is None:
+        return
+    db.audit_log.insert_many(entries, ordered=False)
+
+
+# AUDIT_LOG_BUFFER_SIZE=0 時維持每筆同步 insert_one。
+AUDIT_LOG_BUFFER_SIZE = max(0, env_int('AUDIT_LOG_BUFFER_SIZE', 1000))
+_audit_writer = None
+if AUDIT_LOG_BUFFER_SIZE:
+    _audit_writer = BufferedAuditWriter(
+        _insert_audit_entries,
+        batch_size=env_int('AUDIT_LOG_BATCH_SIZE', 100),
+        flush_seconds=env_int('AUDIT_LOG_FLUSH_MS', 2000) / 1000,
+        max_pending=AUDIT_LOG_BUFFER_SIZE,
+    )
+    atexit.register(_audit_writer.close)
+
+
 def write_audit_log(admin_username, action, target='', details=''):
-    """Write an admin audit log entry."""
+    """Write an admin audit log entry.
+
+    Entries are buffered and inserted in batches by a background thread; the timestamp is taken here.
+    """
     if db is None:
         return
+    entry = {
+        "timestamp": utc_now(),
+        "admin": admin_username or 'system',
+        "action": action,
+        "target": target,
+        "details": details
+    }
+    if _audit_writer is not None:
+        _audit_writer.write(entry)
+        return
     try:
-        db.audit_log.insert_one({
-            "timestamp": utc_now(),
-            "admin": admin_username or 'system',
-            "action": action,
-            "target": target,
-            "details": details
-        })
+        db.audit_log.insert_one(entry)
     except Exception as e:
         logger.exception("Audit log write failed", extra={"event": "audit_log_failed"})
+
+
+def flush_audit_log(timeout=5.0):
+    """Write buffered audit entries now; returns the number of entries flushed."""
+    if _audit_writer is None:
+        return 0
+    return _audit_writer.flush(timeout)
+
+
+def close_audit_log(timeout=5.0):
+    """Stop the background writer and flush what is left (worker shutdown)."""
+    if _audit_writer is None:
+        return 0
+    return _audit_writer.close(timeout)
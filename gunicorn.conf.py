@@ -0,0 +1,10 @@
+# gunicorn 會自動讀取工作目錄下的 gunicorn.conf.py；其餘設定仍由啟動指令或 GUNICORN_CMD_ARGS 指定。
+
+
+def worker_exit(server, worker):
+    # worker 被回收或重啟時，先把緩衝中的操作日誌寫完；atexit 只在正常結束時才會執行。
+    import database
+
+    flushed = database.close_audit_log()
+    if flushed:
+        server.log.info("Flushed %s buffered audit log entries", flushed)
@@ -0,0 +1,38 @@
+from pymongo import ReturnDocument
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def get_cache_version(name):
+    doc = _require_db().cache_versions.find_one({"_id": name}, {"version": 1})
+    return int(doc.get("version", 0)) if doc else 0
+
+
+def bump_cache_version(name):
+    """資料異動時遞增版本；所有 worker 下次檢查版本時就會重建快取。"""
+    doc = _require_db().cache_versions.find_one_and_update(
+        {"_id": name},
+        {
+            "$inc": {"version": 1},
+            "$set": {"updatedAt": utc_now()},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc.get("version", 0))
+
+
+def get_cache_versions(names):
+    docs = _require_db().cache_versions.find({"_id": {"$in": list(names)}}, {"version": 1})
+    versions = {name: 0 for name in names}
+    for doc in docs:
+        versions[doc["_id"]] = int(doc.get("version", 0))
+    return versions
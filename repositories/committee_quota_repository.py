@@ -1,3 +1,6 @@
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
 
 import database
@@ -5,7 +8,11 @@ from utils.errors import ServiceUnavailableError
 from utils.timezone import utc_now
 
 
+logger = logging.getLogger(__name__)
+
 ACTIVE_COMMITTEE_STATUSES = {"pending", "paid"}
+COMMITTEE_STATUS_SNAPSHOT_ID = "public"
+SNAPSHOT_WRITE_ATTEMPTS = 5
 
 
 def _require_db():
@@ -37,7 +44,7 @@ def ensure_committee_quota_usage(role_name, limit):
     now = utc_now()
     used = calculate_committee_usage(role_name)
     try:
-        db.committee_quota_usage.update_one(
+        result = db.committee_quota_usage.update_one(
             {"_id": role_name},
             {
                 "$set": {
@@ -46,11 +53,15 @@ def ensure_committee_quota_usage(role_name, limit):
                 },
                 "$setOnInsert": {
                     "used": used,
+                    "rev": 0,
                     "createdAt": now,
                 },
             },
             upsert=True,
         )
+        if result.upserted_id is not None:
+            # 新建立的 usage 文件以歷史訂單為準，同步覆寫快照中的 used。
+            _sync_snapshot_roles([{"_id": role_name, "used": used, "rev": 0}])
     except DuplicateKeyError:
         # 多個請求同時初始化同一職稱時，只需要補上最新 limit。
         db.committee_quota_usage.update_one(
@@ -65,49 +76,266 @@ def sync_committee_quota_usages(roles):
         if not name:
             continue
         ensure_committee_quota_usage(name, role.get("limit", 0))
+    rebuild_committee_status_snapshot(roles)
 
 
-def reserve_committee_quota(role_name, limit, quantity=1):
-    """以單文件 atomic update 扣名額，非 replica set 環境也不會超賣。"""
+def get_committee_status_snapshot():
+    """公開名額狀態：單一主鍵讀取，不碰 settings 與 orders。"""
     db = _require_db()
-    quantity = max(1, int(quantity or 1))
-    ensure_committee_quota_usage(role_name, limit)
-    now = utc_now()
-    expr = {"$lt": ["$used", "$limit"]}
-    if quantity > 1:
-        expr = {"$lte": [{"$add": ["$used", quantity]}, "$limit"]}
+    return db.committee_status.find_one({"_id": COMMITTEE_STATUS_SNAPSHOT_ID})
+
+
+def _write_committee_status_snapshot(snapshot_roles, current):
+    """以讀取時的 version 為條件覆寫快照；期間有 reserve/release 調整過（version 變了）就回傳 False。
 
-    result = db.committee_quota_usage.update_one(
+    current 為讀取時的快照文件，None 代表尚未建立；舊快照沒有 version 欄位時以 None 比對。
+    """
+    db = _require_db()
+    now = utc_now()
+    if current is None:
+        try:
+            db.committee_status.insert_one({
+                "_id": COMMITTEE_STATUS_SNAPSHOT_ID,
+                "roles": snapshot_roles,
+                "version": 1,
+                "updatedAt": now,
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+    result = db.committee_status.update_one(
+        {"_id": COMMITTEE_STATUS_SNAPSHOT_ID, "version": current.get("version")},
         {
-            "_id": role_name,
-            "$expr": expr,
+            "$set": {"roles": snapshot_roles, "updatedAt": now},
+            "$inc": {"version": 1},
         },
-        {
-            "$inc": {"used": quantity},
-            "$set": {
-                "limit": int(limit),
-                "updatedAt": now,
+    )
+    return result.matched_count == 1
+
+
+def _read_usage_docs(names):
+    if not names:
+        return {}
+    return {
+        doc["_id"]: doc
+        for doc in _require_db().committee_quota_usage.find({"_id": {"$in": names}}, {"used": 1, "rev": 1})
+    }
+
+
+def rebuild_committee_status_snapshot(roles):
+    """依後台設定與 usage 文件重建快照；只讀 usage 文件，常態不跑 orders aggregation。
+
+    尚未有 usage 文件的職稱先初始化，快照不會把未統計的職稱顯示成 used=0。
+    先記下快照 version 再讀 usage，寫入時 version 已被並行的扣減/補回改過就重讀再寫；
+    每個職稱一併記下 usage 的 rev，之後較舊的同步會被擋下。
+    """
+    db = _require_db()
+    limits = {role.get("name"): role.get("limit", 0) for role in roles if role.get("name")}
+    names = list(limits)
+    existing = _read_usage_docs(names)
+    for name in names:
+        if name not in existing:
+            ensure_committee_quota_usage(name, limits[name])
+
+    for _attempt in range(SNAPSHOT_WRITE_ATTEMPTS):
+        current = db.committee_status.find_one({"_id": COMMITTEE_STATUS_SNAPSHOT_ID}, {"version": 1})
+        usage_docs = _read_usage_docs(names)
+        snapshot_roles = [
+            {
+                "name": role.get("name"),
+                "limit": int(role.get("limit", 0)),
+                "price": role.get("price", 0),
+                "used": int(usage_docs.get(role.get("name"), {}).get("used", 0)),
+                "rev": int(usage_docs.get(role.get("name"), {}).get("rev", 0)),
+            }
+            for role in roles
+            if role.get("name")
+        ]
+        if _write_committee_status_snapshot(snapshot_roles, current):
+            break
+    else:
+        logger.warning(
+            "Committee status snapshot still contended after retries",
+            extra={"event": "committee_snapshot_contended"},
+        )
+    return {"_id": COMMITTEE_STATUS_SNAPSHOT_ID, "roles": snapshot_roles}
+
+
+def _sync_snapshot_roles(usage_docs):
+    """以 usage 更新後回傳的 used 覆寫快照，不做盲目 $inc。
+
+    只在快照記錄的 rev 比這次舊時才寫入：較晚落地的舊結果或重建已涵蓋的變更都不會再算一次。
+    """
+    usage_docs = [doc for doc in usage_docs if doc]
+    if not usage_docs:
+        return
+    db = _require_db()
+    now = utc_now()
+    db.committee_status.bulk_write([
+        UpdateOne(
+            {
+                "_id": COMMITTEE_STATUS_SNAPSHOT_ID,
+                "roles": {"$elemMatch": {
+                    "name": doc["_id"],
+                    "rev": {"$not": {"$gte": int(doc.get("rev", 0))}},
+                }},
             },
+            {
+                "$set": {
+                    "roles.$.used": int(doc.get("used", 0)),
+                    "roles.$.rev": int(doc.get("rev", 0)),
+                    "updatedAt": now,
+                },
+                "$inc": {"version": 1},
+            },
+        )
+        for doc in usage_docs
+    ], ordered=False)
+
+
+def _reserve_operation(role_name, limit, quantity):
+    """扣名額的 filter/update；上限直接用呼叫端帶入的 limit 比較並回寫。"""
+    limit = int(limit)
+    update = {
+        "$inc": {"used": quantity, "rev": 1},
+        "$set": {
+            "limit": limit,
+            "updatedAt": utc_now(),
         },
-    )
-    return result.modified_count == 1
+    }
+    query = {
+        "_id": role_name,
+        "$expr": {"$lte": [{"$add": ["$used", quantity]}, limit]},
+    }
+    return query, update
 
 
-def release_committee_quota(role_name, quantity=1):
+def _usage_exists(role_name):
+    return _require_db().committee_quota_usage.find_one({"_id": role_name}, {"_id": 1}) is not None
+
+
+def _reserve_usage(role_name, limit, quantity):
+    """單一職稱扣名額，回傳扣減後的 usage 文件（扣不到為 None）；文件不存在時先初始化（含 orders aggregation）再試一次。"""
     db = _require_db()
-    quantity = max(1, int(quantity or 1))
-    db.committee_quota_usage.update_one(
+    query, update = _reserve_operation(role_name, limit, quantity)
+    doc = db.committee_quota_usage.find_one_and_update(
+        query, update, projection={"used": 1, "rev": 1}, return_document=ReturnDocument.AFTER,
+    )
+    if doc is None and not _usage_exists(role_name):
+        ensure_committee_quota_usage(role_name, limit)
+        query, update = _reserve_operation(role_name, limit, quantity)
+        doc = db.committee_quota_usage.find_one_and_update(
+            query, update, projection={"used": 1, "rev": 1}, return_document=ReturnDocument.AFTER,
+        )
+    return doc
+
+
+def _release_usage(role_name, quantity):
+    return _require_db().committee_quota_usage.find_one_and_update(
         {
             "_id": role_name,
             "used": {"$gte": quantity},
         },
         {
-            "$inc": {"used": -quantity},
+            "$inc": {"used": -quantity, "rev": 1},
             "$set": {"updatedAt": utc_now()},
         },
+        projection={"used": 1, "rev": 1},
+        return_document=ReturnDocument.AFTER,
     )
 
 
+def reserve_committee_quota(role_name, limit, quantity=1):
+    """以單文件 atomic update 扣名額，非 replica set 環境也不會超賣。
+
+    常態只有一次 update；文件不存在時才初始化（含 orders aggregation）後重試。
+    """
+    quantity = max(1, int(quantity or 1))
+    doc = _reserve_usage(role_name, limit, quantity)
+    if doc is None:
+        return False
+    _sync_snapshot_roles([doc])
+    return True
+
+
+def _merge_quota_checks(checks):
+    merged = {}
+    for check in checks:
+        name = check["name"]
+        quantity = max(1, int(check.get("qty", 1) or 1))
+        if name in merged:
+            merged[name]["qty"] += quantity
+        else:
+            merged[name] = {"name": name, "limit": int(check["limit"]), "qty": quantity}
+    return list(merged.values())
+
+
+def reserve_committee_quotas(checks):
+    """多職稱各自以一次 update 扣名額，全部成功才算數。
+
+    回傳額滿的職稱清單；空清單代表全部扣減成功。每個職稱是否扣到直接看自己的更新結果，
+    部分失敗時只回補確定扣成功的職稱；快照一律以最後一次 usage 更新回傳的值同步。
+    """
+    checks = _merge_quota_checks(checks)
+    reserved = []
+    failed = []
+    for check in checks:
+        doc = _reserve_usage(check["name"], check["limit"], check["qty"])
+        if doc is not None:
+            reserved.append((check, doc))
+        else:
+            failed.append(check["name"])
+
+    if failed:
+        rolled_back = [_release_usage(check["name"], check["qty"]) for check, _doc in reserved]
+        _sync_snapshot_roles(rolled_back)
+        return failed
+
+    _sync_snapshot_roles([doc for _check, doc in reserved])
+    return []
+
+
+def release_committee_quota(role_name, quantity=1):
+    quantity = max(1, int(quantity or 1))
+    doc = _release_usage(role_name, quantity)
+    if doc is not None:
+        _sync_snapshot_roles([doc])
+
+
+def release_committee_quotas(role_quantities):
+    """依職稱彙總後一次 bulk_write 補回名額，並以 usage 文件的結果同步快照。"""
+    role_quantities = {name: int(qty) for name, qty in role_quantities.items() if name and int(qty) > 0}
+    if not role_quantities:
+        return
+    db = _require_db()
+    now = utc_now()
+    db.committee_quota_usage.bulk_write([
+        UpdateOne(
+            {"_id": name, "used": {"$gte": qty}},
+            {"$inc": {"used": -qty, "rev": 1}, "$set": {"updatedAt": now}},
+        )
+        for name, qty in role_quantities.items()
+    ], ordered=False)
+
+    # 讀回時 rev 可能已含其他請求的變更，rev 守門確保不會以較舊的值覆寫。
+    _sync_snapshot_roles(_read_usage_docs(list(role_quantities)).values())
+
+
+def committee_release_quantities(orders):
+    """彙總多筆訂單需補回的名額 {職稱: 數量}；只計算仍占用名額的委員會訂單。"""
+    quantities = {}
+    for order in orders:
+        if not order or order.get("orderType") != "committee":
+            continue
+        if order.get("status") not in ACTIVE_COMMITTEE_STATUSES:
+            continue
+        for item in order.get("items", []):
+            role_name = item.get("name")
+            if role_name:
+                quantities[role_name] = quantities.get(role_name, 0) + max(1, int(item.get("qty", 1) or 1))
+    return quantities
+
+
 def release_committee_quota_for_order(order):
     if not order or order.get("orderType") != "committee":
         return
@@ -0,0 +1,82 @@
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.helpers import get_object_id
+from utils.timezone import utc_now
+
+
+EXPORT_BUCKET_NAME = "exports"
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("資料庫尚未連線")
+    return database.db
+
+
+def _bucket():
+    return GridFSBucket(_require_db(), bucket_name=EXPORT_BUCKET_NAME)
+
+
+def create_export_job(kind, params, requested_by):
+    db = _require_db()
+    now = utc_now()
+    job = {
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "requestedBy": requested_by,
+        "rowCount": 0,
+        "totalRows": None,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    db.export_jobs.insert_one(job)
+    return job
+
+
+def find_export_job(job_id):
+    oid = get_object_id(job_id)
+    if not oid:
+        return None
+    return _require_db().export_jobs.find_one({"_id": oid})
+
+
+def claim_export_job(job_id):
+    """queued -> running 原子轉換；Celery 重送或重複派送時只有一個 worker 會拿到。"""
+    now = utc_now()
+    return _require_db().export_jobs.find_one_and_update(
+        {"_id": job_id, "status": "queued"},
+        {"$set": {"status": "running", "startedAt": now, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def fail_stale_export_job(job_id, stale_before):
+    """queued/running 且 updatedAt 早於 stale_before 時轉為 failed；期間有新進度回寫就不動，回傳更新後文件或 None。"""
+    now = utc_now()
+    return _require_db().export_jobs.find_one_and_update(
+        {"_id": job_id, "status": {"$in": ["queued", "running"]}, "updatedAt": {"$lt": stale_before}},
+        {"$set": {"status": "failed", "error": "worker_lost", "finishedAt": now, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def update_export_job(job_id, fields):
+    fields = {**fields, "updatedAt": utc_now()}
+    _require_db().export_jobs.update_one({"_id": job_id}, {"$set": fields})
+
+
+def open_export_upload(filename, metadata=None):
+    """回傳 GridFS 上傳串流；worker 與 web 不同機器時仍可共用匯出檔。"""
+    return _bucket().open_upload_stream(filename, metadata=metadata or {})
+
+
+def open_export_download(file_id):
+    try:
+        return _bucket().open_download_stream(file_id)
+    except NoFile:
+        return None
@@ -0,0 +1,157 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import API_DATE_FORMAT, taipei_day_range_to_utc, to_taipei, utc_now
+
+
+# 沒有 createdAt 或 createdAt 不是日期（舊資料存成字串）的訂單統一歸在這一天；只在不指定日期區間時納入統計。
+UNKNOWN_DAY = "unknown"
+MIN_DAY = "0000-00-00"
+MAX_DAY = "9999-12-31"
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def taipei_day(value):
+    if not isinstance(value, datetime):
+        return UNKNOWN_DAY
+    return to_taipei(value).strftime(API_DATE_FORMAT)
+
+
+def _rollup_id(day, order_type, status):
+    return f"{day}|{order_type}|{status}"
+
+
+def _write_rollups(groups, days, now):
+    """以 upsert 寫入新的統計，再刪掉這些日期已不存在的組合；讀取端不會看到整天被清空。"""
+    db = _require_db()
+    operations = []
+    ids_by_day = {day: [] for day in days}
+    for group in groups:
+        day = group["day"]
+        order_type = group.get("orderType") or "unknown"
+        status = group.get("status") or "unknown"
+        rollup_id = _rollup_id(day, order_type, status)
+        ids_by_day.setdefault(day, []).append(rollup_id)
+        operations.append(UpdateOne(
+            {"_id": rollup_id},
+            {"$set": {
+                "day": day,
+                "orderType": order_type,
+                "status": status,
+                "count": group.get("count", 0),
+                "total": group.get("total", 0),
+                "updatedAt": now,
+            }},
+            upsert=True,
+        ))
+    if operations:
+        db.finance_rollups.bulk_write(operations, ordered=False)
+    for day, ids in ids_by_day.items():
+        db.finance_rollups.delete_many({"day": day, "_id": {"$nin": ids}})
+
+
+def rebuild_all_finance_rollups():
+    """全量重建：第一次啟用或手動修復時使用。"""
+    db = _require_db()
+    now = utc_now()
+    pipeline = [
+        {"$group": {
+            "_id": {
+                # $dateToString 遇到字串會整個聚合失敗，先以 $type 把非日期值歸到 UNKNOWN_DAY。
+                "day": {"$cond": [
+                    {"$eq": [{"$type": "$createdAt"}, "date"]},
+                    {"$dateToString": {"date": "$createdAt", "format": "%Y-%m-%d", "timezone": "Asia/Taipei"}},
+                    UNKNOWN_DAY,
+                ]},
+                "orderType": "$orderType",
+                "status": "$status",
+            },
+            "count": {"$sum": 1},
+            "total": {"$sum": "$total"},
+        }},
+    ]
+    groups = [{**doc["_id"], "count": doc["count"], "total": doc["total"]} for doc in db.orders.aggregate(pipeline)]
+    days = {group["day"] for group in groups}
+    _write_rollups(groups, days, now)
+    db.finance_rollups.delete_many({"day": {"$nin": list(days)}})
+    return len(days)
+
+
+def rebuild_finance_rollup_days(days):
+    """只重算指定台北日期的統計；每天各一次以 createdAt 範圍命中索引的聚合。"""
+    db = _require_db()
+    now = utc_now()
+    groups = []
+    for day in days:
+        if day == UNKNOWN_DAY:
+            match = {"createdAt": {"$not": {"$type": "date"}}}
+        else:
+            start, end = taipei_day_range_to_utc(day)
+            match = {"createdAt": {"$gte": start, "$lt": end}}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"orderType": "$orderType", "status": "$status"},
+                "count": {"$sum": 1},
+                "total": {"$sum": "$total"},
+            }},
+        ]
+        for doc in db.orders.aggregate(pipeline):
+            groups.append({**doc["_id"], "day": day, "count": doc["count"], "total": doc["total"]})
+    _write_rollups(groups, days, now)
+
+
+def find_changed_order_days(since):
+    """watermark 之後新增或異動過的訂單落在哪些台北日期。"""
+    cursor = _require_db().orders.find({"updatedAt": {"$gte": since}}, {"_id": 0, "createdAt": 1})
+    return {taipei_day(doc.get("createdAt")) for doc in cursor}
+
+
+def mark_finance_days_dirty(orders):
+    """刪除訂單不會留下 updatedAt，改由呼叫端記下受影響的日期，留待下次增量更新重算。"""
+    days = {taipei_day(order.get("createdAt")) for order in orders if order}
+    if not days:
+        return
+    now = utc_now()
+    _require_db().finance_rollup_dirty.bulk_write(
+        [UpdateOne({"_id": day}, {"$set": {"markedAt": now}}, upsert=True) for day in days],
+        ordered=False,
+    )
+
+
+def find_dirty_finance_days():
+    """回傳 {day: markedAt}；重算完成後再以 clear_dirty_finance_days 清除。"""
+    docs = _require_db().finance_rollup_dirty.find({}, {"markedAt": 1})
+    return {doc["_id"]: doc.get("markedAt") for doc in docs}
+
+
+def clear_dirty_finance_days(marks):
+    db = _require_db()
+    for day, marked_at in marks.items():
+        # 只刪除讀到的那一次標記；處理期間再被標記的日期會留到下一輪。
+        db.finance_rollup_dirty.delete_one({"_id": day, "markedAt": marked_at})
+
+
+def aggregate_finance_rollups(start_day=None, end_day=None):
+    """以 rollup 彙總類別與狀態的筆數、金額；回傳 [{"_id": {"type", "status"}, "count", "total"}]。"""
+    match = {}
+    if start_day or end_day:
+        # 有指定區間時兩端都補上界限，UNKNOWN_DAY 不會被單邊條件納入。
+        match["day"] = {"$gte": start_day or MIN_DAY, "$lte": end_day or MAX_DAY}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"type": "$orderType", "status": "$status"},
+            "count": {"$sum": "$count"},
+            "total": {"$sum": "$total"},
+        }},
+    ]
+    return list(_require_db().finance_rollups.aggregate(pipeline))
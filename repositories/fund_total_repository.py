@@ -0,0 +1,141 @@
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+# 建廟基金累計金額與設定同放 temple_fund；累計文件用固定 _id，並行 upsert 也只會有一份。
+FUND_TOTAL_ID = "fund_total"
+FUND_TOTAL_TYPE = "fund_total"
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def _is_paid_fund(order):
+    return bool(order) and order.get("orderType") == "fund" and order.get("status") == "paid"
+
+
+def fund_contribution(order):
+    """訂單計入基金累計的金額：只有已付款的 fund 訂單算數，與原本 $sum 聚合一致。"""
+    if not _is_paid_fund(order):
+        return 0
+    total = order.get("total")
+    if isinstance(total, bool) or not isinstance(total, (int, float)):
+        return 0
+    return total
+
+
+def calculate_fund_total():
+    db = _require_db()
+    pipeline = [
+        {"$match": {"status": "paid", "orderType": "fund"}},
+        {"$group": {"_id": None, "amount": {"$sum": "$total"}, "orders": {"$sum": 1}}},
+    ]
+    doc = next(db.orders.aggregate(pipeline), None)
+    if not doc:
+        return 0, 0
+    return doc.get("amount", 0), int(doc.get("orders", 0))
+
+
+def rebuild_fund_total():
+    amount, orders = calculate_fund_total()
+    now = utc_now()
+    db = _require_db()
+    db.temple_fund.update_one(
+        {"_id": FUND_TOTAL_ID},
+        {
+            "$set": {
+                "type": FUND_TOTAL_TYPE,
+                "amount": amount,
+                "paidOrders": orders,
+                "updatedAt": now,
+                "reconciledAt": now,
+            },
+            "$unset": {"pendingDrift": ""},
+        },
+        upsert=True,
+    )
+    # 舊版以 type upsert 時可能留下 ObjectId 主鍵的累計文件，重建後一併清掉。
+    db.temple_fund.delete_many({"type": FUND_TOTAL_TYPE, "_id": {"$ne": FUND_TOTAL_ID}})
+    return amount
+
+
+def get_fund_total():
+    """讀取累計金額；文件不存在（首次上線）時以聚合建立。"""
+    doc = _require_db().temple_fund.find_one({"_id": FUND_TOTAL_ID}, {"amount": 1})
+    if doc is None:
+        return rebuild_fund_total()
+    return doc.get("amount", 0)
+
+
+def adjust_fund_total(amount_delta, order_delta=0):
+    """依訂單狀態轉換 $inc 累計；文件尚未建立時略過，留待第一次讀取以聚合建立。"""
+    if not amount_delta and not order_delta:
+        return
+    _require_db().temple_fund.update_one(
+        {"_id": FUND_TOTAL_ID},
+        {
+            "$inc": {"amount": amount_delta, "paidOrders": order_delta},
+            "$set": {"updatedAt": utc_now()},
+        },
+    )
+
+
+def record_fund_order_change(before, after):
+    """訂單變更前後各自的計入金額相減即為增量；新增或刪除時另一邊傳 None。"""
+    adjust_fund_total(
+        fund_contribution(after) - fund_contribution(before),
+        int(_is_paid_fund(after)) - int(_is_paid_fund(before)),
+    )
+
+
+def record_fund_order_changes(changes):
+    """多筆 (before, after) 變更合併成一次 $inc；批次確認收款時使用。"""
+    amount_delta = 0
+    order_delta = 0
+    for before, after in changes:
+        amount_delta += fund_contribution(after) - fund_contribution(before)
+        order_delta += int(_is_paid_fund(after)) - int(_is_paid_fund(before))
+    adjust_fund_total(amount_delta, order_delta)
+
+
+def reconcile_fund_total():
+    """以聚合結果核對累計文件，誤差連續兩輪相同才修正。
+
+    訂單已改、$inc 尚未落地時聚合會先看到差額，第一次只記錄在 pendingDrift 不覆寫；
+    下一輪差額仍相同（且累計文件未被 $inc 改動）才視為真正的誤差寫回聚合結果。
+    回傳 {"amount", "previous", "drift", "corrected"}。
+    """
+    db = _require_db()
+    doc = db.temple_fund.find_one({"_id": FUND_TOTAL_ID}, {"amount": 1, "paidOrders": 1, "pendingDrift": 1})
+    if doc is None:
+        amount = rebuild_fund_total()
+        return {"amount": amount, "previous": None, "drift": 0, "corrected": True}
+
+    previous = doc.get("amount", 0)
+    previous_orders = doc.get("paidOrders")
+    amount, orders = calculate_fund_total()
+    drift = amount - previous
+    now = utc_now()
+    guard = {"_id": FUND_TOTAL_ID, "amount": previous, "paidOrders": previous_orders}
+    if not drift and previous_orders == orders:
+        db.temple_fund.update_one({"_id": FUND_TOTAL_ID}, {"$set": {"reconciledAt": now}, "$unset": {"pendingDrift": ""}})
+        return {"amount": amount, "previous": previous, "drift": 0, "corrected": False}
+
+    observed = {"amount": drift, "paidOrders": orders - int(previous_orders or 0)}
+    if doc.get("pendingDrift") == observed:
+        result = db.temple_fund.update_one(
+            guard,
+            {
+                "$set": {"amount": amount, "paidOrders": orders, "updatedAt": now, "reconciledAt": now},
+                "$unset": {"pendingDrift": ""},
+            },
+        )
+        corrected = result.modified_count > 0
+    else:
+        db.temple_fund.update_one(guard, {"$set": {"pendingDrift": observed, "reconciledAt": now}})
+        corrected = False
+    return {"amount": amount, "previous": previous, "drift": drift, "corrected": corrected}
@@ -1,5 +1,15 @@
+import heapq
+from datetime import datetime
+
 import database
 from utils.errors import ServiceUnavailableError
+from utils.pagination import keyset_predicate
+from utils.timezone import ensure_aware_utc
+
+
+HISTORY_EXPORT_BATCH_SIZE = 500
+HISTORY_KEYSET_SORT = [("createdAt", -1), ("_id", -1)]
+NEVER_MATCH = "never_match"
 
 
 def _require_db():
@@ -8,9 +18,9 @@ def _require_db():
     return database.db
 
 
-def get_paginated_history(orders_match, feedback_match, skip, per_page):
-    db = _require_db()
-    pipeline = [
+def _history_union_stages(orders_match, feedback_match):
+    """orders + feedback 合併後依 createdAt 排序的共用前段 pipeline。"""
+    return [
         {"$match": orders_match},
         {"$addFields": {
             "_docType": "order",
@@ -32,6 +42,12 @@ def get_paginated_history(orders_match, feedback_match, skip, per_page):
             ],
         }},
         {"$sort": {"createdAt": -1}},
+    ]
+
+
+def get_paginated_history(orders_match, feedback_match, skip, per_page):
+    db = _require_db()
+    pipeline = _history_union_stages(orders_match, feedback_match) + [
         {"$facet": {
             "results": [
                 {"$skip": skip},
@@ -47,3 +63,77 @@ def get_paginated_history(orders_match, feedback_match, skip, per_page):
     count = result.get("count", [])
     total = count[0]["total"] if count else 0
     return results, total
+
+
+def iter_history(orders_match, feedback_match, batch_size=HISTORY_EXPORT_BATCH_SIZE):
+    """匯出用原始 cursor：不經 $facet/$count，逐批取回避免整份結果塞進單一文件。"""
+    db = _require_db()
+    return db.orders.aggregate(
+        _history_union_stages(orders_match, feedback_match),
+        allowDiskUse=True,
+        batchSize=batch_size,
+    )
+
+
+def _with_keyset(match, after):
+    if after is None:
+        return match
+    if not match:
+        return keyset_predicate("createdAt", after)
+    return {"$and": [match, keyset_predicate("createdAt", after)]}
+
+
+def _as_feedback_history_doc(doc):
+    """與 $unionWith 子 pipeline 的 $addFields 相同的欄位轉換。"""
+    real_name = doc.get("realName")
+    doc["_docType"] = "feedback"
+    doc["orderType"] = "feedback"
+    doc["orderId"] = doc.get("feedbackId")
+    doc["customer"] = {"name": real_name if real_name is not None else doc.get("nickname")}
+    doc["total"] = 0
+    return doc
+
+
+def history_sort_key(doc):
+    """與 MongoDB 的排序一致：日期 > 字串 > 沒有 createdAt，同值再比 _id。"""
+    created_at = doc.get("createdAt")
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is not None:
+            created_at = ensure_aware_utc(created_at).replace(tzinfo=None)
+        return 2, created_at, doc["_id"]
+    if isinstance(created_at, str):
+        return 1, created_at, doc["_id"]
+    return 0, "", doc["_id"]
+
+
+def merge_history_streams(order_docs, feedback_docs, limit):
+    """兩邊各自已依 (createdAt, _id) 由新到舊排序，直接 merge 取前 limit 筆。"""
+    merged = heapq.merge(order_docs, feedback_docs, key=history_sort_key, reverse=True)
+    return [doc for _, doc in zip(range(limit), merged)]
+
+
+def get_history_page_after(orders_match, feedback_match, after, limit):
+    """Keyset 分頁：範圍條件下推到兩個子查詢，各取 limit 筆後 merge，不做 $skip/$count。"""
+    db = _require_db()
+    order_docs = []
+    if orders_match.get("_id") != NEVER_MATCH:
+        order_docs = db.orders.find(_with_keyset(orders_match, after)).sort(HISTORY_KEYSET_SORT).limit(limit)
+        order_docs = ({**doc, "_docType": "order"} for doc in order_docs)
+
+    feedback_docs = []
+    if feedback_match.get("_id") != NEVER_MATCH:
+        feedback_docs = db.feedback.find(_with_keyset(feedback_match, after)).sort(HISTORY_KEYSET_SORT).limit(limit)
+        feedback_docs = (_as_feedback_history_doc(doc) for doc in feedback_docs)
+
+    return merge_history_streams(order_docs, feedback_docs, limit)
+
+
+def count_history(orders_match, feedback_match):
+    db = _require_db()
+    total = 0
+    for collection, match in ((db.orders, orders_match), (db.feedback, feedback_match)):
+        if match.get("_id") == NEVER_MATCH:
+            continue
+        # 無篩選條件時直接讀 collection metadata，避免全表計數。
+        total += collection.estimated_document_count() if not match else collection.count_documents(match)
+    return total
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def get_job_state(job_name):
+    return _require_db().job_state.find_one({"_id": job_name})
+
+
+def mark_job_completed(job_name, fields=None):
+    """一次性作業（例如回填）完成後留下 completedAt，讀取端據此切換到新的查詢方式。"""
+    now = utc_now()
+    _require_db().job_state.update_one(
+        {"_id": job_name},
+        {"$set": {**(fields or {}), "completedAt": now, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+        upsert=True,
+    )
+
+
+def acquire_job_lease(job_name, owner, lease_seconds):
+    """取得背景作業的租約；他人租約未過期時回傳 None，避免 beat 與手動觸發同時執行。"""
+    db = _require_db()
+    now = utc_now()
+    try:
+        return db.job_state.find_one_and_update(
+            {
+                "_id": job_name,
+                "$or": [
+                    {"leaseUntil": {"$lt": now}},
+                    {"leaseUntil": None},
+                    {"leaseOwner": owner},
+                ],
+            },
+            {
+                "$set": {
+                    "leaseOwner": owner,
+                    "leaseUntil": now + timedelta(seconds=lease_seconds),
+                    "updatedAt": now,
+                },
+                "$setOnInsert": {"createdAt": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return None
+
+
+def update_job_state(job_name, owner, fields=None, unset=None, lease_seconds=None):
+    """更新作業進度；只有持有租約者可以寫入。"""
+    db = _require_db()
+    now = utc_now()
+    update = {"$set": {**(fields or {}), "updatedAt": now}}
+    if lease_seconds:
+        update["$set"]["leaseUntil"] = now + timedelta(seconds=lease_seconds)
+    if unset:
+        update["$unset"] = {key: "" for key in unset}
+    result = db.job_state.update_one({"_id": job_name, "leaseOwner": owner}, update)
+    return result.matched_count == 1
+
+
+def release_job_lease(job_name, owner, fields=None):
+    db = _require_db()
+    db.job_state.update_one(
+        {"_id": job_name, "leaseOwner": owner},
+        {
+            "$set": {**(fields or {}), "updatedAt": utc_now()},
+            "$unset": {"leaseOwner": "", "leaseUntil": ""},
+        },
+    )
@@ -0,0 +1,111 @@
+import re
+from collections import Counter
+
+from pymongo import UpdateOne
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.pagination import keyset_predicate
+from utils.search_tokens import normalize_search_text
+
+
+MEMBER_PROJECTION = {
+    "displayName": 1,
+    "lineId": 1,
+    "lastLoginAt": 1,
+    "createdAt": 1,
+    "pictureUrl": 1,
+    "realName": 1,
+    "orderCount": 1,
+    "feedbackCount": 1,
+}
+MEMBER_KEYSET_SORT = [("lastLoginAt", -1), ("_id", -1)]
+# displayName / realName 正規化後的副本（NFKC、不分大小寫、去空白），供會員搜尋以前綴比對。
+SEARCH_DISPLAY_NAME_FIELD = "searchDisplayName"
+SEARCH_REAL_NAME_FIELD = "searchRealName"
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def find_members_page(search, after, limit):
+    """會員名單 keyset 分頁；search 以前綴比對暱稱、真實姓名與 Line ID，可命中索引。
+
+    姓名比對正規化欄位，不分大小寫與全半形；尚未回填正規化欄位的舊文件仍以原始欄位前綴比對。
+    """
+    conditions = []
+    if search:
+        prefix = {"$regex": f"^{re.escape(search)}"}
+        clauses = [{"displayName": prefix}, {"realName": prefix}, {"lineId": prefix}]
+        key = normalize_search_text(search)
+        if key:
+            normalized = {"$regex": f"^{re.escape(key)}"}
+            clauses += [{SEARCH_DISPLAY_NAME_FIELD: normalized}, {SEARCH_REAL_NAME_FIELD: normalized}]
+        conditions.append({"$or": clauses})
+    if after is not None:
+        conditions.append(keyset_predicate("lastLoginAt", after))
+
+    query = {}
+    if len(conditions) == 1:
+        query = conditions[0]
+    elif conditions:
+        query = {"$and": conditions}
+    return list(_require_db().users.find(query, MEMBER_PROJECTION).sort(MEMBER_KEYSET_SORT).limit(limit))
+
+
+def member_search_fields(display_name=None, real_name=None):
+    """寫入 displayName / realName 時一併 $set 的正規化欄位；只帶入這次有寫的欄位。"""
+    fields = {}
+    if display_name is not None:
+        fields[SEARCH_DISPLAY_NAME_FIELD] = normalize_search_text(display_name)
+    if real_name is not None:
+        fields[SEARCH_REAL_NAME_FIELD] = normalize_search_text(real_name)
+    return fields
+
+
+def _adjust_member_counter(field, docs, sign):
+    deltas = Counter(
+        doc["lineId"]
+        for doc in docs
+        if doc and isinstance(doc.get("lineId"), str) and doc["lineId"]
+    )
+    if not deltas:
+        return
+    _require_db().users.bulk_write(
+        [UpdateOne({"lineId": line_id}, {"$inc": {field: sign * count}}) for line_id, count in deltas.items()],
+        ordered=False,
+    )
+
+
+def record_member_orders(orders, sign=1):
+    """訂單新增 (sign=1) 或刪除 (sign=-1) 時同步 users.orderCount。"""
+    _adjust_member_counter("orderCount", orders, sign)
+
+
+def record_member_feedback(feedbacks, sign=1):
+    _adjust_member_counter("feedbackCount", feedbacks, sign)
+
+
+def count_activity_by_line_id(collection_name):
+    pipeline = [
+        {"$match": {"lineId": {"$type": "string"}}},
+        {"$group": {"_id": "$lineId", "count": {"$sum": 1}}},
+    ]
+    collection = _require_db()[collection_name]
+    return {doc["_id"]: doc["count"] for doc in collection.aggregate(pipeline, allowDiskUse=True)}
+
+
+def set_member_counts(counts):
+    """counts: {lineId: (orderCount, feedbackCount)}；供回填腳本批次覆寫。"""
+    if not counts:
+        return
+    _require_db().users.bulk_write(
+        [
+            UpdateOne({"lineId": line_id}, {"$set": {"orderCount": orders, "feedbackCount": feedback}})
+            for line_id, (orders, feedback) in counts.items()
+        ],
+        ordered=False,
+    )
@@ -21,15 +21,36 @@ def find_finance_pending_orders(limit=None):
     return list(cursor)
 
 
-def aggregate_finance_summary():
-    """彙總訂單類別與狀態的筆數、金額，封裝 MongoDB aggregation 細節。"""
-    pipeline = [
-        {
-            "$group": {
-                "_id": {"type": "$orderType", "status": "$status"},
-                "count": {"$sum": 1},
-                "total": {"$sum": "$total"},
-            }
-        }
-    ]
-    return list(_orders_collection().aggregate(pipeline))
+PAYMENT_MATCH_PROJECTION = {
+    "orderId": 1,
+    "orderType": 1,
+    "total": 1,
+    "createdAt": 1,
+    "customer.name": 1,
+    "customer.last5": 1,
+}
+
+
+def iter_pending_payment_orders(batch_size=1000):
+    """對帳用：只取比對需要的欄位，分批讀取全部待收款訂單。"""
+    return _orders_collection().find({"status": "pending"}, PAYMENT_MATCH_PROJECTION).batch_size(batch_size)
+
+
+def donation_report_query(order_type, updated_range=None):
+    query = {"orderType": order_type, "status": "paid"}
+    if updated_range:
+        query["updatedAt"] = updated_range
+    return query
+
+
+def iter_donation_report_orders(query, batch_size=500):
+    """稟報清單依付款（updatedAt）順序串流，不一次載入全部訂單。"""
+    return _orders_collection().find(query).sort("updatedAt", 1).batch_size(batch_size)
+
+
+def count_orders(query):
+    return _orders_collection().count_documents(query)
+
+
+def has_orders(query):
+    return _orders_collection().find_one(query, {"_id": 1}) is not None
@@ -0,0 +1,117 @@
+from pymongo.errors import DuplicateKeyError
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.helpers import mask_name
+from utils.timezone import utc_now
+
+
+PICKUP_TYPES = ("self", "delivery")
+CALENDAR_WRITE_ATTEMPTS = 5
+PICKUP_SOURCE_PROJECTION = {
+    "pickupDate": 1,
+    "pickupType": 1,
+    "clothes.clothId": 1,
+    "clothes.name": 1,
+    "clothes.birthYear": 1,
+}
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def _empty_day(day):
+    return {"date": day, **{pickup_type: [] for pickup_type in PICKUP_TYPES}}
+
+
+def _add_pickup(calendar_day, doc):
+    """與原本公開行事曆相同：姓名遮罩後依取件方式分組，沒有衣服的預約不列出。"""
+    masked_clothes = [
+        {
+            "clothId": c.get('clothId', ''),
+            "name": mask_name(c.get('name', '')),
+            "birthYear": c.get('birthYear', ''),
+        }
+        for c in doc.get('clothes', [])
+    ]
+    if masked_clothes:
+        calendar_day.setdefault(doc.get('pickupType'), []).append({"clothes": masked_clothes})
+
+
+def _read_revisions(query):
+    """回傳 {日期: rev}；舊文件沒有 rev 時為 None。必須在讀預約之前取得。"""
+    cursor = _require_db().pickup_calendar.find(query, {"rev": 1})
+    return {doc["_id"]: doc.get("rev") for doc in cursor}
+
+
+def _build_days(query):
+    days_map = {}
+    cursor = _require_db().pickups.find(query, PICKUP_SOURCE_PROJECTION).sort("_id", 1)
+    for doc in cursor:
+        day = doc['pickupDate']
+        _add_pickup(days_map.setdefault(day, _empty_day(day)), doc)
+    return days_map
+
+
+def _write_days(days_map, days, revisions):
+    """以讀取時的 rev 為條件逐日寫入並把 rev 加一，回傳期間被其他程序改過、需要重算的日期。
+
+    當天已無預約時寫成空的一天而不刪除文件，rev 才不會歸零讓較舊的結果又寫得進去。
+    """
+    db = _require_db()
+    now = utc_now()
+    conflicts = []
+    for day in days:
+        calendar_day = days_map.get(day) or _empty_day(day)
+        if day in revisions:
+            result = db.pickup_calendar.update_one(
+                {"_id": day, "rev": revisions[day]},
+                {"$set": {**calendar_day, "updatedAt": now}, "$inc": {"rev": 1}},
+            )
+            if result.matched_count == 0:
+                conflicts.append(day)
+        elif any(calendar_day.get(t) for t in PICKUP_TYPES):
+            try:
+                db.pickup_calendar.insert_one({"_id": day, **calendar_day, "rev": 1, "updatedAt": now})
+            except DuplicateKeyError:
+                conflicts.append(day)
+    return conflicts
+
+
+def refresh_pickup_calendar_days(days):
+    """只重算指定日期；預約新增或刪除時呼叫，成本只與當天預約數有關。
+
+    寫入時有其他程序搶先更新同一天就重讀重算；重試仍失敗的日期回傳給呼叫端。
+    """
+    days = sorted({day for day in days if day})
+    for _attempt in range(CALENDAR_WRITE_ATTEMPTS):
+        if not days:
+            break
+        revisions = _read_revisions({"_id": {"$in": days}})
+        days = _write_days(_build_days({"pickupDate": {"$in": days}}), days, revisions)
+    return days
+
+
+def rebuild_pickup_calendar(from_day):
+    """以 from_day 之後的預約全量重建；較早的日期不會再被公開查詢，一併清掉。"""
+    db = _require_db()
+    revisions = _read_revisions({"_id": {"$gte": from_day}})
+    days_map = _build_days({"pickupDate": {"$gte": from_day}})
+    conflicts = _write_days(days_map, sorted(set(days_map) | set(revisions)), revisions)
+    if conflicts:
+        refresh_pickup_calendar_days(conflicts)
+    db.pickup_calendar.delete_many({"_id": {"$lt": from_day}})
+    return len(days_map)
+
+
+def find_pickup_calendar(from_day):
+    """回傳 from_day 起的每日行事曆；筆數只與日期數有關。"""
+    cursor = _require_db().pickup_calendar.find({"_id": {"$gte": from_day}}, {"updatedAt": 0, "rev": 0}).sort("_id", 1)
+    return [
+        {"date": doc["_id"], **{pickup_type: doc.get(pickup_type, []) for pickup_type in PICKUP_TYPES}}
+        for doc in cursor
+        if any(doc.get(pickup_type) for pickup_type in PICKUP_TYPES)
+    ]
@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def lock_expires_at(pickup_date):
+    """鎖定到取件日隔天；格式錯誤時丟出 ValueError。"""
+    return datetime.strptime(pickup_date, '%Y-%m-%d') + timedelta(days=1)
+
+
+def _insert_locks(cloth_ids, line_id, pickup_date, expires_at, token, now):
+    """insert_many(ordered=False) 一次寫入；回傳撞到唯一鍵的 clothId 集合。"""
+    docs = [
+        {
+            "clothId": cloth_id,
+            "lineId": line_id,
+            "pickupDate": pickup_date,
+            "token": token,
+            "createdAt": now,
+            "expiresAt": expires_at,
+        }
+        for cloth_id in cloth_ids
+    ]
+    try:
+        _require_db().pickup_cloth_locks.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        return {cloth_ids[error["index"]] for error in errors}
+    return set()
+
+
+def acquire_cloth_locks(cloth_ids, line_id, pickup_date, expires_at):
+    """批次鎖定衣服編號；全部成功回傳 (token, [])，否則回補本次已鎖的編號並回傳 (None, 衝突編號)。
+
+    過期的鎖由 TTL index 清除，但 TTL 約每分鐘才執行一次；只有撞到衝突時才針對衝突編號清掉已過期的鎖再試一次。
+    """
+    db = _require_db()
+    token = uuid.uuid4().hex
+    now = utc_now()
+    conflicts = _insert_locks(cloth_ids, line_id, pickup_date, expires_at, token, now)
+    if conflicts:
+        swept = db.pickup_cloth_locks.delete_many({
+            "clothId": {"$in": list(conflicts)},
+            "expiresAt": {"$lt": now},
+        })
+        if swept.deleted_count:
+            retry_ids = [cloth_id for cloth_id in cloth_ids if cloth_id in conflicts]
+            conflicts = _insert_locks(retry_ids, line_id, pickup_date, expires_at, token, now)
+
+    if conflicts:
+        release_cloth_locks(token)
+        return None, [cloth_id for cloth_id in cloth_ids if cloth_id in conflicts]
+    return token, []
+
+
+def release_cloth_locks(token):
+    """只刪除帶有本次 token 的鎖，不會動到同一使用者其他預約的鎖。"""
+    _require_db().pickup_cloth_locks.delete_many({"token": token})
+
+
+def release_pickup_locks(cloth_ids, line_id):
+    _require_db().pickup_cloth_locks.delete_many({
+        "clothId": {"$in": cloth_ids},
+        "lineId": line_id,
+    })
+
+
+def backfill_pickup_locks(pickups):
+    """為既有預約補上鎖定文件；已存在的鎖保留不動。回傳新增筆數。"""
+    db = _require_db()
+    now = utc_now()
+    created = 0
+    for pickup in pickups:
+        try:
+            expires_at = lock_expires_at(pickup.get('pickupDate') or '')
+        except ValueError:
+            continue
+        cloth_ids = [item.get('clothId') for item in pickup.get('clothes', []) if item.get('clothId')]
+        if not cloth_ids:
+            continue
+        existing = {
+            doc["clothId"]
+            for doc in db.pickup_cloth_locks.find({"clothId": {"$in": cloth_ids}}, {"clothId": 1})
+        }
+        missing = [cloth_id for cloth_id in dict.fromkeys(cloth_ids) if cloth_id not in existing]
+        if not missing:
+            continue
+        conflicts = _insert_locks(missing, pickup.get('lineId'), pickup['pickupDate'], expires_at, None, now)
+        created += len(missing) - len(conflicts)
+    return created
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+
+# 程式實際送出的查詢形狀，給 scripts/index_advisor.py 逐一 explain，判斷 INDEX_SPECS 中每個索引是否有人用。
+# 新增或修改 find / count / aggregate $match 時請同步登記；值只需型別正確的代表值。
+# 格式：(collection, 名稱, filter, sort, 呼叫位置)
+_SINCE = datetime(2024, 1, 1)
+_UNTIL = datetime(2024, 2, 1)
+_LINE_ID = "U0000000000000000000000000000000"
+_DONATION_TYPES = {"$in": ["donation", "fund", "committee"]}
+
+QUERY_SHAPES = (
+    # orders
+    ('orders', 'order_by_order_id', {'orderId': 'D202401010001'}, None, 'tasks/notifications.py _find_order'),
+    ('orders', 'shop_orders_page', {'orderType': 'shop'}, [('createdAt', DESCENDING)], 'services/order_service.py list_shop_orders'),
+    ('orders', 'admin_donations_page', {'orderType': _DONATION_TYPES, 'status': 'paid'}, [('is_reported', ASCENDING), ('createdAt', DESCENDING)], 'services/order_service.py list_admin_donations'),
+    ('orders', 'admin_donations_reported', {'orderType': 'donation', 'status': 'paid', 'is_reported': False, 'createdAt': {'$gte': _SINCE, '$lt': _UNTIL}}, [('is_reported', ASCENDING), ('createdAt', DESCENDING)], 'blueprints/orders.py get_admin_donations'),
+    ('orders', 'public_donations', {'orderType': 'donation', 'status': 'paid'}, [('updatedAt', DESCENDING)], 'blueprints/orders.py get_public_donations'),
+    ('orders', 'public_donations_all', {'orderType': _DONATION_TYPES, 'status': 'paid'}, [('updatedAt', DESCENDING)], 'blueprints/orders.py get_public_donations'),
+    ('orders', 'donation_report', {'orderType': 'donation', 'status': 'paid', 'updatedAt': {'$gte': _SINCE, '$lt': _UNTIL}}, [('updatedAt', ASCENDING)], 'repositories/order_repository.py iter_donation_report_orders'),
+    ('orders', 'unreported_donations', {'status': 'paid', 'orderType': 'donation', 'is_reported': {'$ne': True}}, [('paidAt', ASCENDING)], 'blueprints/admin/routes.py get_print_queue'),
+    ('orders', 'ship_queue', {'status': 'paid', 'orderType': 'shop'}, [('paidAt', ASCENDING)], 'blueprints/admin/routes.py get_ship_queue'),
+    ('orders', 'shipped_list', {'status': 'shipped', 'shippedAt': {'$gte': _SINCE}}, [('shippedAt', DESCENDING)], 'blueprints/admin/routes.py get_shipped_list'),
+    ('orders', 'shipped_cleanup', {'status': 'shipped', 'shippedAt': {'$lt': _SINCE}}, None, 'blueprints/orders.py cleanup_shipped_orders'),
+    ('orders', 'finance_pending', {'status': 'pending'}, [('createdAt', DESCENDING)], 'repositories/order_repository.py find_finance_pending_orders'),
+    ('orders', 'unpaid_cleanup', {'status': 'pending', 'createdAt': {'$lt': _SINCE}}, [('createdAt', ASCENDING), ('_id', ASCENDING)], 'services/cleanup_service.py cleanup_unpaid_orders'),
+    ('orders', 'finance_changed_days', {'updatedAt': {'$gte': _SINCE}}, None, 'repositories/finance_rollup_repository.py find_changed_order_days'),
+    ('orders', 'finance_rollup_day', {'createdAt': {'$gte': _SINCE, '$lt': _UNTIL}}, None, 'repositories/finance_rollup_repository.py rebuild_finance_rollup_days'),
+    ('orders', 'fund_total', {'status': 'paid', 'orderType': 'fund'}, None, 'repositories/fund_total_repository.py calculate_fund_total'),
+    ('orders', 'committee_usage', {'orderType': 'committee', 'status': {'$in': ['pending', 'paid']}, 'items.name': '主任委員'}, None, 'repositories/committee_quota_repository.py calculate_committee_usage'),
+    ('orders', 'user_shop_orders', {'lineId': _LINE_ID, 'orderType': 'shop'}, [('createdAt', DESCENDING)], 'blueprints/user.py get_user_orders'),
+    ('orders', 'user_donations', {'lineId': _LINE_ID, 'orderType': _DONATION_TYPES}, [('createdAt', DESCENDING)], 'blueprints/user.py get_user_donations'),
+    ('orders', 'user_fund_summary', {'lineId': _LINE_ID, 'orderType': 'fund', 'status': 'paid'}, None, 'blueprints/user.py get_user_fund_summary'),
+    ('orders', 'user_committee_titles', {'lineId': _LINE_ID, 'orderType': 'committee', 'status': 'paid'}, None, 'repositories/user_summary_repository.py find_paid_committee_item_names'),
+    ('orders', 'member_orders', {'lineId': _LINE_ID}, [('createdAt', DESCENDING)], 'blueprints/admin/routes.py get_member_history'),
+    ('orders', 'history_page', {}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+    ('orders', 'history_by_type', {'orderType': 'donation', 'createdAt': {'$gte': _SINCE, '$lt': _UNTIL}}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+    ('orders', 'history_by_type_status', {'orderType': 'donation', 'status': 'paid'}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+    ('orders', 'history_search', {'searchTokens': {'$all': ['abc']}}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+    ('orders', 'pending_payment_match', {'status': 'pending'}, None, 'repositories/order_repository.py iter_pending_payment_orders'),
+
+    # feedback
+    ('feedback', 'feedback_by_id', {'feedbackId': 'FB202401010001'}, None, 'tasks/notifications.py _find_feedback'),
+    ('feedback', 'public_feedback', {'status': {'$in': ['approved', 'sent']}}, [('approvedAt', DESCENDING)], 'blueprints/main.py _load_public_feedbacks'),
+    ('feedback', 'feedback_pending', {'status': 'pending'}, [('createdAt', ASCENDING)], 'blueprints/feedback.py get_pending_feedback'),
+    ('feedback', 'feedback_approved', {'status': 'approved'}, [('approvedAt', DESCENDING)], 'blueprints/feedback.py get_admin_approved_feedback'),
+    ('feedback', 'feedback_sent', {'status': 'sent'}, [('sentAt', DESCENDING)], 'blueprints/feedback.py get_sent_feedback'),
+    ('feedback', 'user_feedback', {'lineId': _LINE_ID}, [('createdAt', DESCENDING)], 'blueprints/user.py get_user_feedbacks'),
+    ('feedback', 'user_sent_feedback', {'lineId': _LINE_ID, 'status': 'sent'}, None, 'repositories/user_summary_repository.py count_sent_feedback'),
+    ('feedback', 'history_feedback', {}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+    ('feedback', 'history_feedback_search', {'searchTokens': {'$all': ['abc']}}, [('createdAt', DESCENDING), ('_id', DESCENDING)], 'repositories/history_repository.py get_history_page_after'),
+
+    # users / admin
+    ('users', 'user_by_line_id', {'lineId': _LINE_ID}, None, 'repositories/user_summary_repository.py find_user_by_line_id'),
+    ('users', 'members_page', {}, [('lastLoginAt', DESCENDING), ('_id', DESCENDING)], 'repositories/member_repository.py find_members_page'),
+    ('users', 'members_by_display_name', {'displayName': {'$regex': '^abc'}}, None, 'repositories/member_repository.py find_members_page'),
+    ('users', 'members_by_real_name', {'realName': {'$regex': '^abc'}}, None, 'repositories/member_repository.py find_members_page'),
+    ('users', 'members_by_search_display_name', {'searchDisplayName': {'$regex': '^abc'}}, None, 'repositories/member_repository.py find_members_page'),
+    ('users', 'members_by_search_real_name', {'searchRealName': {'$regex': '^abc'}}, None, 'repositories/member_repository.py find_members_page'),
+    ('admin_users', 'admin_by_username', {'username': 'admin'}, None, 'services/auth_service.py authenticate_admin'),
+
+    # 設定與內容
+    ('settings', 'settings_by_type', {'type': 'committee_quota'}, None, 'services/committee_service.py'),
+    ('temple_fund', 'temple_fund_by_type', {'type': 'main_fund'}, None, 'blueprints/content.py get_fund_settings'),
+    ('products', 'products_active', {'isActive': True}, [('category', ASCENDING), ('createdAt', DESCENDING)], 'blueprints/content.py get_products'),
+    ('products', 'products_all', {}, [('category', ASCENDING), ('createdAt', DESCENDING)], 'blueprints/content.py get_admin_products'),
+    ('announcements', 'announcements_home', {}, [('isPinned', DESCENDING), ('date', DESCENDING)], 'blueprints/main.py _load_home_announcements'),
+    ('announcements', 'announcements_list', {}, [('isPinned', DESCENDING), ('_id', DESCENDING)], 'blueprints/content.py get_announcements'),
+    ('faq', 'faq_list', {}, [('isPinned', DESCENDING), ('createdAt', DESCENDING)], 'blueprints/main.py _load_faqs'),
+    ('faq', 'faq_by_category', {'category': '一般'}, [('isPinned', DESCENDING), ('createdAt', DESCENDING)], 'blueprints/content.py get_faqs'),
+    ('audit_log', 'audit_log_recent', {}, [('timestamp', DESCENDING)], 'blueprints/admin/routes.py get_audit_log'),
+    ('export_jobs', 'export_jobs_recent', {}, [('createdAt', DESCENDING)], 'repositories/export_job_repository.py'),
+
+    # 寄衣
+    ('pickups', 'pickups_by_days', {'pickupDate': {'$in': ['2024-01-01']}}, [('_id', ASCENDING)], 'repositories/pickup_calendar_repository.py refresh_pickup_calendar_days'),
+    ('pickups', 'pickups_from_day', {'pickupDate': {'$gte': '2024-01-01'}}, [('_id', ASCENDING)], 'repositories/pickup_calendar_repository.py rebuild_pickup_calendar'),
+    ('pickups', 'user_pickups', {'lineId': _LINE_ID}, [('pickupDate', DESCENDING)], 'blueprints/user.py get_user_pickups'),
+    ('pickups', 'pickups_by_cloth', {'clothes.clothId': 'A001', 'pickupDate': {'$gte': '2024-01-01'}}, None, 'scripts/backfill_pickup_locks.py'),
+    ('pickup_cloth_locks', 'cloth_locks_by_id', {'clothId': {'$in': ['A001']}}, None, 'repositories/pickup_lock_repository.py'),
+    ('shipments', 'shipments_range', {'pickupDate': {'$gte': '2024-01-01', '$lte': '2024-01-31'}}, [('pickupDate', ASCENDING)], 'blueprints/content.py get_ship_clothes_list'),
+    ('store_cache', 'fresh_stores', {'_id': {'$in': ['123456']}, 'expiresAt': {'$gt': _SINCE}}, None, 'repositories/store_cache_repository.py find_fresh_store_ids'),
+    ('committee_quota_usage', 'quota_usage_by_role', {'_id': {'$in': ['主任委員']}}, None, 'repositories/committee_quota_repository.py'),
+    ('finance_rollups', 'finance_rollup_days', {'day': {'$gte': '2024-01-01', '$lte': '2024-01-31'}}, None, 'repositories/finance_rollup_repository.py aggregate_finance_rollups'),
+)
@@ -11,8 +11,11 @@ def _require_db():
     return database.db
 
 
-def next_counter_value(counter_key, metadata=None):
-    """以 MongoDB 單筆文件原子遞增，提供跨程序安全的流水號。"""
+def next_counter_value(counter_key, metadata=None, increment=1):
+    """以 MongoDB 單筆文件原子遞增，提供跨程序安全的流水號。
+
+    increment > 1 時一次保留一段號碼，回傳值為該段的最後一號。
+    """
     db = _require_db()
     now = utc_now()
     set_on_insert = {
@@ -22,7 +25,7 @@ def next_counter_value(counter_key, metadata=None):
     doc = db.counters.find_one_and_update(
         {"_id": counter_key},
         {
-            "$inc": {"seq": 1},
+            "$inc": {"seq": int(increment)},
             "$set": {"updatedAt": now},
             "$setOnInsert": set_on_insert,
         },
@@ -30,3 +33,17 @@ def next_counter_value(counter_key, metadata=None):
         return_document=ReturnDocument.AFTER,
     )
     return int(doc.get("seq", 0))
+
+
+def record_counter_waste(counter_key, count):
+    """記錄預留後未使用的號碼數，供觀察區塊大小是否合適。"""
+    if count <= 0:
+        return
+    db = _require_db()
+    db.counters.update_one(
+        {"_id": counter_key},
+        {
+            "$inc": {"wasted": int(count)},
+            "$set": {"updatedAt": utc_now()},
+        },
+    )
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def find_cached_store(store_id):
+    """回傳 {"store": dict 或 None}；查無快取或已過期（TTL 尚未清除）回傳 None。"""
+    doc = _require_db().store_cache.find_one(
+        {"_id": store_id, "expiresAt": {"$gt": utc_now()}},
+        {"store": 1, "found": 1},
+    )
+    if doc is None:
+        return None
+    return {"store": doc.get("store") if doc.get("found") else None}
+
+
+def save_cached_store(store_id, store, ttl_seconds):
+    """store 為 None 代表 PCSC 查無此店號（negative cache）。"""
+    now = utc_now()
+    _require_db().store_cache.update_one(
+        {"_id": store_id},
+        {"$set": {
+            "store": store,
+            "found": store is not None,
+            "fetchedAt": now,
+            "expiresAt": now + timedelta(seconds=ttl_seconds),
+        }},
+        upsert=True,
+    )
+
+
+def find_fresh_store_ids(store_ids):
+    cursor = _require_db().store_cache.find(
+        {"_id": {"$in": list(store_ids)}, "expiresAt": {"$gt": utc_now()}},
+        {"_id": 1},
+    )
+    return {doc["_id"] for doc in cursor}
+
+
+def find_order_store_infos(batch_size=1000):
+    """7-11 取貨訂單填寫的門市資訊，供預熱快取時擷取店號。"""
+    return _require_db().orders.find(
+        {"customer.shippingMethod": "711", "customer.storeInfo": {"$type": "string", "$ne": ""}},
+        {"_id": 0, "customer.storeInfo": 1},
+    ).batch_size(batch_size)
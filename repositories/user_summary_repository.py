@@ -0,0 +1,72 @@
+import database
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def find_user_by_line_id(line_id, projection=None):
+    return _require_db().users.find_one({"lineId": line_id}, projection)
+
+
+def find_paid_committee_item_names(line_id):
+    cursor = _require_db().orders.find(
+        {"lineId": line_id, "orderType": "committee", "status": "paid"},
+        {"items.name": 1},
+    )
+    names = []
+    paid_orders = 0
+    for order in cursor:
+        paid_orders += 1
+        names.extend(item.get("name", "") for item in order.get("items", []))
+    return names, paid_orders
+
+
+def count_sent_feedback(line_id):
+    return _require_db().feedback.count_documents({"lineId": line_id, "status": "sent"})
+
+
+def set_profile_summary(line_id, summary):
+    _require_db().users.update_one(
+        {"lineId": line_id},
+        {"$set": {"profileSummary": {**summary, "updatedAt": utc_now()}}},
+    )
+
+
+def apply_committee_payment(line_id, title, rank):
+    """已有摘要的使用者才做增量更新；沒有摘要者等下次讀取或重建腳本時完整計算。"""
+    db = _require_db()
+    now = utc_now()
+    db.users.update_one(
+        {"lineId": line_id, "profileSummary": {"$exists": True}},
+        {"$inc": {"profileSummary.paidCommitteeOrders": 1}, "$set": {"profileSummary.updatedAt": now}},
+    )
+    if title:
+        db.users.update_one(
+            {"lineId": line_id, "profileSummary.titleRank": {"$gt": rank}},
+            {"$set": {
+                "profileSummary.title": title,
+                "profileSummary.titleRank": rank,
+                "profileSummary.updatedAt": now,
+            }},
+        )
+
+
+def apply_feedback_sent(line_id):
+    _require_db().users.update_one(
+        {"lineId": line_id, "profileSummary": {"$exists": True}},
+        {
+            "$set": {"profileSummary.hasReceivedGift": True, "profileSummary.updatedAt": utc_now()},
+            "$inc": {"profileSummary.sentFeedbackCount": 1},
+        },
+    )
+
+
+def iter_user_line_ids(batch_size=500):
+    cursor = _require_db().users.find({"lineId": {"$type": "string"}}, {"lineId": 1}).batch_size(batch_size)
+    for doc in cursor:
+        yield doc["lineId"]
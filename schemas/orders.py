@@ -2,6 +2,8 @@ from typing import Literal
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
+from utils.business_rules import BULK_ORDER_MAX_IDS
+
 
 class OrderItemSchema(BaseModel):
     model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
@@ -61,3 +63,22 @@ class ShipOrderSchema(BaseModel):
     model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
 
     trackingNumber: str = Field(min_length=1, max_length=80)
+
+
+class BulkConfirmOrdersSchema(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+    ids: list[str] = Field(min_length=1, max_length=BULK_ORDER_MAX_IDS)
+
+
+class BulkShipItemSchema(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+    id: str = Field(min_length=1, max_length=40)
+    trackingNumber: str = Field(min_length=1, max_length=80)
+
+
+class BulkShipOrdersSchema(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+    orders: list[BulkShipItemSchema] = Field(min_length=1, max_length=BULK_ORDER_MAX_IDS)
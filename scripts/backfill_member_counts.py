@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+import database
+from repositories.member_repository import count_activity_by_line_id, set_member_counts
+from repositories.user_summary_repository import iter_user_line_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填 users.orderCount / users.feedbackCount")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    order_counts = count_activity_by_line_id("orders")
+    feedback_counts = count_activity_by_line_id("feedback")
+
+    batch = {}
+    updated = 0
+    for line_id in iter_user_line_ids(args.batch_size):
+        batch[line_id] = (order_counts.get(line_id, 0), feedback_counts.get(line_id, 0))
+        if len(batch) >= args.batch_size:
+            set_member_counts(batch)
+            updated += len(batch)
+            batch = {}
+    set_member_counts(batch)
+    updated += len(batch)
+
+    print(f"Backfilled activity counts for {updated} members")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
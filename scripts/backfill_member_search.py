@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+import database
+from repositories.member_repository import SEARCH_DISPLAY_NAME_FIELD, member_search_fields
+
+
+def backfill(db, batch_size, only_missing):
+    query = {SEARCH_DISPLAY_NAME_FIELD: {"$exists": False}} if only_missing else {}
+    operations = []
+    updated = 0
+    for doc in db.users.find(query, {"displayName": 1, "realName": 1}).batch_size(batch_size):
+        fields = member_search_fields(display_name=doc.get("displayName") or "", real_name=doc.get("realName") or "")
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(operations) >= batch_size:
+            db.users.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        db.users.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填 users.searchDisplayName / users.searchRealName")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--all", action="store_true", help="全部重算（預設只補沒有正規化欄位的會員）")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    count = backfill(db, args.batch_size, not args.all)
+    print(f"users: updated {count} documents")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+import database
+from repositories.pickup_lock_repository import backfill_pickup_locks
+from utils.helpers import get_tw_now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="為尚未過期的寄衣預約補建 pickup_cloth_locks")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    # 預約重複檢查改由鎖定文件負責；沒有鎖的舊預約要先補上，否則同一衣服編號可能被重複預約。
+    today_str = get_tw_now().strftime('%Y-%m-%d')
+    cursor = db.pickups.find(
+        {"pickupDate": {"$gte": today_str}},
+        {"lineId": 1, "pickupDate": 1, "clothes.clothId": 1},
+    ).batch_size(args.batch_size)
+    created = backfill_pickup_locks(cursor)
+
+    print(f"Created {created} pickup cloth locks")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+import database
+from repositories.job_state_repository import mark_job_completed
+from utils.search_tokens import SEARCH_TOKENS_BACKFILL_JOB, feedback_search_tokens, order_search_tokens
+
+
+TARGETS = {
+    "orders": ({"orderId": 1, "customer.name": 1}, order_search_tokens),
+    "feedback": ({"feedbackId": 1, "nickname": 1, "realName": 1}, feedback_search_tokens),
+}
+
+
+def backfill(db, collection_name, batch_size, only_missing):
+    projection, build_tokens = TARGETS[collection_name]
+    query = {"searchTokens": {"$exists": False}} if only_missing else {}
+    collection = db[collection_name]
+    operations = []
+    updated = 0
+    for doc in collection.find(query, projection).batch_size(batch_size):
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"searchTokens": build_tokens(doc)}}))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填 orders / feedback 的 searchTokens")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--all", action="store_true", help="全部重算（預設只補沒有 searchTokens 的文件）")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    for collection_name in TARGETS:
+        count = backfill(db, collection_name, args.batch_size, not args.all)
+        print(f"{collection_name}: updated {count} documents")
+    # 兩個集合都補完才標記；歷史查詢看到這個標記後改走 searchTokens 索引。
+    mark_job_completed(SEARCH_TOKENS_BACKFILL_JOB)
+    print("Search token backfill marked complete")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import database
+from repositories import committee_quota_repository as quota_repo
+from utils.timezone import utc_now
+
+
+BENCH_ROLES = ["[壓測] 委員甲", "[壓測] 委員乙"]
+
+
+def legacy_reserve_committee_quota(role_name, limit, quantity=1):
+    """舊版流程：每次都先 ensure（aggregation + upsert）再做 atomic $inc。"""
+    db = database.db
+    quantity = max(1, int(quantity or 1))
+    quota_repo.ensure_committee_quota_usage(role_name, limit)
+    expr = {"$lt": ["$used", "$limit"]}
+    if quantity > 1:
+        expr = {"$lte": [{"$add": ["$used", quantity]}, "$limit"]}
+    result = db.committee_quota_usage.update_one(
+        {"_id": role_name, "$expr": expr},
+        {"$inc": {"used": quantity}, "$set": {"limit": int(limit), "updatedAt": utc_now()}},
+    )
+    return result.modified_count == 1
+
+
+def _seed(db, orders):
+    """清空壓測用 collection，並放入指定筆數的委員會訂單讓 aggregation 有實際成本。"""
+    db.orders.delete_many({"benchmark": True})
+    db.committee_quota_usage.delete_many({"_id": {"$in": BENCH_ROLES}})
+    db.committee_status.delete_many({})
+    if orders:
+        db.orders.insert_many([
+            {
+                "benchmark": True,
+                "orderType": "committee",
+                "status": "paid",
+                "items": [{"name": BENCH_ROLES[index % len(BENCH_ROLES)], "qty": 1}],
+                "createdAt": utc_now(),
+            }
+            for index in range(orders)
+        ])
+
+
+def _reset_usage(db):
+    db.committee_quota_usage.delete_many({"_id": {"$in": BENCH_ROLES}})
+    for role in BENCH_ROLES:
+        quota_repo.ensure_committee_quota_usage(role, 10 ** 9)
+
+
+def _run(label, fn, workers, total):
+    _reset_usage(database.db)
+    latencies = []
+    lock = threading.Lock()
+
+    def one(index):
+        started = time.perf_counter()
+        ok = fn(index)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+        return ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        succeeded = sum(1 for ok in pool.map(one, range(total)) if ok)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": label,
+        "requests": total,
+        "succeeded": succeeded,
+        "ops_per_sec": round(total / wall, 1) if wall else None,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較委員會名額扣減新舊流程在併發下的吞吐量")
+    parser.add_argument("--db-name", default="ChentienTempleBench", help="壓測用資料庫，請勿指向正式資料庫")
+    parser.add_argument("--orders", type=int, default=20000, help="預先寫入的委員會訂單筆數")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.environ.get("MONGO_URI")
+    if not mongo_uri:
+        print("MONGO_URI is required", file=sys.stderr)
+        return 1
+    if args.db_name == "ChentienTempleDB":
+        print("Refusing to benchmark against the production database", file=sys.stderr)
+        return 1
+
+    client = MongoClient(mongo_uri, maxPoolSize=max(args.workers * 2, 10))
+    database.db = client[args.db_name]
+    _seed(database.db, args.orders)
+
+    role = BENCH_ROLES[0]
+    pair = [{"name": name, "limit": 10 ** 9, "qty": 1} for name in BENCH_ROLES]
+    results = [
+        _run("legacy_single", lambda _: legacy_reserve_committee_quota(role, 10 ** 9), args.workers, args.requests),
+        _run("fast_single", lambda _: quota_repo.reserve_committee_quota(role, 10 ** 9), args.workers, args.requests),
+        _run(
+            "legacy_two_roles",
+            lambda _: all(legacy_reserve_committee_quota(name, 10 ** 9) for name in BENCH_ROLES),
+            args.workers,
+            args.requests,
+        ),
+        _run("bulk_two_roles", lambda _: not quota_repo.reserve_committee_quotas(pair), args.workers, args.requests),
+    ]
+    print(json.dumps({"orders": args.orders, "workers": args.workers, "results": results}, ensure_ascii=False, indent=2))
+
+    _seed(database.db, 0)
+    client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
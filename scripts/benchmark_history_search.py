@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import database
+from repositories.history_repository import get_history_page_after
+from repositories.job_state_repository import mark_job_completed
+from services.history_service import build_history_matches
+from utils.search_tokens import SEARCH_TOKENS_BACKFILL_JOB, order_search_tokens
+from utils.security import safe_regex_contains
+from utils.timezone import utc_now
+
+
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周徐蘇葉莊呂江何蕭羅高"
+GIVEN_CHARS = "志明雅婷家豪怡君俊傑淑芬建宏美玲冠宇佳穎宗翰惠如承恩欣怡信宏雅琪"
+ORDER_TYPES = [("shop", "ORD"), ("donation", "DON"), ("fund", "FND"), ("committee", "COM")]
+
+
+def legacy_history_matches(order_id, name):
+    """改版前的條件：orders 與 feedback 都是不錨定的 regex。"""
+    orders_match = {}
+    feedback_match = {}
+    if order_id:
+        orders_match["orderId"] = {"$regex": safe_regex_contains(order_id), "$options": "i"}
+        feedback_match["feedbackId"] = {"$regex": safe_regex_contains(order_id), "$options": "i"}
+    if name:
+        orders_match["customer.name"] = {"$regex": safe_regex_contains(name)}
+        name_regex = {"$regex": safe_regex_contains(name), "$options": "i"}
+        feedback_match["$or"] = [{"nickname": name_regex}, {"realName": name_regex}]
+    return orders_match, feedback_match
+
+
+def _random_name(rng):
+    return rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_CHARS) for _ in range(rng.choice((1, 2))))
+
+
+def _seed(db, orders, batch_size=10000, seed=42):
+    """重建壓測用 orders：單號與姓名分佈接近正式資料，日期分散在過去三年。"""
+    rng = random.Random(seed)
+    db.orders.drop()
+    db.feedback.drop()
+    database.ensure_indexes()
+
+    now = utc_now()
+    per_day = {}
+    batch = []
+    for index in range(orders):
+        order_type, prefix = ORDER_TYPES[index % len(ORDER_TYPES)]
+        created_at = now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+        date_part = created_at.strftime("%Y%m%d")
+        per_day[(prefix, date_part)] = per_day.get((prefix, date_part), 0) + 1
+        order = {
+            "orderId": f"{prefix}{date_part}{per_day[(prefix, date_part)]:04d}",
+            "orderType": order_type,
+            "status": rng.choice(("pending", "paid", "shipped")),
+            "customer": {"name": _random_name(rng)},
+            "total": rng.randrange(100, 5000),
+            "createdAt": created_at,
+            "updatedAt": created_at,
+        }
+        order["searchTokens"] = order_search_tokens(order)
+        batch.append(order)
+        if len(batch) >= batch_size:
+            db.orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.orders.insert_many(batch, ordered=False)
+    return db.orders.find_one({}, sort=[("createdAt", -1)])
+
+
+def _orders_explain(db, match):
+    stats = db.command(
+        "explain",
+        {"find": "orders", "filter": match, "sort": {"createdAt": -1, "_id": -1}, "limit": 51},
+        verbosity="executionStats",
+    )["executionStats"]
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "server_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def _measure(db, label, matches, repeats):
+    orders_match, feedback_match = matches
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        get_history_page_after(orders_match, feedback_match, None, 51)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "mode": label,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        **_orders_explain(db, orders_match),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較歷史查詢 regex 與 searchTokens 索引的效能")
+    parser.add_argument("--db-name", default="ChentienTempleBench", help="壓測用資料庫，請勿指向正式資料庫")
+    parser.add_argument("--orders", type=int, default=500000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="沿用上次寫入的壓測資料")
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.environ.get("MONGO_URI")
+    if not mongo_uri:
+        print("MONGO_URI is required", file=sys.stderr)
+        return 1
+    if args.db_name == "ChentienTempleDB":
+        print("Refusing to benchmark against the production database", file=sys.stderr)
+        return 1
+
+    client = MongoClient(mongo_uri)
+    database.db = client[args.db_name]
+    sample = database.db.orders.find_one({}, sort=[("createdAt", -1)]) if args.skip_seed else None
+    if sample is None:
+        sample = _seed(database.db, args.orders)
+    # 種子資料寫入時就帶 searchTokens，標記回填完成讓 build_history_matches 走 token 計畫。
+    mark_job_completed(SEARCH_TOKENS_BACKFILL_JOB)
+
+    sample_id = sample["orderId"]
+    sample_name = sample["customer"]["name"]
+    queries = {
+        "full_order_id": (sample_id, ""),
+        "order_id_date_prefix": (sample_id[:11], ""),
+        "order_id_tail": (sample_id[-3:], ""),
+        "full_name": ("", sample_name),
+        "name_fragment": ("", sample_name[:2]),
+    }
+
+    results = []
+    for label, (order_id, name) in queries.items():
+        results.append(_measure(database.db, f"legacy_{label}", legacy_history_matches(order_id, name), args.repeats))
+        results.append(_measure(
+            database.db,
+            f"tokens_{label}",
+            build_history_matches("", order_id, name, "", "", ""),
+            args.repeats,
+        ))
+
+    print(json.dumps({"orders": database.db.orders.estimated_document_count(), "results": results}, ensure_ascii=False, indent=2))
+    client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
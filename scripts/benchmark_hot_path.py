@@ -0,0 +1,425 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import database
+from utils.search_tokens import feedback_search_tokens, order_search_tokens
+from utils.timezone import utc_now
+
+
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周徐蘇葉莊呂江何蕭羅高"
+GIVEN_CHARS = "志明雅婷家豪怡君俊傑淑芬建宏美玲冠宇佳穎宗翰惠如承恩欣怡信宏雅琪"
+CITIES = ["台北市", "新北市", "桃園市", "台中市", "台南市", "高雄市"]
+ORDER_TYPES = [("shop", "ORD"), ("donation", "DON"), ("fund", "FND"), ("committee", "COM")]
+FUND_ITEMS = [("suixi", "[建廟] 隨喜助建", 100), ("tile", "[建廟] 建廟瓦片", 600), ("pillar", "[建廟] 龍柱認捐", 10000)]
+# 名額上限受 _normalize_committee_items 限制（最多 9999）；種子訂單用另一組職稱，不佔壓測名額。
+BENCH_COMMITTEE_ROLES = [
+    {"name": "[壓測] 委員", "limit": 9999, "price": 12000},
+    {"name": "[壓測] 顧問", "limit": 9999, "price": 36000},
+]
+SEEDED_COMMITTEE_ROLES = [
+    {"name": "[歷史] 委員", "price": 12000},
+    {"name": "[歷史] 顧問", "price": 36000},
+]
+BENCH_LINE_ID = "Ubench0000"
+# 每次壓測都從空 collection 重建，結果才能跨 commit 比較。
+SEEDED_COLLECTIONS = (
+    "orders", "feedback", "users", "pickups", "pickup_cloth_locks", "products",
+    "committee_quota_usage", "committee_status", "counters",
+)
+
+
+def _random_name(rng):
+    return rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_CHARS) for _ in range(rng.choice((1, 2))))
+
+
+def _customer(rng, name):
+    return {
+        "name": name,
+        "phone": f"09{rng.randrange(10 ** 8):08d}",
+        "email": f"bench{rng.randrange(10 ** 6)}@example.com",
+        "address": f"{rng.choice(CITIES)}中正路{rng.randrange(1, 500)}號",
+        "last5": f"{rng.randrange(10 ** 5):05d}",
+        "lunarBirthday": f"{rng.randrange(50, 100)}年{rng.randrange(1, 13)}月{rng.randrange(1, 30)}日",
+        "prayer": "祈求平安",
+        "shippingMethod": "home",
+        "storeInfo": "",
+        "shippingFee": 0,
+    }
+
+
+def _seed_products(db):
+    shop = [
+        {
+            "name": f"壓測結緣品{index}",
+            "price": 300 + index * 10,
+            "variants": [{"name": "標準", "price": 300 + index * 10}, {"name": "大", "price": 500 + index * 10}],
+            "isActive": True,
+            "isDonation": False,
+            "category": "壓測",
+            "createdAt": utc_now(),
+        }
+        for index in range(20)
+    ]
+    donation = [
+        {"name": f"壓測捐香{index}", "price": 100 * (index + 1), "isActive": True, "isDonation": True, "createdAt": utc_now()}
+        for index in range(5)
+    ]
+    db.products.insert_many(shop + donation)
+    return shop, donation
+
+
+def _order_items(rng, order_type, shop, donation):
+    if order_type == "shop":
+        product = rng.choice(shop)
+        variant = rng.choice(product["variants"])
+        return [{
+            "id": str(product["_id"]),
+            "name": product["name"],
+            "price": variant["price"],
+            "qty": rng.randrange(1, 4),
+            "variant": variant["name"],
+            "cartId": f"{product['_id']}-{variant['name']}",
+        }]
+    if order_type == "donation":
+        product = rng.choice(donation)
+        return [{"id": str(product["_id"]), "name": product["name"], "price": product["price"], "qty": 1}]
+    if order_type == "fund":
+        key, name, price = rng.choice(FUND_ITEMS)
+        return [{"id": key, "name": name, "price": price, "qty": rng.randrange(1, 5)}]
+    role = rng.choice(SEEDED_COMMITTEE_ROLES)
+    return [{"name": role["name"], "price": role["price"], "qty": 1}]
+
+
+def _insert_batched(collection, docs, batch_size):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def _seed(db, args):
+    """依 create_order 寫入的文件格式產生壓測資料；固定亂數種子，每次內容相同。"""
+    rng = random.Random(args.seed)
+    for name in SEEDED_COLLECTIONS:
+        db[name].drop()
+    database.ensure_indexes()
+    db.settings.update_one(
+        {"type": "committee_quota"},
+        {"$set": {"roles": BENCH_COMMITTEE_ROLES}},
+        upsert=True,
+    )
+
+    shop, donation = _seed_products(db)
+    now = utc_now()
+    line_ids = [BENCH_LINE_ID] + [f"Ubench{index:06d}" for index in range(1, args.users)]
+
+    def users():
+        for line_id in line_ids:
+            created_at = now - timedelta(days=rng.randrange(3 * 365))
+            yield {
+                "lineId": line_id,
+                "displayName": _random_name(rng),
+                "realName": _random_name(rng),
+                "createdAt": created_at,
+                "lastLoginAt": created_at + timedelta(days=rng.randrange(30)),
+                "orderCount": 0,
+                "feedbackCount": 0,
+            }
+
+    def orders():
+        per_day = {}
+        for index in range(args.orders):
+            order_type, prefix = ORDER_TYPES[index % len(ORDER_TYPES)]
+            # 避開今天與昨天，壓測期間新單號不會撞到種子資料
+            created_at = now - timedelta(minutes=rng.randrange(2 * 24 * 60, 3 * 365 * 24 * 60))
+            date_part = created_at.strftime("%Y%m%d")
+            per_day[(prefix, date_part)] = per_day.get((prefix, date_part), 0) + 1
+            items = _order_items(rng, order_type, shop, donation)
+            status = rng.choice(("pending", "paid", "paid", "shipped"))
+            order = {
+                "orderId": f"{prefix}{date_part}{per_day[(prefix, date_part)]:04d}",
+                "orderType": order_type,
+                "customer": _customer(rng, _random_name(rng)),
+                "items": items,
+                "total": sum(item["price"] * item["qty"] for item in items),
+                "status": status,
+                "lineId": rng.choice(line_ids),
+                "paymentDeadline": created_at + timedelta(hours=72),
+                "createdAt": created_at,
+                "updatedAt": created_at,
+            }
+            if status != "pending":
+                order["paidAt"] = created_at + timedelta(hours=rng.randrange(1, 48))
+            if order_type == "donation":
+                order["is_reported"] = rng.random() < 0.5
+            order["searchTokens"] = order_search_tokens(order)
+            yield order
+
+    def feedback():
+        for index in range(args.feedback):
+            created_at = now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+            status = rng.choice(("pending", "approved", "sent"))
+            doc = {
+                "feedbackId": f"FB{created_at.strftime('%Y%m%d')}{index:05d}",
+                "lineId": rng.choice(line_ids),
+                "nickname": _random_name(rng),
+                "realName": _random_name(rng),
+                "category": ["其他"],
+                "content": "感謝元帥庇佑，闔家平安。" * rng.randrange(1, 5),
+                "status": status,
+                "createdAt": created_at,
+            }
+            if status != "pending":
+                doc["approvedAt"] = created_at + timedelta(days=1)
+            if status == "sent":
+                doc["sentAt"] = created_at + timedelta(days=3)
+            doc["searchTokens"] = feedback_search_tokens(doc)
+            yield doc
+
+    def pickups():
+        for index in range(args.pickups):
+            pickup_day = now + timedelta(days=rng.randrange(-30, 30))
+            yield {
+                "lineId": rng.choice(line_ids),
+                "pickupType": rng.choice(("self", "delivery")),
+                "pickupDate": pickup_day.strftime("%Y-%m-%d"),
+                "clothes": [{"clothId": f"B{index:06d}{n}", "name": _random_name(rng), "birthYear": "70"} for n in range(rng.randrange(1, 4))],
+                "createdAt": now,
+            }
+
+    _insert_batched(db.users, users(), args.batch_size)
+    _insert_batched(db.orders, orders(), args.batch_size)
+    _insert_batched(db.feedback, feedback(), args.batch_size)
+    _insert_batched(db.pickups, pickups(), args.batch_size)
+    return {"shop": [str(p["_id"]) for p in shop], "donation": [str(p["_id"]) for p in donation]}
+
+
+def _load_products(db):
+    return {
+        "shop": [str(p["_id"]) for p in db.products.find({"isDonation": False}, {"_id": 1})],
+        "donation": [str(p["_id"]) for p in db.products.find({"isDonation": True}, {"_id": 1})],
+    }
+
+
+def _order_payload(rng, order_type, products):
+    payload = {
+        "orderType": order_type,
+        "name": _random_name(rng),
+        "phone": "0912345678",
+        "email": "bench@example.com",
+        "address": "台北市中正路1號",
+        "lunarBirthday": "70年1月1日",
+        "prayer": "祈求平安",
+    }
+    if order_type == "shop":
+        payload["items"] = [{"id": rng.choice(products["shop"]), "qty": 1, "variant": "標準"}]
+        payload["shippingMethod"] = "home"
+    elif order_type == "donation":
+        payload["items"] = [{"id": rng.choice(products["donation"]), "qty": 1}]
+    elif order_type == "fund":
+        payload["items"] = [{"id": "tile", "qty": 1}]
+        payload["last5"] = "12345"
+    else:
+        payload["items"] = [{"name": rng.choice(BENCH_COMMITTEE_ROLES)["name"], "qty": 1}]
+        payload["last5"] = "12345"
+    return payload
+
+
+def _percentile(sorted_values, pct):
+    """nearest-rank 百分位數。"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _measure(name, send, requests, warmup):
+    for index in range(warmup):
+        send(index)
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for index in range(requests):
+        request_started = time.perf_counter()
+        status = send(index)
+        latencies.append(time.perf_counter() - request_started)
+        if status >= 400:
+            errors += 1
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": requests,
+        "errors": errors,
+        "req_per_sec": round(requests / wall, 1) if wall else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def _history_pager(client, pages):
+    """每次請求代表從第一頁往後翻 pages 頁中的一頁，與後台「載入更多」相同。"""
+    state = {"cursor": None, "page": 0}
+
+    def send(_):
+        params = {"paging": "cursor", "per_page": 50}
+        if state["cursor"]:
+            params["cursor"] = state["cursor"]
+        response = client.get("/api/admin/data/history", query_string=params)
+        body = response.get_json(silent=True) or {}
+        state["page"] += 1
+        state["cursor"] = body.get("next_cursor") if state["page"] < pages else None
+        if not state["cursor"]:
+            state["page"] = 0
+        return response.status_code
+
+    return send
+
+
+def _scenarios(user_client, admin_client, products, rng, history_pages):
+    def create(order_type):
+        return lambda _: user_client.post("/api/orders", json=_order_payload(rng, order_type, products)).status_code
+
+    def get(client, path, **params):
+        return lambda _: client.get(path, query_string=params).status_code
+
+    return [
+        ("POST /api/orders shop", create("shop")),
+        ("POST /api/orders donation", create("donation")),
+        ("POST /api/orders fund", create("fund")),
+        ("POST /api/orders committee", create("committee")),
+        ("GET /api/admin/data/history cursor", _history_pager(admin_client, history_pages)),
+        ("GET /api/admin/data/history name", get(admin_client, "/api/admin/data/history", name="陳志", paging="cursor")),
+        ("GET /api/donations/public", get(user_client, "/api/donations/public", type="donation")),
+        ("GET /api/public/committee-status", get(user_client, "/api/public/committee-status")),
+        ("GET /api/public/products", get(user_client, "/api/public/products")),
+        ("GET /api/feedback/approved", get(user_client, "/api/feedback/approved")),
+    ]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results, baseline_path):
+    """與先前輸出的 JSON 比較；正值代表變慢（延遲）或變快（吞吐量）。"""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {row["endpoint"]: row for row in json.load(handle).get("results", [])}
+    rows = []
+    for row in results:
+        before = baseline.get(row["endpoint"])
+        if not before:
+            continue
+        delta = {"endpoint": row["endpoint"]}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "req_per_sec"):
+            if before.get(key):
+                delta[key] = f"{(row[key] - before[key]) / before[key] * 100:+.1f}%"
+        rows.append(delta)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 Flask test client 量測下單、歷史分頁與公開清單的延遲與吞吐量")
+    parser.add_argument("--db-name", default="ChentienTempleBench", help="壓測用資料庫，請勿指向正式資料庫")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--feedback", type=int, default=20000)
+    parser.add_argument("--pickups", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=300, help="每個端點量測的請求數（委員會名額上限 9999）")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--history-pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子；比較不同 commit 時請保持一致")
+    parser.add_argument("--skip-seed", action="store_true", help="沿用上次寫入的壓測資料")
+    parser.add_argument("--output", help="結果另存為 JSON 檔")
+    parser.add_argument("--compare", help="與先前 --output 的 JSON 比較")
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.environ.get("MONGO_URI")
+    if not mongo_uri:
+        print("MONGO_URI is required", file=sys.stderr)
+        return 1
+    if args.db_name == "ChentienTempleDB":
+        print("Refusing to benchmark against the production database", file=sys.stderr)
+        return 1
+
+    # app 匯入時會以 MONGO_URI 連到正式資料庫名稱；先清空，連線改由下方指定壓測資料庫。
+    os.environ["MONGO_URI"] = ""
+    os.environ.setdefault("ASYNC_TASK_QUEUE_ENABLED", "false")
+    from app import app
+    from extensions import limiter
+
+    client = MongoClient(mongo_uri)
+    database.db = client[args.db_name]
+    products = _load_products(database.db) if args.skip_seed else None
+    if not products or not products["shop"]:
+        products = _seed(database.db, args)
+
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    limiter.enabled = False
+
+    user_client = app.test_client()
+    with user_client.session_transaction() as session:
+        session["user_line_id"] = BENCH_LINE_ID
+    admin_client = app.test_client()
+    with admin_client.session_transaction() as session:
+        session["admin_logged_in"] = True
+        session["admin_permissions"] = ["super_admin"]
+        session["admin_username"] = "bench"
+
+    rng = random.Random(args.seed)
+    results = [
+        _measure(name, send, args.requests, args.warmup)
+        for name, send in _scenarios(user_client, admin_client, products, rng, args.history_pages)
+    ]
+    report = {
+        "revision": _git_revision(),
+        "config": {
+            "orders": args.orders,
+            "users": args.users,
+            "feedback": args.feedback,
+            "pickups": args.pickups,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.compare:
+        report["compare"] = _compare(results, args.compare)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from services.history_service import _format_history_doc
+from utils.serialization import MongoJSONProvider, to_jsonable
+from utils.timezone import format_taipei
+
+
+def legacy_serialize_doc(obj):
+    """改版前 admin 使用的遞迴序列化。"""
+    if isinstance(obj, dict):
+        return {k: legacy_serialize_doc(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [legacy_serialize_doc(v) for v in obj]
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if not isinstance(obj, (int, float, str, bool, type(None))):
+        return str(obj)
+    return obj
+
+
+def legacy_format_history_doc(doc):
+    """改版前的歷史資料日期整理：每個欄位各自呼叫 format_taipei。"""
+    doc['_id'] = str(doc['_id'])
+    doc['createdAt'] = format_taipei(doc.get('createdAt'))
+    if doc['_docType'] == 'order':
+        if doc.get('updatedAt'): doc['updatedAt'] = format_taipei(doc['updatedAt'])
+        if doc.get('paymentDeadline'): doc['paymentDeadline'] = format_taipei(doc['paymentDeadline'])
+        doc['source_label'] = ''
+        if doc.get('paidAt'): doc['paidAt'] = format_taipei(doc['paidAt'])
+        if doc.get('shippedAt'): doc['shippedAt'] = format_taipei(doc['shippedAt'])
+        if doc.get('reportedAt'): doc['reportedAt'] = format_taipei(doc['reportedAt'])
+    else:
+        doc['source_label'] = ''
+        if doc.get('approvedAt'): doc['approvedAt'] = format_taipei(doc['approvedAt'])
+        if doc.get('sentAt'): doc['sentAt'] = format_taipei(doc['sentAt'])
+    doc.pop('_docType', None)
+    return doc
+
+
+def _history_page(rows, seed):
+    """與 MongoDB 取出的格式相同：naive UTC datetime、ObjectId、巢狀 customer/items。"""
+    rng = random.Random(seed)
+    now = datetime(2026, 10, 18, 8, 0)
+    docs = []
+    for index in range(rows):
+        created = now - timedelta(minutes=rng.randrange(500000))
+        if index % 5 == 4:
+            docs.append({
+                "_id": ObjectId(), "_docType": "feedback", "feedbackId": f"FB{index:08d}",
+                "nickname": "善信", "realName": "王小明", "content": "感謝庇佑" * 10, "status": "sent",
+                "createdAt": created, "approvedAt": created + timedelta(days=1), "sentAt": created + timedelta(days=3),
+            })
+            continue
+        docs.append({
+            "_id": ObjectId(), "_docType": "order", "orderId": f"ORD{index:08d}", "orderType": "shop",
+            "status": "shipped", "total": 1200, "lineId": "U" + "0" * 32,
+            "customer": {"name": "王小明", "phone": "0912345678", "address": "台北市中正路1號", "email": "a@example.com"},
+            "items": [{"id": str(ObjectId()), "name": "平安符", "price": 300, "qty": 2, "variant": "標準"} for _ in range(3)],
+            "createdAt": created, "updatedAt": created, "paymentDeadline": created + timedelta(hours=72),
+            "paidAt": created + timedelta(hours=2), "shippedAt": created + timedelta(days=2),
+        })
+    return docs
+
+
+def _time(label, fn, pages, repeats, rows):
+    best = None
+    for _ in range(repeats):
+        work = [[dict(doc, customer=dict(doc.get("customer", {}))) for doc in page] for page in pages]
+        started = time.perf_counter()
+        for page in work:
+            fn(page)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    documents = rows * len(pages)
+    return {"mode": label, "per_doc_us": round(best / documents * 1_000_000, 2), "page_ms": round(best / len(pages) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測 1000 筆歷史資料頁的日期格式化與 JSON 序列化成本")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pages = [_history_page(args.rows, args.seed + index) for index in range(args.pages)]
+    app = Flask(__name__)
+    default_json = DefaultJSONProvider(app)
+    mongo_json = MongoJSONProvider(app)
+
+    results = [
+        _time("legacy_history_format", lambda page: [legacy_format_history_doc(doc) for doc in page], pages, args.repeats, args.rows),
+        _time("history_format", lambda page: [_format_history_doc(doc) for doc in page], pages, args.repeats, args.rows),
+        _time("legacy_serialize_doc_dumps", lambda page: default_json.dumps(legacy_serialize_doc(page)), pages, args.repeats, args.rows),
+        _time("to_jsonable_dumps", lambda page: mongo_json.dumps(to_jsonable(page)), pages, args.repeats, args.rows),
+    ]
+    print(json.dumps({"rows_per_page": args.rows, "pages": args.pages, "results": results}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from utils.email import SMTPConnectionPool, _build_message
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """極簡 SMTP sink：接受任何信件後丟棄；連線建立時延遲模擬 TLS 握手與登入成本。"""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        time.sleep(self.server.handshake_delay)
+        self._reply("220 benchmark ESMTP")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    self.server.count_message()
+                    self._reply("250 OK")
+                continue
+
+            command = line.strip().split(b" ", 1)[0].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.wfile.write(b"250-benchmark\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                self.wfile.flush()
+            elif command == b"AUTH":
+                self._reply("235 Authentication successful")
+            elif command == b"DATA":
+                in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay):
+        super().__init__(("127.0.0.1", 0), _SinkHandler)
+        self.handshake_delay = handshake_delay
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def count_message(self):
+        with self._lock:
+            self.messages += 1
+
+
+def _settings(port):
+    return {
+        "server": "127.0.0.1",
+        "port": port,
+        "username": "bench@example.com",
+        "password": "bench",
+        "starttls": False,
+        "timeout": 10,
+    }
+
+
+def _messages(count):
+    return [
+        {
+            "to_email": f"user{index}@example.com",
+            "subject": f"【壓測】通知 {index}",
+            "body": "<p>benchmark</p>",
+            "is_html": True,
+        }
+        for index in range(count)
+    ]
+
+
+def legacy_send(settings, message):
+    """舊版流程：每封信都重新連線、登入、寄出再 quit。"""
+    server = smtplib.SMTP(settings["server"], settings["port"], timeout=settings["timeout"])
+    try:
+        server.login(settings["username"], settings["password"])
+        server.send_message(_build_message(
+            settings["username"],
+            message["to_email"],
+            message["subject"],
+            message["body"],
+            message["is_html"],
+        ))
+        return True
+    finally:
+        server.quit()
+
+
+def _measure(label, fn, count):
+    started = time.perf_counter()
+    sent = fn()
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": label,
+        "messages": count,
+        "sent": sent,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(count / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較每封信重新連線與共用 SMTP 連線的寄信速度")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=80.0, help="模擬每次建立連線的握手延遲")
+    args = parser.parse_args()
+
+    server = _SinkServer(args.handshake_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings = _settings(server.server_address[1])
+    messages = _messages(args.messages)
+
+    pool = SMTPConnectionPool(settings_loader=lambda: settings)
+    batch_pool = SMTPConnectionPool(settings_loader=lambda: settings)
+    results = [
+        _measure("legacy_per_message", lambda: sum(1 for message in messages if legacy_send(settings, message)), args.messages),
+        _measure("pooled_per_task", lambda: sum(1 for message in messages if pool.send_many([message])[0]), args.messages),
+        _measure("batch_task", lambda: sum(1 for ok in batch_pool.send_many(messages) if ok), args.messages),
+    ]
+    pool.close_all()
+    batch_pool.close_all()
+    server.shutdown()
+
+    print(json.dumps({
+        "handshake_ms": args.handshake_ms,
+        "connections_opened": {"pooled_per_task": pool.connections_opened, "batch_task": batch_pool.connections_opened},
+        "results": results,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+import database
+from services.index_advisor_service import (
+    build_index_report,
+    drop_undeclared_indexes,
+    verify_lean_index_set,
+)
+
+
+def _format_size(size):
+    if size is None:
+        return "-"
+    return f"{size / 1024:.0f}KB"
+
+
+def print_report(report):
+    live = any("exists" in entry for entry in report["indexes"])
+    if live:
+        print(f"$indexStats 計數起點：{report['statsSince'] or '未知'}")
+    current = None
+    for entry in report["indexes"]:
+        if entry["collection"] != current:
+            current = entry["collection"]
+            amplification = report["writeAmplification"][current]
+            print(
+                f"\n[{current}] 每筆 insert 寫入 {amplification['writesPerInsert']} 個 B-tree"
+                f"（精簡後 {amplification['leanWritesPerInsert']}）"
+            )
+        notes = []
+        if entry["usedBy"]:
+            notes.append(f"used by {', '.join(entry['usedBy'])}")
+        if entry["redundantWith"]:
+            notes.append(f"prefix of {entry['redundantWith']}")
+        if entry["overlapsWith"]:
+            notes.append(f"overlaps {', '.join(entry['overlapsWith'])}")
+        if entry["protected"]:
+            notes.append("protected")
+        if live and not entry.get("exists"):
+            notes.append("missing")
+        usage = ""
+        if live:
+            ops = entry.get("ops")
+            usage = f"ops={'-' if ops is None else ops:<8} size={_format_size(entry.get('size')):<8} "
+        print(f"  {entry['recommendation']:<6} {entry['name']:<40} {usage}{'; '.join(notes)}")
+
+    slow = [
+        f"{name} ({'COLLSCAN' if plan['collscan'] else 'in-memory SORT'})"
+        for name, plan in report["shapes"].items()
+        if plan["collscan"] or plan["blockingSort"]
+    ]
+    if slow:
+        print("\n未完整命中索引的查詢形狀：")
+        for line in slow:
+            print(f"  {line}")
+    if report["undeclared"]:
+        print(f"\nINDEX_SPECS 未宣告但存在的索引：{', '.join(report['undeclared'])}")
+    print(f"\n建議移除：{', '.join(report['dropCandidates']) or '無'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依 INDEX_SPECS 與查詢形狀清單產生索引使用報告")
+    parser.add_argument("--static", action="store_true", help="不連資料庫，只檢查前綴重複與欄位重疊")
+    parser.add_argument("--json", action="store_true", help="輸出完整 JSON 報告")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="暫時隱藏建議移除的索引並重新 explain，列出會退化的查詢（需 MongoDB 4.4+，請對本機或測試環境執行）",
+    )
+    parser.add_argument("--candidates", nargs="+", help="搭配 --verify：改用指定的索引名稱")
+    parser.add_argument(
+        "--drop-undeclared",
+        action="store_true",
+        help="列出已從 INDEX_SPECS 移除但仍存在的索引；加 --apply 才實際刪除",
+    )
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+    if args.static and (args.verify or args.drop_undeclared):
+        parser.error("--verify and --drop-undeclared need a database connection")
+
+    db = None
+    if not args.static:
+        load_dotenv()
+        db = database.init_db(os.environ.get("MONGO_URI"))
+        if db is None:
+            print("Database is not available", file=sys.stderr)
+            return 1
+
+    if args.drop_undeclared:
+        targets = drop_undeclared_indexes(db, apply=args.apply)
+        action = "Dropped" if args.apply else "Would drop"
+        for collection, name in targets:
+            print(f"{action} {collection}.{name}")
+        if not targets:
+            print("No undeclared indexes")
+        return 0
+
+    report = build_index_report(db)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        print_report(report)
+
+    if args.verify:
+        candidates = args.candidates or report["dropCandidates"]
+        if not candidates:
+            print("No candidates to verify")
+            return 0
+        regressions = verify_lean_index_set(db, candidates)
+        for item in regressions:
+            print(f"Regression: {item['shape']} {item['before']} -> {item['after'] or 'COLLSCAN'}")
+        if regressions:
+            return 2
+        print(f"Verified: {len(candidates)} indexes can be removed without plan regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+import database
+from services.store_service import extract_store_ids, order_store_ids, prewarm_stores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="預先查詢 7-11 門市並寫入共用快取 store_cache")
+    parser.add_argument("store_ids", nargs="*", help="指定店號；未指定時取歷史 7-11 取貨訂單的門市")
+    parser.add_argument("--file", help="每行一個店號（或含店號的門市資訊）的文字檔")
+    parser.add_argument("--refresh", action="store_true", help="快取仍有效的店號也重新查詢")
+    parser.add_argument("--delay", type=float, default=0.2, help="每次查詢 PCSC 的間隔秒數")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    sources = list(args.store_ids)
+    if args.file:
+        with open(args.file, encoding="utf-8") as handle:
+            sources.extend(line.strip() for line in handle)
+    store_ids = extract_store_ids(sources) if sources else order_store_ids()
+
+    summary = prewarm_stores(store_ids, refresh=args.refresh, delay_seconds=args.delay)
+    print(json.dumps({"stores": len(store_ids), **summary}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+import database
+from repositories.user_summary_repository import iter_user_line_ids
+from services.user_summary_service import refresh_profile_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重算所有使用者的 profileSummary（頭銜、回饋禮狀態）")
+    parser.add_argument("--line-id", help="只重算指定使用者")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = database.init_db(os.environ.get("MONGO_URI"))
+    if db is None:
+        print("Database is not available", file=sys.stderr)
+        return 1
+
+    line_ids = [args.line_id] if args.line_id else iter_user_line_ids()
+    count = 0
+    for line_id in line_ids:
+        refresh_profile_summary(line_id)
+        count += 1
+    print(f"Rebuilt {count} profile summaries")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
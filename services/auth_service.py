@@ -6,6 +6,7 @@ from pymongo.errors import DuplicateKeyError
 from werkzeug.security import check_password_hash
 
 import database
+from repositories.member_repository import member_search_fields
 from utils.errors import ServiceUnavailableError, ValidationError
 from utils.timezone import utc_now
 
@@ -128,6 +129,7 @@ def upsert_line_user(profile):
                 "displayName": display_name,
                 "pictureUrl": picture_url,
                 "lastLoginAt": now,
+                **member_search_fields(display_name=display_name),
             },
             "$setOnInsert": {"createdAt": now},
         }
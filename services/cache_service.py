@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+
+from repositories.cache_version_repository import bump_cache_version, get_cache_version, get_cache_versions
+from utils.cache import build_cache_backend
+from utils.env import env_int
+
+
+# 各類快取資料的版本名稱；對應資料異動時 bump_version。
+PRODUCTS_CACHE = "products"
+ANNOUNCEMENTS_CACHE = "announcements"
+FEEDBACK_CACHE = "feedback"
+FAQ_CACHE = "faq"
+LINKS_CACHE = "links"
+PICKUP_CALENDAR_CACHE = "pickup_calendar"
+
+# 版本號在本地最多沿用幾秒；後台異動後其他 worker 最晚在這段時間內失效。
+CACHE_VERSION_CHECK_SECONDS = max(0, env_int("CACHE_VERSION_CHECK_SECONDS", 5))
+
+# SSR 頁面快取：預設各 worker 本地快取，設 PAGE_CACHE_BACKEND=redis 改為共用。
+PAGE_CACHE_BACKEND = os.environ.get("PAGE_CACHE_BACKEND", "local")
+PAGE_CACHE_TTL_SECONDS = max(1, env_int("PAGE_CACHE_TTL_SECONDS", 300))
+PAGE_CACHE_MAX_ENTRIES = max(1, env_int("PAGE_CACHE_MAX_ENTRIES", 256))
+
+_lock = threading.Lock()
+_versions = {}
+_values = {}
+_page_cache = None
+
+
+def current_version(name):
+    now = time.monotonic()
+    with _lock:
+        cached = _versions.get(name)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    version = get_cache_version(name)
+    with _lock:
+        _versions[name] = (now + CACHE_VERSION_CHECK_SECONDS, version)
+    return version
+
+
+def current_versions(names):
+    """一次取得多個版本號，本地過期的部分合併成一次查詢。"""
+    now = time.monotonic()
+    versions = {}
+    with _lock:
+        for name in names:
+            cached = _versions.get(name)
+            if cached and cached[0] > now:
+                versions[name] = cached[1]
+
+    missing = [name for name in names if name not in versions]
+    if missing:
+        fetched = get_cache_versions(missing)
+        with _lock:
+            for name, version in fetched.items():
+                _versions[name] = (now + CACHE_VERSION_CHECK_SECONDS, version)
+        versions.update(fetched)
+    return versions
+
+
+def bump_version(name):
+    version = bump_cache_version(name)
+    with _lock:
+        _versions[name] = (time.monotonic() + CACHE_VERSION_CHECK_SECONDS, version)
+        _values.pop(name, None)
+    return version
+
+
+def get_or_build(name, builder, variant=None):
+    """回傳 (version, value)；同版本重複使用本地結果，版本變動才呼叫 builder 重建。
+
+    variant 用於資料未異動但內容仍會隨之改變的情況（例如依日期過濾），不同 variant 只保留最新一份。
+    """
+    version = current_version(name)
+    with _lock:
+        cached = _values.get(name)
+        if cached and cached[0] == version and cached[2] == variant:
+            return cached[0], cached[1]
+    value = builder()
+    with _lock:
+        _values[name] = (version, value, variant)
+    return version, value
+
+
+def _get_page_cache():
+    global _page_cache
+    if _page_cache is None:
+        with _lock:
+            if _page_cache is None:
+                _page_cache = build_cache_backend(
+                    "page",
+                    backend=PAGE_CACHE_BACKEND,
+                    redis_url=os.environ.get("PAGE_CACHE_REDIS_URL"),
+                    max_entries=PAGE_CACHE_MAX_ENTRIES,
+                    ttl_seconds=PAGE_CACHE_TTL_SECONDS,
+                )
+    return _page_cache
+
+
+def page_cache_key(template, data_names, variant=""):
+    versions = current_versions(data_names)
+    raw = "|".join([template, variant] + [f"{name}={versions[name]}" for name in sorted(versions)])
+    return f"{template}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def get_cached_page(template, data_names, render, variant=""):
+    """以 template + 資料版本 (+ variant) 為 key 快取渲染後的 HTML。"""
+    cache = _get_page_cache()
+    key = page_cache_key(template, data_names, variant)
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html)
+    return html
@@ -0,0 +1,165 @@
+import logging
+import uuid
+from datetime import timedelta
+
+import database
+from repositories.committee_quota_repository import committee_release_quantities, release_committee_quotas
+from repositories.finance_rollup_repository import mark_finance_days_dirty
+from repositories.job_state_repository import acquire_job_lease, release_job_lease, update_job_state
+from repositories.member_repository import record_member_orders
+from tasks.notifications import delay_notification, send_order_cancelled_emails
+from utils.business_rules import UNPAID_ORDER_GRACE_HOURS
+from utils.env import env_int
+from utils.errors import ServiceUnavailableError
+from utils.timezone import utc_now
+
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_UNPAID_JOB = "cleanup_unpaid_orders"
+CLEANUP_ORDER_PROJECTION = {
+    "orderId": 1,
+    "lineId": 1,
+    "orderType": 1,
+    "status": 1,
+    "createdAt": 1,
+    "items.name": 1,
+    "items.qty": 1,
+    "customer.email": 1,
+    "customer.name": 1,
+}
+
+
+CLEANUP_BATCH_SIZE = max(1, env_int("CLEANUP_BATCH_SIZE", 200))
+CLEANUP_LEASE_SECONDS = max(30, env_int("CLEANUP_LEASE_SECONDS", 300))
+
+
+def _require_db():
+    if database.db is None:
+        raise ServiceUnavailableError("Database is not available")
+    return database.db
+
+
+def _expired_query(cutoff, after=None):
+    query = {"status": "pending", "createdAt": {"$lt": cutoff}}
+    if after:
+        created_at, last_id = after
+        query["$or"] = [
+            {"createdAt": {"$gt": created_at}},
+            {"createdAt": created_at, "_id": {"$gt": last_id}},
+        ]
+    return query
+
+
+def _cancel_payload(order):
+    customer = order.get("customer") or {}
+    return {
+        "email": customer.get("email"),
+        "orderId": order.get("orderId", ""),
+        "customerName": customer.get("name", "信徒"),
+        "reason": "expired",
+    }
+
+
+def _delete_chunk(chunk, cutoff):
+    """刪除這批仍為 pending 的訂單，回傳實際已不存在的訂單（可重複執行）。"""
+    db = _require_db()
+    ids = [order["_id"] for order in chunk]
+    db.orders.delete_many({"_id": {"$in": ids}, "status": "pending", "createdAt": {"$lt": cutoff}})
+    remaining = {doc["_id"] for doc in db.orders.find({"_id": {"$in": ids}}, {"_id": 1})}
+    deleted = [order for order in chunk if order["_id"] not in remaining]
+    mark_finance_days_dirty(deleted)
+    record_member_orders(deleted, -1)
+    return deleted
+
+
+def _finish_chunk(state, owner):
+    """刪除後的收尾：補回名額、排入一個批次通知任務，最後推進 watermark。"""
+    chunk = state.get("chunk") or []
+    cutoff = state["cutoff"]
+    step = state.get("chunkStep")
+
+    deleted = state.get("chunkDeleted")
+    if step == "fetched":
+        deleted = _delete_chunk(chunk, cutoff)
+        update_job_state(CLEANUP_UNPAID_JOB, owner, {"chunkStep": "deleted", "chunkDeleted": deleted})
+        step = "deleted"
+
+    deleted = deleted or []
+    if step == "deleted":
+        release_committee_quotas(committee_release_quantities(deleted))
+        update_job_state(CLEANUP_UNPAID_JOB, owner, {"chunkStep": "released"})
+
+    payloads = [_cancel_payload(order) for order in deleted if (order.get("customer") or {}).get("email")]
+    if payloads:
+        delay_notification(send_order_cancelled_emails, payloads)
+
+    last = chunk[-1] if chunk else None
+    fields = {"deletedCount": int(state.get("deletedCount", 0)) + len(deleted)}
+    if last:
+        fields["after"] = {"createdAt": last.get("createdAt"), "_id": last["_id"]}
+    update_job_state(
+        CLEANUP_UNPAID_JOB,
+        owner,
+        fields,
+        unset=["chunk", "chunkStep", "chunkDeleted"],
+        lease_seconds=CLEANUP_LEASE_SECONDS,
+    )
+    state.update(fields)
+    return len(deleted)
+
+
+def cleanup_unpaid_orders(batch_size=None, grace_hours=None):
+    """串流清除逾期未付款訂單，可中斷續跑。
+
+    進度（cutoff、watermark 與處理中的批次）記在 job_state；上次中斷時會沿用同一個 cutoff，
+    並先完成未收尾的批次。回傳 {"count", "skipped"}。
+    """
+    db = _require_db()
+    batch_size = max(1, int(batch_size or CLEANUP_BATCH_SIZE))
+    owner = uuid.uuid4().hex
+    state = acquire_job_lease(CLEANUP_UNPAID_JOB, owner, CLEANUP_LEASE_SECONDS)
+    if state is None:
+        logger.info("Cleanup already running", extra={"event": "cleanup_unpaid_skipped"})
+        return {"count": 0, "skipped": True}
+
+    deleted_total = 0
+    try:
+        if state.get("status") != "running" or not state.get("cutoff"):
+            hours = UNPAID_ORDER_GRACE_HOURS if grace_hours is None else grace_hours
+            state = {
+                "status": "running",
+                "cutoff": utc_now() - timedelta(hours=hours),
+                "deletedCount": 0,
+                "startedAt": utc_now(),
+            }
+            update_job_state(CLEANUP_UNPAID_JOB, owner, state, unset=["after", "chunk", "chunkStep", "chunkDeleted"])
+        elif state.get("chunk"):
+            logger.info("Resuming unfinished cleanup chunk", extra={"event": "cleanup_unpaid_resumed"})
+            deleted_total += _finish_chunk(state, owner)
+
+        while True:
+            after = state.get("after")
+            after_key = (after["createdAt"], after["_id"]) if after else None
+            chunk = list(
+                db.orders.find(_expired_query(state["cutoff"], after_key), CLEANUP_ORDER_PROJECTION)
+                .sort([("createdAt", 1), ("_id", 1)])
+                .limit(batch_size)
+            )
+            if not chunk:
+                break
+            state.update({"chunk": chunk, "chunkStep": "fetched", "chunkDeleted": None})
+            update_job_state(CLEANUP_UNPAID_JOB, owner, {"chunk": chunk, "chunkStep": "fetched"})
+            deleted_total += _finish_chunk(state, owner)
+    except Exception:
+        logger.exception("Cleanup unpaid orders failed", extra={"event": "cleanup_unpaid_failed"})
+        release_job_lease(CLEANUP_UNPAID_JOB, owner)
+        raise
+
+    release_job_lease(CLEANUP_UNPAID_JOB, owner, {
+        "status": "idle",
+        "lastRunDeleted": int(state.get("deletedCount", 0)),
+        "finishedAt": utc_now(),
+    })
+    logger.info("Cleanup unpaid orders finished", extra={"event": "cleanup_unpaid_finished", "count": deleted_total})
+    return {"count": deleted_total, "skipped": False}
@@ -0,0 +1,375 @@
+import csv
+import io
+import logging
+import time
+from datetime import timedelta
+
+from repositories.export_job_repository import (
+    claim_export_job,
+    create_export_job,
+    fail_stale_export_job,
+    find_export_job,
+    open_export_upload,
+    update_export_job,
+)
+from repositories.order_repository import (
+    count_orders,
+    donation_report_query,
+    has_orders,
+    iter_donation_report_orders,
+)
+from services.feedback_service import count_feedback, iter_enriched_feedback
+from services.history_service import HISTORY_TYPE_LABELS, count_history_data, iter_history_data
+from utils.env import env_int
+from utils.security import as_string
+from utils.timezone import ensure_aware_utc, format_taipei, taipei_date_range_query, taipei_now, utc_now
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILTER_KEYS = ("order_type", "order_id", "name", "status", "start", "end")
+HISTORY_CSV_HEADER = ['資料類型', '單號', '類型', '狀態', '姓名', '電話', 'Email', '地址', '項目/內容', '金額', '建立日期', '付款/核准日期']
+
+
+# 每累積 N 列才送出一次，記憶體上限固定在單一 chunk 大小。
+HISTORY_CSV_CHUNK_ROWS = max(1, env_int('HISTORY_CSV_CHUNK_ROWS', 200))
+# 背景匯出回寫進度的最短間隔（秒），避免每個 chunk 都寫一次 export_jobs。
+EXPORT_PROGRESS_INTERVAL_SECONDS = max(0, env_int('EXPORT_PROGRESS_INTERVAL_SECONDS', 1))
+# queued/running 超過此秒數沒有任何回寫，視為執行中的 worker 已重啟或遺失。
+EXPORT_JOB_STALE_SECONDS = max(60, env_int('EXPORT_JOB_STALE_SECONDS', 900))
+
+DONATION_REPORT_TYPES = ('donation', 'fund', 'committee')
+DONATION_REPORT_TITLES = {'fund': '建廟基金護持清單', 'committee': '委員會護持清單', 'donation': '捐贈稟報清單'}
+
+
+def safe_csv_cell(value):
+    if value is None:
+        text = ''
+    else:
+        text = str(value)
+    if text.lstrip()[:1] in ('=', '+', '-', '@'):
+        return "'" + text
+    return text
+
+
+def history_csv_row(doc):
+    is_feedback = doc.get('orderType') == 'feedback'
+    cust = doc.get('customer', {})
+    if is_feedback:
+        data_type = '回饋'
+        type_label = HISTORY_TYPE_LABELS['feedback']
+        name_text = doc.get('realName') or doc.get('nickname') or cust.get('name', '')
+        phone = doc.get('phone', '')
+        email = doc.get('email', '')
+        address = doc.get('address', '')
+        items_str = doc.get('content', '')
+        amount = '0'
+        settled_at = doc.get('approvedAt') or doc.get('sentAt') or ''
+    else:
+        data_type = '訂單'
+        type_label = HISTORY_TYPE_LABELS.get(doc.get('orderType', ''), '')
+        name_text = cust.get('name', '')
+        phone = cust.get('phone', '')
+        email = cust.get('email', '')
+        address = cust.get('address', '')
+        items_str = '；'.join([
+            f"{i.get('name', '')}{'('+i.get('variantName', '')+')' if i.get('variantName') else ''}x{i.get('qty', 1)}"
+            for i in doc.get('items', [])
+        ])
+        amount = str(doc.get('total', 0))
+        settled_at = doc.get('paidAt', '')
+    row = [
+        data_type,
+        doc.get('orderId', ''),
+        type_label,
+        doc.get('status', ''),
+        name_text,
+        phone,
+        email,
+        address,
+        items_str,
+        amount,
+        doc.get('createdAt', ''),
+        settled_at,
+    ]
+    return [safe_csv_cell(value) for value in row]
+
+
+def history_export_filename():
+    return f"export_{taipei_now().strftime('%Y%m%d')}.csv"
+
+
+def iter_history_csv(filters, chunk_rows=HISTORY_CSV_CHUNK_ROWS, on_progress=None):
+    """以固定大小的 chunk 產生 CSV 文字；不論匯出多少筆，記憶體只保留一個 chunk。"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    buffer.write('\ufeff')  # BOM for Excel
+    writer.writerow(HISTORY_CSV_HEADER)
+
+    pending = 0
+    row_count = 0
+    for doc in iter_history_data(*(filters.get(key, '') for key in HISTORY_FILTER_KEYS)):
+        writer.writerow(history_csv_row(doc))
+        pending += 1
+        row_count += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+            if on_progress:
+                on_progress(row_count)
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
+    if on_progress:
+        on_progress(row_count)
+
+
+def _count_history(params):
+    return count_history_data(*(params.get(key, '') for key in HISTORY_FILTER_KEYS))
+
+
+def _iter_text_chunks(lines, chunk_rows, on_progress, header=''):
+    """lines 每個元素是一筆資料的完整文字；累積 chunk_rows 筆才送出一次。"""
+    buffer = io.StringIO()
+    buffer.write(header)
+    pending = 0
+    row_count = 0
+    for text in lines:
+        buffer.write(text)
+        pending += 1
+        row_count += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+            if on_progress:
+                on_progress(row_count)
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
+    if on_progress:
+        on_progress(row_count)
+
+
+def parse_donation_report_params(source):
+    """解析稟報清單匯出條件；回傳 (params, error_message)。"""
+    order_type = as_string(source.get('type'), 'donation') or 'donation'
+    if order_type not in DONATION_REPORT_TYPES:
+        return None, "不支援的查詢類型"
+    return {
+        "type": order_type,
+        "start": as_string(source.get('start')).strip(),
+        "end": as_string(source.get('end')).strip(),
+    }, None
+
+
+def _donation_report_query(params):
+    updated_range = None
+    if params.get('start') and params.get('end'):
+        try:
+            updated_range = taipei_date_range_query(params['start'], params['end'])
+        except ValueError:
+            updated_range = None
+    return donation_report_query(params.get('type') or 'donation', updated_range)
+
+
+def donation_report_entry(index, doc, order_type):
+    cust = doc.get('customer', {})
+    items_str = "、".join([f"{i.get('name', '')}{'['+i.get('variantName', '')+']' if i.get('variantName') else ''}x{i.get('qty', 1)}" for i in doc.get('items', [])])
+    lines = [
+        f"【{index}】\n",
+        f"日期：{format_taipei(doc.get('updatedAt'), '%Y/%m/%d')}\n",
+        f"姓名：{cust.get('name', '')}\n",
+        f"農曆：{cust.get('lunarBirthday', '')}\n",
+        f"地址：{cust.get('address', '')}\n",
+    ]
+    if order_type in ['fund', 'committee']:
+        lines.append(f"金額：${doc.get('total', 0)}\n")
+        lines.append(f"末五碼：{cust.get('last5', '無')}\n")
+    lines.append(f"項目：{items_str}\n")
+    lines.append("-" * 20 + "\n")
+    return ''.join(lines)
+
+
+def iter_donations_txt(params, chunk_rows=HISTORY_CSV_CHUNK_ROWS, on_progress=None):
+    order_type = params.get('type') or 'donation'
+    report_title = DONATION_REPORT_TITLES.get(order_type, '護持清單')
+    header = f"{report_title}\n匯出日期：{taipei_now().strftime('%Y-%m-%d')}\n" + "=" * 40 + "\n\n"
+    orders = iter_donation_report_orders(_donation_report_query(params))
+    lines = (donation_report_entry(index, doc, order_type) for index, doc in enumerate(orders, start=1))
+    return _iter_text_chunks(lines, chunk_rows, on_progress, header)
+
+
+def count_donation_report(params):
+    return count_orders(_donation_report_query(params))
+
+
+def has_donation_report_rows(params):
+    return has_orders(_donation_report_query(params))
+
+
+def iter_feedback_txt(params, chunk_rows=HISTORY_CSV_CHUNK_ROWS, on_progress=None):
+    """待寄送（approved）回饋名單。"""
+    header = f"匯出時間: {taipei_now().strftime('%Y-%m-%d %H:%M')}\n\n"
+    lines = (
+        f"【編號】{doc.get('feedbackId', '無')}\n"
+        f"姓名：{doc.get('realName', '')}\n"
+        f"電話：{doc.get('phone', '')}\n"
+        f"地址：{doc.get('address', '')}\n"
+        + "-" * 30 + "\n"
+        for doc in iter_enriched_feedback("approved", "approvedAt", 1)
+    )
+    return _iter_text_chunks(lines, chunk_rows, on_progress, header)
+
+
+def iter_sent_feedback_txt(params, chunk_rows=HISTORY_CSV_CHUNK_ROWS, on_progress=None):
+    header = f"已寄送名單匯出\n匯出時間: {taipei_now().strftime('%Y-%m-%d %H:%M')}\n" + "=" * 50 + "\n"
+    lines = (
+        f"{doc.get('realName', '')}\t{doc.get('phone', '')}\t{doc.get('address', '')}\n"
+        for doc in iter_enriched_feedback("sent", "sentAt", -1)
+    )
+    return _iter_text_chunks(lines, chunk_rows, on_progress, header)
+
+
+# 各類匯出的設定；新增匯出種類只需在這裡登記，背景任務與下載端點共用。
+EXPORT_KINDS = {
+    "history_csv": {
+        "roles": ('super_admin', 'data', 'finance'),
+        "mimetype": 'text/csv; charset=utf-8',
+        "filename": lambda params: history_export_filename(),
+        "iter_chunks": iter_history_csv,
+        "count": _count_history,
+    },
+    "donations_txt": {
+        "roles": ('super_admin', 'ops', 'data'),
+        "mimetype": 'text/plain; charset=utf-8',
+        "filename": lambda params: f"{params.get('type') or 'donation'}_list.txt",
+        "iter_chunks": iter_donations_txt,
+        "count": count_donation_report,
+    },
+    "feedback_txt": {
+        "roles": ('super_admin', 'ops', 'data'),
+        "mimetype": 'text/plain; charset=utf-8',
+        "filename": lambda params: "feedback_list.txt",
+        "iter_chunks": iter_feedback_txt,
+        "count": lambda params: count_feedback("approved"),
+    },
+    "feedback_sent_txt": {
+        "roles": ('super_admin', 'ops', 'data'),
+        "mimetype": 'text/plain; charset=utf-8',
+        "filename": lambda params: "sent_feedback_list.txt",
+        "iter_chunks": iter_sent_feedback_txt,
+        "count": lambda params: count_feedback("sent"),
+    },
+}
+EXPORT_JOB_ROLES = sorted({role for spec in EXPORT_KINDS.values() for role in spec["roles"]})
+
+
+def export_kind_allowed(kind, permissions):
+    spec = EXPORT_KINDS.get(kind)
+    if spec is None:
+        return False
+    return 'super_admin' in permissions or any(role in permissions for role in spec["roles"])
+
+
+def start_export_job(kind, params, requested_by):
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"unknown export kind: {kind}")
+    return create_export_job(kind, params, requested_by)
+
+
+def start_history_export_job(filters, requested_by):
+    params = {key: filters.get(key, '') for key in HISTORY_FILTER_KEYS}
+    return start_export_job("history_csv", params, requested_by)
+
+
+def run_export_job(job_id):
+    """背景 worker 執行：串流寫入 GridFS，期間定期回寫進度，完成後回寫 job 狀態。"""
+    job = find_export_job(job_id)
+    if not job:
+        logger.warning("Export job not found", extra={"event": "export_job_missing", "target": str(job_id)})
+        return False
+    spec = EXPORT_KINDS.get(job.get("kind"))
+    if spec is None:
+        update_export_job(job["_id"], {"status": "failed", "error": "unknown_kind", "finishedAt": utc_now()})
+        return False
+
+    job = claim_export_job(job["_id"])
+    if job is None:
+        # 已被其他 worker 接手或已結束
+        return False
+
+    params = job.get("params") or {}
+    filename = spec["filename"](params)
+    progress = {"rows": 0, "reportedAt": time.monotonic()}
+
+    def track(rows):
+        progress["rows"] = rows
+        now = time.monotonic()
+        if now - progress["reportedAt"] >= EXPORT_PROGRESS_INTERVAL_SECONDS:
+            progress["reportedAt"] = now
+            update_export_job(job["_id"], {"rowCount": rows})
+
+    try:
+        counter = spec.get("count")
+        if counter:
+            update_export_job(job["_id"], {"totalRows": counter(params)})
+        with open_export_upload(filename, {"jobId": job["_id"], "kind": job["kind"]}) as upload:
+            for chunk in spec["iter_chunks"](params, on_progress=track):
+                upload.write(chunk.encode('utf-8'))
+            file_id = upload._id
+    except Exception as exc:
+        logger.exception("Export job failed", extra={"event": "export_job_failed", "target": str(job["_id"])})
+        update_export_job(job["_id"], {"status": "failed", "error": str(exc), "finishedAt": utc_now()})
+        return False
+
+    update_export_job(job["_id"], {
+        "status": "done",
+        "fileId": file_id,
+        "filename": filename,
+        "rowCount": progress["rows"],
+        "finishedAt": utc_now(),
+    })
+    logger.info("Export job finished", extra={"event": "export_job_done", "target": str(job["_id"]), "count": progress["rows"]})
+    return True
+
+
+def expire_stale_export_job(job):
+    """process 內 thread pool 的工作在重啟後不會再有人接手；查詢狀態時把逾時未更新的工作標為失敗，讓前端可以重新匯出。"""
+    if job.get("status") not in ("queued", "running"):
+        return job
+    stale_before = utc_now() - timedelta(seconds=EXPORT_JOB_STALE_SECONDS)
+    updated_at = ensure_aware_utc(job.get("updatedAt"))
+    if updated_at is not None and updated_at >= stale_before:
+        return job
+    expired = fail_stale_export_job(job["_id"], stale_before)
+    if expired is None:
+        return job
+    logger.warning("Export job went stale", extra={"event": "export_job_stale", "target": str(job["_id"])})
+    return expired
+
+
+def serialize_export_job(job):
+    row_count = job.get("rowCount", 0)
+    total_rows = job.get("totalRows")
+    if job.get("status") == "done":
+        percent = 100
+    elif total_rows:
+        percent = min(99, int(row_count * 100 / total_rows))
+    else:
+        percent = 0
+    return {
+        "jobId": str(job["_id"]),
+        "kind": job.get("kind"),
+        "status": job.get("status"),
+        "rowCount": row_count,
+        "totalRows": total_rows,
+        "progress": percent,
+        "filename": job.get("filename", ''),
+        "error": job.get("error", ''),
+    }
@@ -0,0 +1,76 @@
+import database
+from utils.timezone import format_taipei
+
+
+def enrich_feedback_for_admin(cursor):
+    """解決 N+1 Query：批次取得 User 與 sent 狀態，避免在迴圈內反覆查詢資料庫"""
+    docs = list(cursor)
+    if not docs:
+        return []
+
+    line_ids = list({d.get('lineId') for d in docs if d.get('lineId')})
+
+    users_map = {}
+    if line_ids:
+        user_projection = {
+            "lineId": 1,
+            "realName": 1,
+            "phone": 1,
+            "address": 1,
+            "email": 1,
+            "lunarBirthday": 1,
+        }
+        for u in database.db.users.find({"lineId": {"$in": line_ids}}, user_projection):
+            users_map[u['lineId']] = u
+
+    sent_set = set()
+    if line_ids:
+        sent_counts = database.db.feedback.aggregate([
+            {"$match": {"lineId": {"$in": line_ids}, "status": "sent"}},
+            {"$group": {"_id": "$lineId"}}
+        ])
+        sent_set = {item['_id'] for item in sent_counts}
+
+    results = []
+    for doc in docs:
+        line_id = doc.get('lineId')
+        user = users_map.get(line_id, {})
+
+        doc['realName'] = doc.get('realName') or user.get('realName') or '未填寫'
+        doc['phone'] = doc.get('phone') or user.get('phone') or '未填寫'
+        doc['address'] = doc.get('address') or user.get('address') or '未填寫'
+        doc['email'] = doc.get('email') or user.get('email') or ''
+        doc['lunarBirthday'] = doc.get('lunarBirthday') or user.get('lunarBirthday') or '未提供'
+        doc['has_received'] = (line_id in sent_set)
+        doc['_id'] = str(doc['_id'])
+
+        for field, fmt in [('createdAt', '%Y-%m-%d %H:%M:%S'), ('approvedAt', '%Y-%m-%d %H:%M'), ('sentAt', '%Y-%m-%d %H:%M')]:
+            if field in doc:
+                val = doc[field]
+                if isinstance(val, str):
+                    pass  # already a string, keep as-is
+                else:
+                    try:
+                        doc[field] = format_taipei(val, fmt)
+                    except Exception:
+                        doc[field] = str(val) if val else ''
+
+        results.append(doc)
+    return results
+
+
+def iter_enriched_feedback(status, sort_field, direction, batch_size=500):
+    """逐批補齊回饋的個資欄位；匯出大量回饋時記憶體只保留一批。"""
+    cursor = database.db.feedback.find({"status": status}).sort(sort_field, direction).batch_size(batch_size)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield from enrich_feedback_for_admin(batch)
+            batch = []
+    if batch:
+        yield from enrich_feedback_for_admin(batch)
+
+
+def count_feedback(status):
+    return database.db.feedback.count_documents({"status": status})
@@ -1,8 +1,31 @@
-from repositories.order_repository import (
-    aggregate_finance_summary,
-    find_finance_pending_orders,
+import logging
+import uuid
+from datetime import timedelta
+
+from repositories.finance_rollup_repository import (
+    aggregate_finance_rollups,
+    clear_dirty_finance_days,
+    find_changed_order_days,
+    find_dirty_finance_days,
+    rebuild_all_finance_rollups,
+    rebuild_finance_rollup_days,
 )
-from utils.timezone import format_taipei
+from repositories.job_state_repository import acquire_job_lease, get_job_state, release_job_lease
+from repositories.order_repository import find_finance_pending_orders
+from utils.env import env_int
+from utils.serialization import format_taipei_fields, taipei_text
+from utils.timezone import API_DATE_FORMAT, ensure_aware_utc, utc_now
+
+
+logger = logging.getLogger(__name__)
+
+
+FINANCE_ROLLUP_JOB = "finance_rollups"
+FINANCE_ROLLUP_LEASE_SECONDS = 120
+# 增量更新時 watermark 往回多看一段，涵蓋 updatedAt 先取值、稍後才寫入的訂單。
+FINANCE_ROLLUP_OVERLAP = timedelta(seconds=60)
+# 平常由 beat 定期更新；讀取摘要時只有 watermark 超過這個秒數（例如 beat 沒有執行）才順手補一次。
+FINANCE_ROLLUP_READ_STALE_SECONDS = max(0, env_int("FINANCE_ROLLUP_READ_STALE_SECONDS", 900))
 
 
 TYPE_LABELS = {
@@ -17,11 +40,9 @@ def _serialize_finance_order(doc):
     """將 MongoDB 文件轉成前端可安全使用的財務單據格式。"""
     result = dict(doc)
     result["_id"] = str(result["_id"])
-    result["createdAt"] = format_taipei(result.get("createdAt"))
+    result["createdAt"] = taipei_text(result.get("createdAt"))
     result["source_label"] = TYPE_LABELS.get(result.get("orderType", ""), "未知")
-    if result.get("paymentDeadline"):
-        result["paymentDeadline"] = format_taipei(result["paymentDeadline"])
-    return result
+    return format_taipei_fields(result, ("paymentDeadline",))
 
 
 def get_finance_pending(limit=None):
@@ -30,9 +51,57 @@ def get_finance_pending(limit=None):
     return [_serialize_finance_order(doc) for doc in docs]
 
 
-def get_finance_summary():
-    """取得財務摘要，依 orderType/status 整理為前端既有結構。"""
-    raw_summary = aggregate_finance_summary()
+def refresh_finance_rollups():
+    """把 watermark 之後異動的訂單日期與刪除留下的髒日期重算進 finance_rollups。
+
+    第一次執行（沒有 watermark）時全量重建。其他程序正在更新時直接略過並回傳 False。
+    """
+    owner = uuid.uuid4().hex
+    state = acquire_job_lease(FINANCE_ROLLUP_JOB, owner, FINANCE_ROLLUP_LEASE_SECONDS)
+    if state is None:
+        return False
+
+    started = utc_now()
+    try:
+        dirty = find_dirty_finance_days()
+        watermark = state.get("watermark")
+        if watermark is None:
+            days = rebuild_all_finance_rollups()
+            logger.info("Finance rollups rebuilt", extra={"event": "finance_rollups_rebuilt", "count": days})
+        else:
+            days = find_changed_order_days(watermark - FINANCE_ROLLUP_OVERLAP) | set(dirty)
+            if days:
+                rebuild_finance_rollup_days(sorted(days))
+        clear_dirty_finance_days(dirty)
+    except Exception:
+        release_job_lease(FINANCE_ROLLUP_JOB, owner)
+        raise
+    release_job_lease(FINANCE_ROLLUP_JOB, owner, {"watermark": started})
+    return True
+
+
+def _refresh_stale_finance_rollups():
+    """rollup 太久沒更新時在讀取端補一次；更新失敗只記錄，摘要仍以現有 rollup 回應。"""
+    state = get_job_state(FINANCE_ROLLUP_JOB) or {}
+    watermark = ensure_aware_utc(state.get("watermark"))
+    if watermark is not None and utc_now() - watermark < timedelta(seconds=FINANCE_ROLLUP_READ_STALE_SECONDS):
+        return
+    try:
+        refresh_finance_rollups()
+    except Exception:
+        logger.exception("Finance rollup refresh failed", extra={"event": "finance_rollups_refresh_failed"})
+
+
+def get_finance_summary(start_date=None, end_date=None):
+    """取得財務摘要，依 orderType/status 整理為前端既有結構。
+
+    只彙總 rollup 文件，增量更新交給 beat；可選擇以台北日期區間（含迄日）篩選。
+    """
+    _refresh_stale_finance_rollups()
+    raw_summary = aggregate_finance_rollups(
+        start_date.strftime(API_DATE_FORMAT) if start_date else None,
+        end_date.strftime(API_DATE_FORMAT) if end_date else None,
+    )
     summary = {}
     for item in raw_summary:
         group = item.get("_id") or {}
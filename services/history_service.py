@@ -1,33 +1,82 @@
-from repositories.history_repository import get_paginated_history
+import threading
+import time
+
+from bson import json_util
+
+from repositories.history_repository import (
+    count_history,
+    get_history_page_after,
+    get_paginated_history,
+    iter_history,
+)
+from utils.pagination import decode_cursor, encode_cursor
+from repositories.job_state_repository import get_job_state
+from utils.env import env_int
+from utils.search_tokens import SEARCH_TOKENS_BACKFILL_JOB, plan_id_query, plan_name_query
 from utils.security import safe_regex_contains
-from utils.timezone import taipei_date_range_query, format_taipei
+from utils.serialization import format_taipei_fields, taipei_text
+from utils.timezone import taipei_date_range_query
 
-_TYPE_LABELS = {
+HISTORY_TYPE_LABELS = {
     'shop': '🛍️ 結緣品',
     'donation': '🕯️ 捐香',
     'fund': '🏗️ 建廟基金',
     'committee': '🏛️ 委員會',
     'feedback': '💬 回饋'
 }
+_ORDER_DATE_FIELDS = ('updatedAt', 'paymentDeadline', 'paidAt', 'shippedAt', 'reportedAt')
+_FEEDBACK_DATE_FIELDS = ('approvedAt', 'sentAt')
 
-def fetch_history_data(order_type, order_id, name, status, start, end, page, per_page):
-    skip = (page - 1) * per_page
-    
+
+# 總筆數只是參考值，同一組篩選條件在 TTL 內共用同一次計數。
+HISTORY_COUNT_CACHE_SECONDS = env_int('HISTORY_COUNT_CACHE_SECONDS', 60)
+HISTORY_COUNT_CACHE_MAX_ENTRIES = 256
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+# 回填完成前每隔這麼多秒重新確認一次；完成後不會再退回，就不再查詢。
+SEARCH_TOKENS_CHECK_SECONDS = 60
+_search_tokens_state = {"ready": False, "checkedAt": None}
+
+
+def search_tokens_ready():
+    """searchTokens 回填是否已完成；未完成時舊文件沒有 token，查詢必須維持 regex 才不會漏資料。"""
+    if _search_tokens_state["ready"]:
+        return True
+    now = time.monotonic()
+    checked_at = _search_tokens_state["checkedAt"]
+    if checked_at is not None and now - checked_at < SEARCH_TOKENS_CHECK_SECONDS:
+        return False
+    state = get_job_state(SEARCH_TOKENS_BACKFILL_JOB) or {}
+    _search_tokens_state["ready"] = state.get("completedAt") is not None
+    _search_tokens_state["checkedAt"] = now
+    return _search_tokens_state["ready"]
+
+
+def build_history_matches(order_type, order_id, name, status, start, end):
+    """組裝 orders / feedback 兩邊的查詢條件，分頁與匯出共用同一套篩選規則。"""
     # --- 1. 組裝 Orders 查詢條件 ---
     orders_match = {}
     if order_type and order_type != 'feedback':
         orders_match['orderType'] = order_type
     elif order_type == 'feedback':
         # 巧妙設計：如果前端只想查 feedback，我們讓 orders 條件絕對不成立，節省效能
-        orders_match['_id'] = "never_match" 
+        orders_match['_id'] = "never_match"
 
-    if order_id:
+    # 單號/姓名先走 searchTokens 索引；token 無法表達的短尾碼，或回填尚未完成時，維持 regex。
+    use_tokens = bool(order_id or name) and search_tokens_ready()
+    id_tokens = plan_id_query(order_id) if order_id and use_tokens else None
+    name_tokens = plan_name_query(name) if name and use_tokens else None
+    tokens = (id_tokens or []) + (name_tokens or [])
+
+    if order_id and not id_tokens:
         orders_match['orderId'] = {"$regex": safe_regex_contains(order_id), "$options": "i"}
     if name:
         orders_match['customer.name'] = {"$regex": safe_regex_contains(name)}
+    if tokens:
+        orders_match['searchTokens'] = {"$all": tokens}
     if status:
         orders_match['status'] = status
-    
+
     date_range = None
     if start and end:
         try:
@@ -40,9 +89,11 @@ def fetch_history_data(order_type, order_id, name, status, start, end, page, per
     feedback_match = {}
     if order_type and order_type != 'feedback':
         feedback_match['_id'] = "never_match"
-        
-    if order_id:
+
+    if order_id and not id_tokens:
         feedback_match['feedbackId'] = {"$regex": safe_regex_contains(order_id), "$options": "i"}
+    if tokens:
+        feedback_match['searchTokens'] = {"$all": tokens}
     if name:
         name_regex = {"$regex": safe_regex_contains(name), "$options": "i"}
         feedback_match['$or'] = [
@@ -54,29 +105,79 @@ def fetch_history_data(order_type, order_id, name, status, start, end, page, per
     if date_range:
         feedback_match['createdAt'] = date_range
 
+    return orders_match, feedback_match
+
+
+def _format_history_doc(doc):
+    """整理日期與標籤，移除內部使用的 _docType 標記。"""
+    doc['_id'] = str(doc['_id'])
+    doc['createdAt'] = taipei_text(doc.get('createdAt'))
+
+    if doc['_docType'] == 'order':
+        format_taipei_fields(doc, _ORDER_DATE_FIELDS)
+        doc['source_label'] = HISTORY_TYPE_LABELS.get(doc.get('orderType', ''), '未知')
+    else:
+        doc['source_label'] = '💬 回饋'
+        format_taipei_fields(doc, _FEEDBACK_DATE_FIELDS)
+
+    doc.pop('_docType', None)
+    return doc
+
+
+def fetch_history_data(order_type, order_id, name, status, start, end, page, per_page):
+    skip = (page - 1) * per_page
+    orders_match, feedback_match = build_history_matches(order_type, order_id, name, status, start, end)
+
     # --- 3. 呼叫 Repository 取出資料 ---
     raw_data, total = get_paginated_history(orders_match, feedback_match, skip, per_page)
 
     # --- 4. 格式化回傳結果 (整理日期與標籤) ---
-    results = []
-    for doc in raw_data:
-        doc['_id'] = str(doc['_id'])
-        doc['createdAt'] = format_taipei(doc.get('createdAt'))
-        
-        if doc['_docType'] == 'order':
-            if doc.get('updatedAt'): doc['updatedAt'] = format_taipei(doc['updatedAt'])
-            if doc.get('paymentDeadline'): doc['paymentDeadline'] = format_taipei(doc['paymentDeadline'])
-            doc['source_label'] = _TYPE_LABELS.get(doc.get('orderType', ''), '未知')
-            if doc.get('paidAt'): doc['paidAt'] = format_taipei(doc['paidAt'])
-            if doc.get('shippedAt'): doc['shippedAt'] = format_taipei(doc['shippedAt'])
-            if doc.get('reportedAt'): doc['reportedAt'] = format_taipei(doc['reportedAt'])
-        else:
-            doc['source_label'] = '💬 回饋'
-            if doc.get('approvedAt'): doc['approvedAt'] = format_taipei(doc['approvedAt'])
-            if doc.get('sentAt'): doc['sentAt'] = format_taipei(doc['sentAt'])
-        
-        # 移除內部使用的標記
-        doc.pop('_docType', None)
-        results.append(doc)
-        
+    results = [_format_history_doc(doc) for doc in raw_data]
     return results, total
+
+
+def iter_history_data(order_type, order_id, name, status, start, end):
+    """逐筆產生格式化後的歷史資料，供串流匯出使用；不計總數、不設筆數上限。"""
+    orders_match, feedback_match = build_history_matches(order_type, order_id, name, status, start, end)
+    for doc in iter_history(orders_match, feedback_match):
+        yield _format_history_doc(doc)
+
+
+def count_history_data(order_type, order_id, name, status, start, end):
+    orders_match, feedback_match = build_history_matches(order_type, order_id, name, status, start, end)
+    return count_history(orders_match, feedback_match)
+
+
+def _cached_history_count(orders_match, feedback_match):
+    key = json_util.dumps([orders_match, feedback_match], sort_keys=True)
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    total = count_history(orders_match, feedback_match)
+    with _count_cache_lock:
+        if len(_count_cache) >= HISTORY_COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.clear()
+        _count_cache[key] = (now + HISTORY_COUNT_CACHE_SECONDS, total)
+    return total
+
+
+def fetch_history_cursor_page(order_type, order_id, name, status, start, end, cursor, per_page, with_total=False):
+    """Keyset 分頁版歷史總表；回傳 (results, next_cursor, total)，total 未要求時為 None。"""
+    after = decode_cursor(cursor) if cursor else None
+    orders_match, feedback_match = build_history_matches(order_type, order_id, name, status, start, end)
+
+    raw_data = get_history_page_after(orders_match, feedback_match, after, per_page + 1)
+    has_more = len(raw_data) > per_page
+    raw_data = raw_data[:per_page]
+
+    next_cursor = None
+    if has_more and raw_data:
+        last = raw_data[-1]
+        next_cursor = encode_cursor(last.get('createdAt'), last['_id'])
+
+    results = [_format_history_doc(doc) for doc in raw_data]
+    total = _cached_history_count(orders_match, feedback_match) if with_total else None
+    return results, next_cursor, total
@@ -0,0 +1,285 @@
+import logging
+from collections import defaultdict
+
+from pymongo.errors import OperationFailure
+
+from database import INDEX_OPTION_KEYS, INDEX_SPECS
+from repositories.query_shapes import QUERY_SHAPES
+
+
+logger = logging.getLogger(__name__)
+
+# 這些選項改變了索引的語意（唯一性、部分索引、TTL），不論使用率都不建議移除。
+PROTECTED_OPTIONS = ('unique', 'partialFilterExpression', 'expireAfterSeconds')
+
+
+def _keys(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+
+def declared_indexes(specs=INDEX_SPECS):
+    return [
+        {
+            "collection": collection,
+            "name": kwargs["name"],
+            "keys": _keys(keys),
+            "options": {option: kwargs[option] for option in INDEX_OPTION_KEYS if option in kwargs},
+        }
+        for collection, keys, kwargs in specs
+    ]
+
+
+def _is_protected(index):
+    return any(option in index["options"] for option in PROTECTED_OPTIONS)
+
+
+def _can_cover(index):
+    """部分索引或 sparse 索引不一定含所有文件，不能代替前綴索引。"""
+    options = index["options"]
+    return "partialFilterExpression" not in options and not options.get("sparse")
+
+
+def find_prefix_redundancy(indexes):
+    """回傳 {索引名稱: 涵蓋它的索引名稱}：鍵是另一個索引的嚴格前綴（方向相同）時，查詢都可改走較長的索引。"""
+    redundant = {}
+    by_collection = defaultdict(list)
+    for index in indexes:
+        by_collection[index["collection"]].append(index)
+    for group in by_collection.values():
+        for index in group:
+            if _is_protected(index):
+                continue
+            size = len(index["keys"])
+            for other in group:
+                if other is index or not _can_cover(other) or len(other["keys"]) <= size:
+                    continue
+                if other["keys"][:size] == index["keys"]:
+                    redundant[index["name"]] = other["name"]
+                    break
+    return redundant
+
+
+def find_overlaps(indexes):
+    """同一組欄位、只差在前面等值欄位順序的索引對（如 type+status+updatedAt 與 status+type+updatedAt），通常保留一個即可。"""
+    overlaps = []
+    by_collection = defaultdict(list)
+    for index in indexes:
+        by_collection[index["collection"]].append(index)
+    for group in by_collection.values():
+        for position, index in enumerate(group):
+            for other in group[position + 1:]:
+                if len(index["keys"]) < 3 or index["keys"] == other["keys"]:
+                    continue
+                if index["keys"][-1] == other["keys"][-1] and set(index["keys"]) == set(other["keys"]):
+                    overlaps.append((index["name"], other["name"]))
+    return overlaps
+
+
+def write_amplification(indexes, dropped=()):
+    """每次 insert 要寫入的 B-tree 數（集合本身 + _id + 宣告的索引）；dropped 為預計移除的索引名稱。"""
+    dropped = set(dropped)
+    summary = {}
+    for index in indexes:
+        item = summary.setdefault(index["collection"], {"indexes": 0, "keyFields": 0, "leanIndexes": 0})
+        item["indexes"] += 1
+        item["keyFields"] += len(index["keys"])
+        if index["name"] not in dropped:
+            item["leanIndexes"] += 1
+    for item in summary.values():
+        item["writesPerInsert"] = item["indexes"] + 2
+        item["leanWritesPerInsert"] = item["leanIndexes"] + 2
+    return summary
+
+
+def plan_summary(plan):
+    """走訪 explain 的 winningPlan，回傳 {"indexes", "collscan", "blockingSort"}；同時支援 classic 與 SBE 的輸出格式。"""
+    indexes = []
+    stages = set()
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        stage = node.get("stage")
+        if stage:
+            stages.add(stage)
+        if node.get("indexName") and node["indexName"] not in indexes:
+            indexes.append(node["indexName"])
+        for child_key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+            if child_key in node:
+                pending.append(node[child_key])
+        pending.extend(node.get("inputStages") or [])
+    return {
+        "indexes": indexes,
+        "collscan": "COLLSCAN" in stages,
+        "blockingSort": "SORT" in stages,
+    }
+
+
+def explain_shape(db, shape):
+    collection, _name, query, sort, _source = shape
+    command = {"find": collection, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    result = db.command({"explain": command, "verbosity": "queryPlanner"})
+    return plan_summary(result.get("queryPlanner", {}).get("winningPlan", {}))
+
+
+def explain_shapes(db, shapes=QUERY_SHAPES):
+    """回傳 {shape 名稱: plan_summary}；explain 失敗的形狀記錄 error 不中斷整份報告。"""
+    plans = {}
+    for shape in shapes:
+        try:
+            plans[shape[1]] = explain_shape(db, shape)
+        except OperationFailure as exc:
+            plans[shape[1]] = {"indexes": [], "collscan": False, "blockingSort": False, "error": str(exc)}
+    return plans
+
+
+def collect_index_stats(db, collections):
+    """$indexStats：回傳 {(collection, 索引名稱): {"ops", "since"}}；計數自該節點上次重啟起算。"""
+    stats = {}
+    for collection in collections:
+        for doc in db[collection].aggregate([{"$indexStats": {}}]):
+            accesses = doc.get("accesses") or {}
+            stats[(collection, doc["name"])] = {"ops": int(accesses.get("ops", 0)), "since": accesses.get("since")}
+    return stats
+
+
+def collect_index_sizes(db, collections):
+    sizes = {}
+    for collection in collections:
+        try:
+            stats = db.command("collStats", collection)
+        except OperationFailure:
+            continue
+        for name, size in (stats.get("indexSizes") or {}).items():
+            sizes[(collection, name)] = size
+    return sizes
+
+
+def _recommend(index, entry, live):
+    if _is_protected(index):
+        return "keep"
+    if entry["usedBy"]:
+        return "keep"
+    if entry.get("redundantWith"):
+        return "drop"
+    if live and entry.get("ops") == 0:
+        return "drop"
+    return "review" if live else "keep"
+
+
+def build_index_report(db=None, specs=INDEX_SPECS, shapes=QUERY_SHAPES):
+    """彙整宣告的索引、查詢形狀的 explain 結果與 $indexStats，為每個索引給出 keep / drop / review 建議。
+
+    db 為 None 時只做靜態分析（前綴重複、欄位重疊）。
+    """
+    indexes = declared_indexes(specs)
+    collections = sorted({index["collection"] for index in indexes})
+    redundant = find_prefix_redundancy(indexes)
+    overlaps = defaultdict(list)
+    for first, second in find_overlaps(indexes):
+        overlaps[first].append(second)
+        overlaps[second].append(first)
+
+    plans = explain_shapes(db, shapes) if db is not None else {}
+    stats = collect_index_stats(db, collections) if db is not None else {}
+    sizes = collect_index_sizes(db, collections) if db is not None else {}
+    used_by = defaultdict(list)
+    for name, plan in plans.items():
+        for index_name in plan["indexes"]:
+            used_by[index_name].append(name)
+
+    entries = []
+    for index in indexes:
+        key = (index["collection"], index["name"])
+        entry = {
+            "collection": index["collection"],
+            "name": index["name"],
+            "keys": [f"{field}:{direction}" for field, direction in index["keys"]],
+            "protected": _is_protected(index),
+            "usedBy": used_by.get(index["name"], []),
+            "redundantWith": redundant.get(index["name"]),
+            "overlapsWith": overlaps.get(index["name"], []),
+        }
+        if db is not None:
+            entry["exists"] = key in stats
+            entry["ops"] = stats.get(key, {}).get("ops")
+            entry["size"] = sizes.get(key)
+        entry["recommendation"] = _recommend(index, entry, db is not None)
+        entries.append(entry)
+
+    declared = {(index["collection"], index["name"]) for index in indexes}
+    drop = [entry["name"] for entry in entries if entry["recommendation"] == "drop"]
+    return {
+        "indexes": entries,
+        "shapes": {
+            shape[1]: dict(plans[shape[1]], collection=shape[0], source=shape[4])
+            for shape in shapes
+            if shape[1] in plans
+        },
+        "undeclared": sorted(
+            f"{collection}.{name}" for collection, name in stats
+            if name != "_id_" and (collection, name) not in declared
+        ),
+        "statsSince": min((item["since"] for item in stats.values() if item["since"]), default=None),
+        "writeAmplification": write_amplification(indexes, drop),
+        "dropCandidates": drop,
+    }
+
+
+def _set_hidden(db, collection, name, hidden):
+    db.command({"collMod": collection, "index": {"name": name, "hidden": hidden}})
+
+
+def verify_lean_index_set(db, drop_names, specs=INDEX_SPECS, shapes=QUERY_SHAPES):
+    """暫時隱藏候選索引後重新 explain 所有查詢形狀，回傳會退化成 COLLSCAN 或記憶體排序的形狀。
+
+    hidden index 需要 MongoDB 4.4 以上；索引仍會持續維護，結束後一律恢復。請在本機或測試環境執行。
+    """
+    collection_of = {index["name"]: index["collection"] for index in declared_indexes(specs)}
+    before = explain_shapes(db, shapes)
+    hidden = []
+    try:
+        for name in drop_names:
+            _set_hidden(db, collection_of[name], name, True)
+            hidden.append(name)
+        after = explain_shapes(db, shapes)
+    finally:
+        for name in hidden:
+            try:
+                _set_hidden(db, collection_of[name], name, False)
+            except OperationFailure:
+                logger.exception(
+                    "Failed to unhide index",
+                    extra={"event": "index_advisor_unhide_failed", "target": name},
+                )
+
+    regressions = []
+    for name, plan in after.items():
+        previous = before.get(name, {})
+        if (plan["collscan"] and not previous.get("collscan")) or (plan["blockingSort"] and not previous.get("blockingSort")):
+            regressions.append({"shape": name, "before": previous.get("indexes", []), "after": plan["indexes"]})
+    return regressions
+
+
+def undeclared_indexes(db, specs=INDEX_SPECS):
+    """資料庫中存在但 INDEX_SPECS 已不宣告的索引（_id 除外）；從 INDEX_SPECS 移除索引後用來產生刪除清單。"""
+    declared = {(collection, kwargs["name"]) for collection, _keys, kwargs in specs}
+    found = []
+    for collection in sorted({collection for collection, _keys, _kwargs in specs}):
+        for name in db[collection].index_information():
+            if name != "_id_" and (collection, name) not in declared:
+                found.append((collection, name))
+    return found
+
+
+def drop_undeclared_indexes(db, apply=False, specs=INDEX_SPECS):
+    """預設只回傳會刪除的索引；apply 為真時才實際 drop_index。"""
+    targets = undeclared_indexes(db, specs)
+    if apply:
+        for collection, name in targets:
+            db[collection].drop_index(name)
+            logger.info("Index dropped", extra={"event": "index_dropped", "target": f"{collection}.{name}"})
+    return targets
@@ -0,0 +1,31 @@
+from repositories.member_repository import find_members_page
+from utils.pagination import decode_cursor, encode_cursor
+from utils.timezone import format_taipei
+
+
+def _serialize_member(doc):
+    return {
+        "_id": str(doc["_id"]),
+        "lineId": doc.get("lineId", ""),
+        "displayName": doc.get("displayName") or "",
+        "realName": doc.get("realName") or "",
+        "pictureUrl": doc.get("pictureUrl") or "",
+        "lastLoginAt": format_taipei(doc.get("lastLoginAt")),
+        "createdAt": format_taipei(doc.get("createdAt")),
+        "orderCount": int(doc.get("orderCount") or 0),
+        "feedbackCount": int(doc.get("feedbackCount") or 0),
+    }
+
+
+def fetch_members_page(search, cursor, per_page):
+    """會員名單分頁；回傳 (results, next_cursor)。訂單/回饋數直接讀 users 上維護的計數欄位。"""
+    after = decode_cursor(cursor) if cursor else None
+    docs = find_members_page(search, after, per_page + 1)
+    has_more = len(docs) > per_page
+    docs = docs[:per_page]
+
+    next_cursor = None
+    if has_more and docs:
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get("lastLoginAt"), last["_id"])
+    return [_serialize_member(doc) for doc in docs], next_cursor
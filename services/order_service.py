@@ -1,13 +1,22 @@
+import uuid
+
+from pymongo import UpdateOne
+
 import database
+from repositories.fund_total_repository import record_fund_order_change, record_fund_order_changes
+from services.user_summary_service import record_committee_payment
 from tasks.notifications import (
     delay_notification,
     send_order_created_email,
     send_order_shipped_email,
+    send_order_shipped_emails,
     send_payment_confirmed_email,
+    send_payment_confirmed_emails,
 )
 from utils.errors import NotFoundError, ServiceUnavailableError, ValidationError
 from utils.helpers import get_object_id
-from utils.timezone import format_taipei, utc_now
+from utils.serialization import format_taipei_fields
+from utils.timezone import utc_now
 
 
 def _require_db():
@@ -15,20 +24,10 @@ def _require_db():
         raise ServiceUnavailableError("Database is not available")
 
 
-def _tw_datetime(value, fmt="%Y-%m-%d %H:%M"):
-    return format_taipei(value, fmt)
-
-
 def _serialize_order(doc):
     doc["_id"] = str(doc["_id"])
-    if doc.get("createdAt"):
-        doc["createdAt"] = _tw_datetime(doc["createdAt"])
-    if doc.get("reportedAt"):
-        doc["reportedAt"] = _tw_datetime(doc["reportedAt"], "%Y-%m-%d")
-    if doc.get("paidAt"):
-        doc["paidAt"] = _tw_datetime(doc["paidAt"])
-    if doc.get("shippedAt"):
-        doc["shippedAt"] = _tw_datetime(doc["shippedAt"])
+    format_taipei_fields(doc, ("createdAt", "paidAt", "shippedAt"))
+    format_taipei_fields(doc, ("reportedAt",), "%Y-%m-%d")
     return doc
 
 
@@ -79,6 +78,8 @@ def confirm_payment(order_id, admin_user):
         raise ValidationError("只有待付款訂單可以確認收款")
 
     order = database.db.orders.find_one({"_id": oid})
+    record_committee_payment(order)
+    record_fund_order_change(None, order)
     database.write_audit_log(admin_user, "confirm_payment", order.get("orderId", order_id), f"${order.get('total', 0)}")
     return order
 
@@ -106,10 +107,119 @@ def mark_shipped(order_id, tracking_number, admin_user):
         raise ValidationError("只有已付款訂單可以出貨")
 
     order = database.db.orders.find_one({"_id": oid})
+    record_fund_order_change(dict(order, status="paid"), order)
     database.write_audit_log(admin_user, "ship_order", order.get("orderId", order_id), tracking_number)
     return order
 
 
+def _parse_bulk_ids(order_ids):
+    """回傳 (每筆結果, {ObjectId: 結果})；格式錯誤與重複的編號先在結果中標記，不送進資料庫。"""
+    results = []
+    targets = {}
+    for order_id in order_ids:
+        result = {"id": order_id}
+        results.append(result)
+        oid = get_object_id(order_id)
+        if not oid:
+            result["result"] = "invalid_id"
+        elif oid in targets:
+            result["result"] = "duplicate"
+        else:
+            targets[oid] = result
+    return results, targets
+
+
+def _apply_bulk_transition(targets, operations, batch_field, batch_id, success_result):
+    """以 bulk_write 送出帶狀態條件的更新，再一次 find 讀回；batch_field 等於本批編號的才是這次更新成功的訂單。"""
+    if operations:
+        database.db.orders.bulk_write(operations, ordered=False)
+
+    updated = []
+    for order in database.db.orders.find({"_id": {"$in": list(targets)}}):
+        result = targets[order["_id"]]
+        result["orderId"] = order.get("orderId", "")
+        if order.get(batch_field) == batch_id:
+            result["result"] = success_result
+            updated.append(order)
+        else:
+            result["result"] = "invalid_status"
+            result["status"] = order.get("status")
+    for result in targets.values():
+        result.setdefault("result", "not_found")
+    return updated
+
+
+def bulk_confirm_payment(order_ids, admin_user):
+    """批次確認收款；回傳 (每筆結果, 本次確認的訂單)。只有待付款訂單會被更新。"""
+    _require_db()
+    results, targets = _parse_bulk_ids(order_ids)
+    batch_id = uuid.uuid4().hex
+    now = utc_now()
+    operations = [
+        UpdateOne(
+            {"_id": oid, "status": "pending"},
+            {"$set": {
+                "status": "paid",
+                "updatedAt": now,
+                "paidAt": now,
+                "paidBy": admin_user,
+                "paidBatchId": batch_id,
+            }},
+        )
+        for oid in targets
+    ]
+    orders = _apply_bulk_transition(targets, operations, "paidBatchId", batch_id, "confirmed")
+
+    for order in orders:
+        record_committee_payment(order)
+    record_fund_order_changes((dict(order, status="pending"), order) for order in orders)
+    if orders:
+        database.write_audit_log(
+            admin_user,
+            "bulk_confirm_payment",
+            batch_id,
+            f"共 {len(orders)} 筆 ${sum(order.get('total', 0) for order in orders)}："
+            + ", ".join(order.get("orderId", "") for order in orders),
+        )
+    return results, orders
+
+
+def bulk_mark_shipped(shipments, admin_user):
+    """批次出貨；shipments 為 [(order_id, tracking_number)]，回傳 (每筆結果, 本次出貨的訂單)。"""
+    _require_db()
+    results, targets = _parse_bulk_ids([order_id for order_id, _tracking in shipments])
+    for result, (_order_id, tracking_number) in zip(results, shipments):
+        result["trackingNumber"] = tracking_number
+    batch_id = uuid.uuid4().hex
+    now = utc_now()
+    operations = [
+        UpdateOne(
+            {"_id": oid, "status": "paid"},
+            {"$set": {
+                "status": "shipped",
+                "updatedAt": now,
+                "shippedAt": now,
+                "trackingNumber": result["trackingNumber"],
+                "shippedBy": admin_user,
+                "shippedBatchId": batch_id,
+            }},
+        )
+        for oid, result in targets.items()
+    ]
+    orders = _apply_bulk_transition(targets, operations, "shippedBatchId", batch_id, "shipped")
+
+    record_fund_order_changes((dict(order, status="paid"), order) for order in orders)
+    if orders:
+        database.write_audit_log(
+            admin_user,
+            "bulk_ship_order",
+            batch_id,
+            f"共 {len(orders)} 筆："
+            + ", ".join(f"{order.get('orderId', '')}({order.get('trackingNumber', '')})" for order in orders),
+        )
+    return results, orders
+
+
 def queue_order_created_email(order, mail_config=None):
     delay_notification(send_order_created_email, order.get("orderId"))
 
@@ -120,3 +230,13 @@ def queue_payment_confirmed_email(order, mail_config=None):
 
 def queue_order_shipped_email(order, tracking_number, mail_config=None):
     delay_notification(send_order_shipped_email, order.get("orderId"))
+
+
+def queue_payment_confirmed_emails(orders):
+    if orders:
+        delay_notification(send_payment_confirmed_emails, [order.get("orderId") for order in orders])
+
+
+def queue_order_shipped_emails(orders):
+    if orders:
+        delay_notification(send_order_shipped_emails, [order.get("orderId") for order in orders])
@@ -0,0 +1,57 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from flask import current_app
+
+from repositories.pickup_calendar_repository import (
+    find_pickup_calendar,
+    rebuild_pickup_calendar,
+    refresh_pickup_calendar_days,
+)
+from services.cache_service import PICKUP_CALENDAR_CACHE, bump_version, current_version, get_or_build
+from utils.helpers import get_tw_now
+
+
+logger = logging.getLogger(__name__)
+
+
+def calendar_threshold_day():
+    """公開行事曆保留到昨天（台灣時間），與原本的查詢條件相同。"""
+    return (get_tw_now() - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def record_pickup_change(*days):
+    """預約新增或刪除後重算受影響的日期並遞增快取版本。
+
+    版本仍為 0 代表行事曆從未建立，直接全量重建，避免只有單日資料。
+    """
+    try:
+        if current_version(PICKUP_CALENDAR_CACHE) == 0:
+            rebuild_pickup_calendar(calendar_threshold_day())
+        else:
+            stale = refresh_pickup_calendar_days(days)
+            if stale:
+                logger.warning(
+                    "Pickup calendar days still contended after retries",
+                    extra={"event": "pickup_calendar_refresh_contended", "count": len(stale)},
+                )
+        bump_version(PICKUP_CALENDAR_CACHE)
+    except Exception:
+        # 行事曆是衍生資料，失敗不影響預約本身；下次異動或手動重建時會補上。
+        logger.exception("Pickup calendar refresh failed", extra={"event": "pickup_calendar_refresh_failed"})
+
+
+def _build_calendar_body(threshold):
+    if current_version(PICKUP_CALENDAR_CACHE) == 0:
+        rebuild_pickup_calendar(threshold)
+        bump_version(PICKUP_CALENDAR_CACHE)
+    body = current_app.json.dumps(find_pickup_calendar(threshold)).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def get_public_calendar():
+    """回傳 (body, etag)；同一版本、同一天內各 worker 只組一次 JSON。"""
+    threshold = calendar_threshold_day()
+    _, value = get_or_build(PICKUP_CALENDAR_CACHE, lambda: _build_calendar_body(threshold), variant=threshold)
+    return value
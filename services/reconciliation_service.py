@@ -0,0 +1,286 @@
+import csv
+import io
+import logging
+import re
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from repositories.order_repository import iter_pending_payment_orders
+from services.order_service import bulk_confirm_payment, queue_payment_confirmed_emails
+from utils.business_rules import BULK_ORDER_MAX_IDS
+from utils.env import env_int
+from utils.errors import ValidationError
+from utils.serialization import taipei_text
+from utils.timezone import to_taipei
+
+
+logger = logging.getLogger(__name__)
+
+
+RECONCILIATION_MAX_ROWS = max(1, env_int("RECONCILIATION_MAX_ROWS", 20000))
+# 銀行匯出的 CSV 前面常有帳戶資訊等標題列，表頭最多往下找這幾列。
+HEADER_SCAN_ROWS = 20
+MAX_CANDIDATES = 5
+STATEMENT_ENCODINGS = ("utf-8-sig", "cp950")
+
+# 各欄位可接受的表頭名稱（比對前去掉空白與括號內的單位）；依序取第一個找到的。
+COLUMN_ALIASES = {
+    "amount": ("存入金額", "存入", "轉入金額", "入帳金額", "收入金額", "金額", "amount", "deposit", "credit"),
+    "account": ("轉出帳號", "對方帳號", "匯款帳號", "帳號", "account", "payeraccount"),
+    "memo": ("備註", "附言", "摘要", "說明", "memo", "note", "remark", "description"),
+    "date": ("交易日期", "入帳日期", "帳務日期", "日期", "date", "transactiondate"),
+}
+
+MATCH_STATUSES = ("matched", "ambiguous", "already_matched", "amount_mismatch", "unmatched")
+
+_HEADER_SUFFIX_RE = re.compile(r"[(（].*$")
+_DATE_RE = re.compile(r"^(\d{2,4})[/\-.](\d{1,2})[/\-.](\d{1,2})")
+_NON_AMOUNT_RE = re.compile(r"[^\d.\-]")
+
+
+def _normalize_header(cell):
+    return _HEADER_SUFFIX_RE.sub("", (cell or "").strip()).replace(" ", "").lower()
+
+
+def _last5(value):
+    digits = "".join(ch for ch in str(value or "") if ch.isdigit())
+    return digits[-5:] if len(digits) >= 5 else ""
+
+
+def parse_statement_amount(value):
+    """存入金額轉成整數元；空白、負數、非整數或無法解析時回傳 None。"""
+    text = _NON_AMOUNT_RE.sub("", value or "")
+    if not text:
+        return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if amount <= 0 or amount != amount.to_integral_value():
+        return None
+    return int(amount)
+
+
+def parse_statement_date(value):
+    """支援 2024/10/18、2024-10-18、20241018 與民國年 113/10/18；無法解析回傳 None。"""
+    text = (value or "").strip()
+    match = _DATE_RE.match(text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    elif len(text) >= 8 and text[:8].isdigit():
+        year, month, day = int(text[:4]), int(text[4:6]), int(text[6:8])
+    else:
+        return None
+    if year < 1911:
+        year += 1911
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _resolve_columns(header, overrides):
+    cells = [_normalize_header(cell) for cell in header]
+    columns = {}
+    for role, aliases in COLUMN_ALIASES.items():
+        names = [_normalize_header(overrides[role])] if overrides.get(role) else aliases
+        for name in names:
+            if name in cells:
+                columns[role] = cells.index(name)
+                break
+    if "amount" in columns and ("account" in columns or "memo" in columns):
+        return columns
+    return None
+
+
+def _cell(row, columns, role):
+    position = columns.get(role)
+    return row[position] if position is not None and position < len(row) else ""
+
+
+def read_statement_rows(stream, encoding="utf-8-sig", columns=None):
+    """逐列讀取銀行明細 CSV，yield (列號, {"date", "amount", "last5"})；無存入金額或帳號末五碼的列 yield (列號, None)。
+
+    不會一次讀入整個檔案；找不到可辨識的表頭時丟出 ValidationError。
+    """
+    if encoding not in STATEMENT_ENCODINGS:
+        raise ValidationError("不支援的檔案編碼")
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    reader = csv.reader(text)
+    overrides = columns or {}
+    try:
+        resolved = None
+        for _row in range(HEADER_SCAN_ROWS):
+            header = next(reader, None)
+            if header is None:
+                break
+            resolved = _resolve_columns(header, overrides)
+            if resolved:
+                break
+        if not resolved:
+            raise ValidationError("找不到金額與帳號（或備註）欄位，請確認表頭或指定欄位名稱")
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            amount = parse_statement_amount(_cell(row, resolved, "amount"))
+            last5 = _last5(_cell(row, resolved, "account")) or _last5(_cell(row, resolved, "memo"))
+            if amount is None or not last5:
+                yield reader.line_num, None
+                continue
+            yield reader.line_num, {
+                "date": parse_statement_date(_cell(row, resolved, "date")),
+                "amount": amount,
+                "last5": last5,
+            }
+    except UnicodeDecodeError as exc:
+        raise ValidationError("檔案編碼錯誤，請改用其他編碼（例如 cp950）重新上傳") from exc
+    finally:
+        text.detach()
+
+
+def build_pending_index(orders):
+    """以 (末五碼, 金額) 與末五碼建立待收款訂單索引；建一次 O(n)，之後每列查詢 O(1)。"""
+    by_key = defaultdict(list)
+    by_last5 = defaultdict(list)
+    for order in orders:
+        last5 = _last5((order.get("customer") or {}).get("last5"))
+        total = order.get("total")
+        if not last5 or isinstance(total, bool) or not isinstance(total, int):
+            continue
+        by_key[(last5, total)].append(order)
+        by_last5[last5].append(order)
+    return {"by_key": by_key, "by_last5": by_last5, "claimed": set()}
+
+
+def _candidate_score(order, paid_on):
+    """匯款日與下單日越接近分數越高；下單晚於匯款日或缺日期時為 0。"""
+    created = to_taipei(order.get("createdAt"))
+    if paid_on is None or created is None:
+        return 0
+    days = (paid_on - created.date()).days
+    if days < 0:
+        return 0
+    return max(1, 100 - days * 10)
+
+
+def _order_summary(order, score=None):
+    summary = {
+        "_id": str(order["_id"]),
+        "orderId": order.get("orderId", ""),
+        "orderType": order.get("orderType", ""),
+        "name": (order.get("customer") or {}).get("name", ""),
+        "total": order.get("total"),
+        "createdAt": taipei_text(order.get("createdAt")),
+    }
+    if score is not None:
+        summary["score"] = score
+    return summary
+
+
+def _ranked(orders, paid_on):
+    scored = [(_candidate_score(order, paid_on), order) for order in orders]
+    # 分數相同時先比對較早成立的訂單
+    scored.sort(key=lambda item: (-item[0], str(item[1].get("createdAt") or "")))
+    return scored
+
+
+def match_statement_row(line, index):
+    """比對單列明細；唯一命中的訂單會被標記為已配對，之後的列不會再配到同一筆。"""
+    claimed = index["claimed"]
+    result = {
+        "row": line["row"],
+        "date": line["date"].isoformat() if line["date"] else None,
+        "amount": line["amount"],
+        "last5": line["last5"],
+    }
+    same_key = index["by_key"].get((line["last5"], line["amount"]), [])
+    open_orders = [order for order in same_key if order["_id"] not in claimed]
+
+    if len(open_orders) == 1:
+        order = open_orders[0]
+        claimed.add(order["_id"])
+        result["status"] = "matched"
+        result["order"] = _order_summary(order, _candidate_score(order, line["date"]))
+        return result
+
+    if open_orders:
+        ranked = _ranked(open_orders, line["date"])
+        result["status"] = "ambiguous"
+        result["candidates"] = [_order_summary(order, score) for score, order in ranked[:MAX_CANDIDATES]]
+        if ranked[0][0] > ranked[1][0]:
+            result["suggested"] = result["candidates"][0]["_id"]
+        return result
+
+    if same_key:
+        result["status"] = "already_matched"
+        return result
+
+    near = [order for order in index["by_last5"].get(line["last5"], []) if order["_id"] not in claimed]
+    if near:
+        result["status"] = "amount_mismatch"
+        result["candidates"] = [_order_summary(order, score) for score, order in _ranked(near, line["date"])[:MAX_CANDIDATES]]
+        return result
+
+    result["status"] = "unmatched"
+    return result
+
+
+def match_statement(rows, index, max_rows=RECONCILIATION_MAX_ROWS):
+    """rows 為 read_statement_rows 的輸出；回傳 (比對結果, 摘要)。略過的列只計數、不放進結果。"""
+    results = []
+    summary = {status: 0 for status in MATCH_STATUSES}
+    summary.update({"rows": 0, "skipped": 0, "matchedAmount": 0, "truncated": False})
+    for row_number, line in rows:
+        if summary["rows"] >= max_rows:
+            summary["truncated"] = True
+            break
+        summary["rows"] += 1
+        if line is None:
+            summary["skipped"] += 1
+            continue
+        result = match_statement_row(dict(line, row=row_number), index)
+        summary[result["status"]] += 1
+        if result["status"] == "matched":
+            summary["matchedAmount"] += line["amount"]
+        results.append(result)
+    return results, summary
+
+
+def _confirm_matches(results, admin_user):
+    """唯一命中且下單日不晚於匯款日（分數大於 0）的訂單分批送進批次確認收款；每批一次 bulk_write 與一個通知任務。
+
+    明細缺日期或下單晚於匯款的命中仍列為 matched，但 confirmed 為 False，留給人工確認。
+    """
+    matched = []
+    for result in results:
+        if result["status"] != "matched":
+            continue
+        if result["order"].get("score"):
+            matched.append(result)
+        else:
+            result["confirmed"] = False
+    confirmed = 0
+    for start in range(0, len(matched), BULK_ORDER_MAX_IDS):
+        chunk = matched[start:start + BULK_ORDER_MAX_IDS]
+        outcomes, orders = bulk_confirm_payment([result["order"]["_id"] for result in chunk], admin_user)
+        queue_payment_confirmed_emails(orders)
+        confirmed += len(orders)
+        for result, outcome in zip(chunk, outcomes):
+            result["confirmed"] = outcome.get("result") == "confirmed"
+    return confirmed
+
+
+def reconcile_statement(stream, encoding="utf-8-sig", columns=None, confirm=False, admin_user=None):
+    """上傳的銀行明細與待收款訂單對帳；confirm 為真時直接確認唯一命中的訂單。"""
+    rows = read_statement_rows(stream, encoding, columns)
+    index = build_pending_index(iter_pending_payment_orders())
+    results, summary = match_statement(rows, index)
+    if confirm:
+        summary["confirmed"] = _confirm_matches(results, admin_user)
+    logger.info(
+        "Bank statement reconciled",
+        extra={"event": "finance_reconciled", "count": summary["rows"]},
+    )
+    return {"summary": summary, "rows": results}
@@ -1,8 +1,12 @@
+import atexit
 import logging
+import os
+import threading
 
 from pymongo.errors import DuplicateKeyError
 
-from repositories.sequence_repository import next_counter_value
+from repositories.sequence_repository import next_counter_value, record_counter_waste
+from utils.env import env_int
 from utils.timezone import taipei_now
 
 
@@ -10,6 +14,10 @@ logger = logging.getLogger(__name__)
 DEFAULT_RETRY_ATTEMPTS = 5
 SEQUENCE_WIDTH = 6
 
+
+# 每個 worker 一次向 counters 預留的號碼數；1 代表維持逐號取號（號碼連續）。
+SEQUENCE_BLOCK_SIZE = max(1, env_int("SEQUENCE_BLOCK_SIZE", 1))
+
 ORDER_PREFIXES = {
     "shop": "ORD",
     "donation": "DON",
@@ -22,7 +30,100 @@ def _date_part():
     return taipei_now().strftime("%Y%m%d")
 
 
+class SequenceBlockAllocator:
+    """程序內的號段分配器：一次 $inc N 保留號段，本地依序發號，跨日自動換號段。
+
+    不同 worker 拿到的是不重疊的號段，因此單號只保證唯一、不保證全域遞增。
+    """
+
+    def __init__(self, block_size, reserve=next_counter_value, record_waste=record_counter_waste, date_part=None):
+        self.block_size = max(1, int(block_size))
+        self._reserve = reserve
+        self._record_waste = record_waste
+        self._date_part = date_part or _date_part
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._pid = os.getpid()
+        self.wasted = 0
+
+    def _reset_after_fork(self):
+        # gunicorn preload 後 fork 出來的 worker 不可沿用父程序的號段，否則會發出重複單號。
+        if self._pid != os.getpid():
+            self._blocks = {}
+            self._pid = os.getpid()
+            self.wasted = 0
+
+    def _discard(self, counter_key):
+        block = self._blocks.pop(counter_key, None)
+        if not block:
+            return 0
+        remaining = block[1] - block[0] + 1
+        if remaining > 0:
+            self.wasted += remaining
+            self._record_waste(counter_key, remaining)
+        return remaining
+
+    def next_value(self, scope, prefix):
+        date_part = self._date_part()
+        counter_key = f"{scope}:{prefix}:{date_part}"
+        with self._lock:
+            self._reset_after_fork()
+            # 跨過台北日界後，前一天剩下的號段直接作廢。
+            stale_prefix = f"{scope}:{prefix}:"
+            for key in [key for key in self._blocks if key.startswith(stale_prefix) and key != counter_key]:
+                self._discard(key)
+
+            block = self._blocks.get(counter_key)
+            if not block or block[0] > block[1]:
+                last = self._reserve(
+                    counter_key,
+                    {
+                        "scope": scope,
+                        "prefix": prefix,
+                        "date": date_part,
+                    },
+                    increment=self.block_size,
+                )
+                block = [last - self.block_size + 1, last]
+                self._blocks[counter_key] = block
+
+            sequence = block[0]
+            block[0] += 1
+        return date_part, sequence
+
+    def release(self):
+        """程序結束時回報未使用的號碼數；回傳本次作廢的總數。"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return 0
+            wasted = 0
+            for key in list(self._blocks):
+                try:
+                    wasted += self._discard(key)
+                except Exception:
+                    logger.exception(
+                        "Failed to record sequence waste",
+                        extra={"event": "sequence_waste_record_failed", "target": key},
+                    )
+        if wasted:
+            logger.info(
+                "Unused sequence numbers discarded",
+                extra={"event": "sequence_block_wasted", "count": wasted},
+            )
+        return wasted
+
+
+_block_allocator = None
+if SEQUENCE_BLOCK_SIZE > 1:
+    _block_allocator = SequenceBlockAllocator(SEQUENCE_BLOCK_SIZE)
+    atexit.register(_block_allocator.release)
+
+
 def _build_sequence_id(scope, prefix):
+    if _block_allocator is not None:
+        date_part, sequence = _block_allocator.next_value(scope, prefix)
+        return f"{prefix}{date_part}{sequence:0{SEQUENCE_WIDTH}d}"
+
     date_part = _date_part()
     counter_key = f"{scope}:{prefix}:{date_part}"
     sequence = next_counter_value(
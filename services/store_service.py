@@ -0,0 +1,260 @@
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import requests
+
+import database
+from repositories.store_cache_repository import (
+    find_cached_store,
+    find_fresh_store_ids,
+    find_order_store_infos,
+    save_cached_store,
+)
+from utils.cache import LocalCache
+from utils.env import env_int
+
+
+logger = logging.getLogger(__name__)
+
+
+# 可指向本機假 PCSC 服務做測試
+PCSC_EMAP_URL = os.environ.get("PCSC_EMAP_URL", "https://emap.pcsc.com.tw/EMapSDK.aspx")
+PCSC_TIMEOUT_SECONDS = max(1, env_int("PCSC_TIMEOUT_SECONDS", 6))
+STORE_ID_RE = re.compile(r"\d{6}")
+
+# 第一層：各 worker 本地 LRU；第二層：store_cache collection，所有 worker 與重啟後共用。
+STORE_LOCAL_MAX_ENTRIES = max(1, env_int("STORE_LOCAL_MAX_ENTRIES", 1024))
+STORE_LOCAL_TTL_SECONDS = max(1, env_int("STORE_LOCAL_TTL_SECONDS", 600))
+STORE_CACHE_TTL_SECONDS = max(60, env_int("STORE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+# 查無店號也快取一段時間，避免輸入錯誤的店號反覆打到 PCSC。
+STORE_NEGATIVE_TTL_SECONDS = max(60, env_int("STORE_NEGATIVE_TTL_SECONDS", 3600))
+# PCSC 連線失敗後的冷卻時間；期間同一店號直接回報失敗，不再重試上游。
+STORE_FAILURE_BACKOFF_SECONDS = max(1, env_int("STORE_FAILURE_BACKOFF_SECONDS", 30))
+# 不分店號連續失敗達門檻即斷路，冷卻期間整個 process 都不打 PCSC，避免上游掛掉時每個新店號各等一次逾時。
+STORE_BREAKER_THRESHOLD = max(1, env_int("STORE_BREAKER_THRESHOLD", 5))
+STORE_BREAKER_COOLDOWN_SECONDS = max(1, env_int("STORE_BREAKER_COOLDOWN_SECONDS", 60))
+
+class StoreLookupError(Exception):
+    """PCSC 暫時無法查詢（連線失敗、逾時或回應格式錯誤）。"""
+
+
+class _CircuitBreaker:
+    """連續失敗達門檻即斷路；冷卻期滿後每個冷卻期只放行一個試探請求，成功才恢復。"""
+
+    def __init__(self, threshold, cooldown_seconds, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self.cooldown_seconds:
+                return False
+            # 放行試探請求的同時重新計時，其他請求在它回來前仍走斷路
+            self._opened_at = self._clock()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """記錄一次失敗；回傳這次是否由關閉轉為斷路。"""
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None:
+                self._opened_at = self._clock()
+                return False
+            if self._failures >= self.threshold:
+                self._opened_at = self._clock()
+                return True
+            return False
+
+
+_local_cache = LocalCache(STORE_LOCAL_MAX_ENTRIES, STORE_LOCAL_TTL_SECONDS)
+_failures = LocalCache(STORE_LOCAL_MAX_ENTRIES, STORE_FAILURE_BACKOFF_SECONDS)
+_breaker = _CircuitBreaker(STORE_BREAKER_THRESHOLD, STORE_BREAKER_COOLDOWN_SECONDS)
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+class _InflightLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _text(node, tag):
+    child = node.find(tag)
+    return child.text.strip() if child is not None and child.text else ""
+
+
+def fetch_711_store(store_id):
+    """直接向 PCSC 查詢；查無此店回傳 None，連線或解析失敗丟出 StoreLookupError。"""
+    try:
+        response = requests.post(
+            PCSC_EMAP_URL,
+            data={
+                "commandid": "SearchStore",
+                "city": "",
+                "town": "",
+                "roadname": "",
+                "ID": store_id,
+                "StoreName": "",
+                "SpecialStore_Kind": "",
+                "leftMenuChecked": "",
+                "address": "",
+            },
+            headers={
+                "User-Agent": "Mozilla/5.0",
+                "Referer": "https://emap.pcsc.com.tw/emap.aspx",
+            },
+            timeout=PCSC_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        root = ET.fromstring(response.text)
+    except (requests.RequestException, ET.ParseError) as exc:
+        raise StoreLookupError(str(exc)) from exc
+
+    store_node = root.find("GeoPosition")
+    if store_node is None:
+        return None
+
+    return {
+        "id": _text(store_node, "POIID"),
+        "name": _text(store_node, "POIName"),
+        "address": _text(store_node, "Address"),
+        "phone": _text(store_node, "Telno"),
+        "openTime": _text(store_node, "OP_TIME"),
+        "services": _text(store_node, "StoreImageTitle"),
+    }
+
+
+def _read_shared(store_id):
+    if database.db is None:
+        return None
+    try:
+        return find_cached_store(store_id)
+    except Exception:
+        logger.warning("Store cache read failed", extra={"event": "store_cache_read_failed", "target": store_id})
+        return None
+
+
+def _write_shared(store_id, store):
+    if database.db is None:
+        return
+    ttl = STORE_CACHE_TTL_SECONDS if store is not None else STORE_NEGATIVE_TTL_SECONDS
+    try:
+        save_cached_store(store_id, store, ttl)
+    except Exception:
+        logger.warning("Store cache write failed", extra={"event": "store_cache_write_failed", "target": store_id})
+
+
+def _cache_locally(store_id, store):
+    ttl = STORE_LOCAL_TTL_SECONDS if store is not None else min(STORE_LOCAL_TTL_SECONDS, STORE_NEGATIVE_TTL_SECONDS)
+    _local_cache.set(store_id, {"store": store}, ttl)
+
+
+def _load_store(store_id):
+    """快取未命中時的完整流程：共用快取 → PCSC，結果寫回兩層快取。"""
+    shared = _read_shared(store_id)
+    if shared is not None:
+        _cache_locally(store_id, shared["store"])
+        return shared["store"]
+
+    if _failures.get(store_id):
+        raise StoreLookupError("upstream backoff")
+    if not _breaker.allow():
+        raise StoreLookupError("upstream circuit open")
+    try:
+        store = fetch_711_store(store_id)
+    except StoreLookupError:
+        _failures.set(store_id, True)
+        logger.warning("PCSC store lookup failed", extra={"event": "store_lookup_failed", "target": store_id})
+        if _breaker.record_failure():
+            logger.warning("PCSC circuit opened", extra={"event": "store_breaker_opened", "count": _breaker.threshold})
+        raise
+    _breaker.record_success()
+
+    _write_shared(store_id, store)
+    _cache_locally(store_id, store)
+    return store
+
+
+def get_711_store(store_id):
+    """查詢 7-11 門市；同一店號同時有多個請求時只有一個會往下查，其餘等待結果。"""
+    cached = _local_cache.get(store_id)
+    if cached is not None:
+        return cached["store"]
+
+    with _inflight_lock:
+        lookup = _inflight.get(store_id)
+        leader = lookup is None
+        if leader:
+            lookup = _InflightLookup()
+            _inflight[store_id] = lookup
+
+    if not leader:
+        if not lookup.done.wait(PCSC_TIMEOUT_SECONDS + 1):
+            raise StoreLookupError("lookup timed out")
+        if lookup.error is not None:
+            raise lookup.error
+        return lookup.result
+
+    try:
+        lookup.result = _load_store(store_id)
+        return lookup.result
+    except StoreLookupError as exc:
+        lookup.error = exc
+        raise
+    finally:
+        lookup.done.set()
+        with _inflight_lock:
+            _inflight.pop(store_id, None)
+
+
+def extract_store_ids(texts):
+    """從門市資訊字串擷取不重複的 6 碼店號，保留第一次出現的順序。"""
+    seen = {}
+    for text in texts:
+        match = STORE_ID_RE.search(text or "")
+        if match:
+            seen.setdefault(match.group(0), None)
+    return list(seen)
+
+
+def order_store_ids():
+    return extract_store_ids(doc.get("customer", {}).get("storeInfo") for doc in find_order_store_infos())
+
+
+def prewarm_stores(store_ids, refresh=False, delay_seconds=0.2):
+    """批次預熱共用快取；預設略過仍有效的店號。回傳 {"fetched", "missing", "failed", "skipped"}。"""
+    store_ids = list(dict.fromkeys(store_ids))
+    fresh = set() if refresh else find_fresh_store_ids(store_ids)
+    summary = {"fetched": 0, "missing": 0, "failed": 0, "skipped": len(fresh)}
+    for store_id in store_ids:
+        if store_id in fresh:
+            continue
+        try:
+            store = fetch_711_store(store_id)
+        except StoreLookupError:
+            summary["failed"] += 1
+            continue
+        _write_shared(store_id, store)
+        summary["fetched" if store is not None else "missing"] += 1
+        if delay_seconds:
+            # 逐筆間隔，避免預熱本身對 PCSC 造成尖峰
+            time.sleep(delay_seconds)
+    return summary
@@ -0,0 +1,72 @@
+from repositories.user_summary_repository import (
+    apply_committee_payment,
+    apply_feedback_sent,
+    count_sent_feedback,
+    find_paid_committee_item_names,
+    set_profile_summary,
+)
+
+
+COMMITTEE_TITLE_RANKS = {"主委": 1, "副主委": 2, "顧問": 3, "委員": 4, "功德主": 5}
+NO_TITLE_RANK = 99
+
+
+def committee_title_rank(item_name):
+    """委員會項目名稱轉成 (rank, 顯示頭銜)；rank 越小越高，不在名單內回傳 NO_TITLE_RANK。"""
+    clean_title = (item_name or '').replace('[本府] ', '').replace('[建廟] ', '').replace('籌備', '')
+    return COMMITTEE_TITLE_RANKS.get(clean_title, NO_TITLE_RANK), clean_title
+
+
+def highest_committee_title(item_names):
+    highest_title = ""
+    current_rank = NO_TITLE_RANK
+    for name in item_names:
+        rank, title = committee_title_rank(name)
+        if rank < current_rank:
+            current_rank = rank
+            highest_title = title
+    return highest_title, current_rank
+
+
+def build_profile_summary(line_id):
+    item_names, paid_orders = find_paid_committee_item_names(line_id)
+    title, rank = highest_committee_title(item_names)
+    sent_feedback = count_sent_feedback(line_id)
+    return {
+        "title": title,
+        "titleRank": rank,
+        "hasReceivedGift": sent_feedback > 0,
+        "paidCommitteeOrders": paid_orders,
+        "sentFeedbackCount": sent_feedback,
+    }
+
+
+def refresh_profile_summary(line_id):
+    if not line_id:
+        return None
+    summary = build_profile_summary(line_id)
+    set_profile_summary(line_id, summary)
+    return summary
+
+
+def record_committee_payment(order):
+    if not order or order.get("orderType") != "committee" or not order.get("lineId"):
+        return
+    title, rank = highest_committee_title(item.get("name", "") for item in order.get("items", []))
+    apply_committee_payment(order["lineId"], title, rank)
+
+
+def record_feedback_sent(feedback):
+    if feedback and feedback.get("lineId"):
+        apply_feedback_sent(feedback["lineId"])
+
+
+def refresh_summary_for_removed_order(order):
+    """已付款委員會訂單被刪除時頭銜可能降級，直接重算該使用者摘要。"""
+    if order and order.get("orderType") == "committee" and order.get("status") == "paid":
+        refresh_profile_summary(order.get("lineId"))
+
+
+def refresh_summary_for_removed_feedback(feedback):
+    if feedback and feedback.get("status") == "sent":
+        refresh_profile_summary(feedback.get("lineId"))
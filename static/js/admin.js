@@ -532,6 +532,8 @@ async loadFeedbackReview() {
        ========================================= */
     const DataManager = {
         membersCache: [],
+        membersCursor: null,
+        memberSearchTimer: null,
 
         async search(page = 1) {
             const el = document.getElementById('history-results');
@@ -603,14 +605,23 @@ async loadFeedbackReview() {
             window.open(`/api/admin/data/export-csv?${params}`, '_blank');
         },
 
-        async loadMembers() {
+        async loadMembers(append = false) {
             const el = document.getElementById('members-list');
             if (!el) return;
-            el.innerHTML = '載入中...';
+            if (!append) {
+                this.membersCache = [];
+                this.membersCursor = null;
+                el.innerHTML = '載入中...';
+            }
+            const params = new URLSearchParams({ per_page: 50 });
+            const q = (document.getElementById('member-search-input')?.value || '').trim();
+            if (q) params.set('q', q);
+            if (append && this.membersCursor) params.set('cursor', this.membersCursor);
             try {
-                const list = await Core.apiFetch('/api/admin/data/members');
-                this.membersCache = list;
-                this.renderMembers(list);
+                const data = await Core.apiFetch(`/api/admin/data/members?${params}`);
+                this.membersCache = this.membersCache.concat(data.results || []);
+                this.membersCursor = data.next_cursor;
+                this.renderMembers(this.membersCache);
             } catch (e) { el.innerHTML = '<p class="text-danger">載入失敗</p>'; }
         },
 
@@ -631,17 +642,18 @@ async loadFeedbackReview() {
                     </div>
                 </div>
             `).join('') : '<p class="empty-state">無會員資料</p>';
+            const moreEl = document.getElementById('members-more');
+            if (moreEl) {
+                moreEl.innerHTML = this.membersCursor
+                    ? '<button class="btn btn--grey" onclick="DataManager.loadMembers(true)">載入更多</button>'
+                    : '';
+            }
         },
 
         filterMembers() {
-            const q = (document.getElementById('member-search-input')?.value || '').trim().toLowerCase();
-            if (!q) { this.renderMembers(this.membersCache); return; }
-            const filtered = this.membersCache.filter(m =>
-                (m.displayName || '').toLowerCase().includes(q) ||
-                (m.realName || '').toLowerCase().includes(q) ||
-                (m.lineId || '').toLowerCase().includes(q)
-            );
-            this.renderMembers(filtered);
+            // 搜尋改由後端前綴比對；輸入停頓後才送出，避免每個按鍵都查詢。
+            clearTimeout(this.memberSearchTimer);
+            this.memberSearchTimer = setTimeout(() => this.loadMembers(), 300);
         },
 
         refreshMembers() { this.loadMembers(); },
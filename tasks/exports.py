@@ -0,0 +1,86 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from repositories.export_job_repository import update_export_job
+from services.export_service import run_export_job, start_export_job
+from utils.env import env_int
+from utils.task_queue import celery_app, queue_available
+
+
+logger = logging.getLogger(__name__)
+
+
+# 沒有 Celery 時在 web process 內以少量執行緒跑匯出，避免佔住 gunicorn 的 request worker。
+EXPORT_LOCAL_WORKERS = max(1, env_int("EXPORT_LOCAL_WORKERS", 2))
+
+_local_executor = None
+_local_executor_lock = threading.Lock()
+
+
+def _ensure_db():
+    if database.db is None:
+        database.init_db(os.environ.get("MONGO_URI"))
+    return database.db
+
+
+def _run_job(job_id):
+    if _ensure_db() is None:
+        logger.warning("Database unavailable for export job", extra={"event": "export_job_db_unavailable"})
+        return False
+    return run_export_job(job_id)
+
+
+if celery_app is not None:
+    @celery_app.task(name="export.run_job")
+    def export_run_job(job_id):
+        return _run_job(job_id)
+
+    # 舊名稱保留給佇列中尚未消化的任務
+    @celery_app.task(name="export.history_csv")
+    def export_history_csv(job_id):
+        return _run_job(job_id)
+else:
+    export_run_job = None
+    export_history_csv = None
+
+
+def _get_local_executor():
+    global _local_executor
+    with _local_executor_lock:
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(max_workers=EXPORT_LOCAL_WORKERS, thread_name_prefix="export")
+        return _local_executor
+
+
+def _run_local(job_id):
+    try:
+        run_export_job(job_id)
+    except Exception:
+        logger.exception("Local export job crashed", extra={"event": "export_job_failed", "target": job_id})
+
+
+def dispatch_export_job(job_id):
+    """有任務佇列時交給 Celery，否則退回 process 內的 thread pool；回傳使用的執行方式。"""
+    job_id = str(job_id)
+    if export_run_job is not None and queue_available():
+        try:
+            export_run_job.delay(job_id)
+            return "celery"
+        except Exception:
+            logger.exception("Export job enqueue failed; running locally", extra={"event": "export_job_enqueue_failed"})
+    _get_local_executor().submit(_run_local, job_id)
+    return "local"
+
+
+def submit_export_job(kind, params, requested_by):
+    job = start_export_job(kind, params, requested_by)
+    try:
+        dispatch_export_job(job["_id"])
+    except Exception:
+        logger.exception("Export job dispatch failed", extra={"event": "export_job_enqueue_failed"})
+        update_export_job(job["_id"], {"status": "failed", "error": "dispatch_failed"})
+        raise
+    return job
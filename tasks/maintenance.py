@@ -0,0 +1,50 @@
+import logging
+import os
+
+import database
+from repositories.fund_total_repository import reconcile_fund_total
+from services.cleanup_service import cleanup_unpaid_orders
+from services.finance_service import refresh_finance_rollups
+from utils.task_queue import celery_app
+
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_db():
+    if database.db is None:
+        database.init_db(os.environ.get("MONGO_URI"))
+    return database.db
+
+
+if celery_app is not None:
+    @celery_app.task(name="maintenance.cleanup_unpaid_orders")
+    def cleanup_unpaid_orders_task():
+        if _ensure_db() is None:
+            logger.warning("Database unavailable for cleanup", extra={"event": "cleanup_unpaid_db_unavailable"})
+            return 0
+        return cleanup_unpaid_orders()["count"]
+
+    @celery_app.task(name="maintenance.reconcile_fund_total")
+    def reconcile_fund_total_task():
+        if _ensure_db() is None:
+            logger.warning("Database unavailable for fund reconcile", extra={"event": "fund_reconcile_db_unavailable"})
+            return None
+        result = reconcile_fund_total()
+        if result["drift"]:
+            logger.warning(
+                "Fund total drift detected",
+                extra={"event": "fund_total_drift", "count": result["drift"]},
+            )
+        return result["amount"]
+
+    @celery_app.task(name="maintenance.refresh_finance_rollups")
+    def refresh_finance_rollups_task():
+        if _ensure_db() is None:
+            logger.warning("Database unavailable for finance rollups", extra={"event": "finance_rollups_db_unavailable"})
+            return False
+        return refresh_finance_rollups()
+else:
+    cleanup_unpaid_orders_task = None
+    reconcile_fund_total_task = None
+    refresh_finance_rollups_task = None
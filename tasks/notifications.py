@@ -7,6 +7,7 @@ from utils.email import (
     generate_donation_paid_email,
     generate_feedback_email_html,
     generate_shop_email_html,
+    send_email_batch,
     send_email_task,
 )
 from utils.helpers import get_object_id
@@ -35,6 +36,16 @@ def _find_order(order_ref):
     return db.orders.find_one(query)
 
 
+def _find_orders(order_refs):
+    """批次通知用：以 orderId 一次查回，依傳入順序排列；查不到的略過。"""
+    db = _ensure_db()
+    order_refs = [ref for ref in order_refs or [] if ref]
+    if db is None or not order_refs:
+        return []
+    by_ref = {order.get("orderId"): order for order in db.orders.find({"orderId": {"$in": order_refs}})}
+    return [by_ref[ref] for ref in order_refs if ref in by_ref]
+
+
 def _find_feedback(feedback_ref):
     db = _ensure_db()
     if db is None or not feedback_ref:
@@ -100,6 +111,64 @@ def _order_resend_payload(order):
     return subject, html
 
 
+def _payment_confirmed_message(order):
+    customer = order.get("customer", {})
+    order_id = order.get("orderId", "")
+    if order.get("orderType") in ["donation", "fund", "committee"]:
+        subject = f"【承天中承府】電子感謝狀 - 功德無量 ({order_id})"
+        html = generate_donation_paid_email(
+            customer,
+            order_id,
+            order.get("items", []),
+            order.get("total", 0),
+        )
+    else:
+        subject = f"【承天中承府】收款確認通知 ({order_id})"
+        html = generate_shop_email_html(order, "paid", db=_ensure_db())
+    return {"to_email": customer.get("email"), "subject": subject, "body": html, "is_html": True}
+
+
+def _order_shipped_message(order):
+    order_id = order.get("orderId", "")
+    subject = f"【承天中承府】訂單出貨通知 ({order_id})"
+    html = generate_shop_email_html(order, "shipped", order.get("trackingNumber"), db=_ensure_db())
+    return {"to_email": order.get("customer", {}).get("email"), "subject": subject, "body": html, "is_html": True}
+
+
+def _send_message(message):
+    return _send_html_email(message["to_email"], message["subject"], message["body"])
+
+
+def _send_order_messages(order_refs, build_message):
+    messages = [build_message(order) for order in _find_orders(order_refs)]
+    messages = [message for message in messages if message["to_email"]]
+    if not messages:
+        return 0
+    return sum(1 for ok in send_email_batch(messages) if ok)
+
+
+def _order_cancelled_message(cancel_payload):
+    cancel_payload = cancel_payload or {}
+    order_id = cancel_payload.get("orderId", "")
+    customer_name = cancel_payload.get("customerName") or "信徒"
+
+    if cancel_payload.get("reason") == "expired":
+        subject = f"【承天中承府】訂單/捐贈登記已取消 ({order_id})"
+        body = (
+            f"親愛的 {customer_name} 您好：\n"
+            f"您的訂單/捐贈登記 ({order_id}) 因超過付款期限，系統已自動取消。"
+            f"如需服務請重新下單。"
+        )
+    else:
+        subject = f"【承天中承府】訂單/登記已取消 ({order_id})"
+        body = (
+            f"親愛的 {customer_name} 您好：\n"
+            f"您的訂單/登記 ({order_id}) 已被取消。"
+            f"如為誤操作或有任何疑問，請聯繫官方 LINE。"
+        )
+    return {"to_email": cancel_payload.get("email"), "subject": subject, "body": body, "is_html": False}
+
+
 def delay_notification(task, *args, **kwargs):
     """通知只負責排隊；排隊失敗不可影響 API 主流程。"""
     if task is None or not queue_available():
@@ -137,20 +206,7 @@ if celery_app is not None:
             logger.warning("Order not found for paid email", extra={"event": "notification_order_missing"})
             return False
 
-        customer = order.get("customer", {})
-        order_id = order.get("orderId", "")
-        if order.get("orderType") in ["donation", "fund", "committee"]:
-            subject = f"【承天中承府】電子感謝狀 - 功德無量 ({order_id})"
-            html = generate_donation_paid_email(
-                customer,
-                order_id,
-                order.get("items", []),
-                order.get("total", 0),
-            )
-        else:
-            subject = f"【承天中承府】收款確認通知 ({order_id})"
-            html = generate_shop_email_html(order, "paid", db=_ensure_db())
-        return _send_html_email(customer.get("email"), subject, html)
+        return _send_message(_payment_confirmed_message(order))
 
 
     @celery_app.task(name="notification.send_order_shipped_email")
@@ -159,10 +215,18 @@ if celery_app is not None:
         if not order:
             logger.warning("Order not found for shipped email", extra={"event": "notification_order_missing"})
             return False
-        order_id = order.get("orderId", "")
-        subject = f"【承天中承府】訂單出貨通知 ({order_id})"
-        html = generate_shop_email_html(order, "shipped", order.get("trackingNumber"), db=_ensure_db())
-        return _send_html_email(order.get("customer", {}).get("email"), subject, html)
+        return _send_message(_order_shipped_message(order))
+
+
+    @celery_app.task(name="notification.send_payment_confirmed_emails")
+    def send_payment_confirmed_emails(order_refs):
+        """批次確認收款的通知：一次查回訂單，同一個 SMTP session 寄完整批。"""
+        return _send_order_messages(order_refs, _payment_confirmed_message)
+
+
+    @celery_app.task(name="notification.send_order_shipped_emails")
+    def send_order_shipped_emails(order_refs):
+        return _send_order_messages(order_refs, _order_shipped_message)
 
 
     @celery_app.task(name="notification.send_order_resend_email")
@@ -177,27 +241,15 @@ if celery_app is not None:
 
     @celery_app.task(name="notification.send_order_cancelled_email")
     def send_order_cancelled_email(cancel_payload):
-        cancel_payload = cancel_payload or {}
-        to_email = cancel_payload.get("email")
-        order_id = cancel_payload.get("orderId", "")
-        customer_name = cancel_payload.get("customerName") or "信徒"
-        reason = cancel_payload.get("reason")
-
-        if reason == "expired":
-            subject = f"【承天中承府】訂單/捐贈登記已取消 ({order_id})"
-            body = (
-                f"親愛的 {customer_name} 您好：\n"
-                f"您的訂單/捐贈登記 ({order_id}) 因超過付款期限，系統已自動取消。"
-                f"如需服務請重新下單。"
-            )
-        else:
-            subject = f"【承天中承府】訂單/登記已取消 ({order_id})"
-            body = (
-                f"親愛的 {customer_name} 您好：\n"
-                f"您的訂單/登記 ({order_id}) 已被取消。"
-                f"如為誤操作或有任何疑問，請聯繫官方 LINE。"
-            )
-        return send_email_task(to_email, subject, body, False)
+        message = _order_cancelled_message(cancel_payload)
+        return send_email_task(message["to_email"], message["subject"], message["body"], False)
+
+
+    @celery_app.task(name="notification.send_order_cancelled_emails")
+    def send_order_cancelled_emails(cancel_payloads):
+        """批次取消通知：同一個 SMTP session 寄完整批。"""
+        messages = [_order_cancelled_message(payload) for payload in cancel_payloads or []]
+        return sum(1 for ok in send_email_batch(messages) if ok)
 
 
     @celery_app.task(name="notification.send_plain_email")
@@ -243,8 +295,11 @@ else:
     send_order_created_email = None
     send_payment_confirmed_email = None
     send_order_shipped_email = None
+    send_payment_confirmed_emails = None
+    send_order_shipped_emails = None
     send_order_resend_email = None
     send_order_cancelled_email = None
+    send_order_cancelled_emails = None
     send_plain_email = None
     send_feedback_status_email = None
     send_feedback_rejected_email = None
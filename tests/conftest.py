@@ -0,0 +1,464 @@
+import copy
+import re
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import database
+
+
+# Repository 測試共用的記憶體版 collection；只實作各 repository 實際用到的查詢與更新運算子。
+_MISSING = object()
+
+
+def _normalize(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _type_rank(value):
+    """MongoDB 跨型別排序：null < 數字 < 字串 < 物件 < 陣列 < ObjectId < 布林 < 日期。"""
+    if value is _MISSING or value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    raise TypeError(f"unsupported value: {value!r}")
+
+
+def _sort_key(value):
+    rank = _type_rank(value)
+    return (rank, 0) if rank == 1 else (rank, _normalize(value))
+
+
+def _values(doc, path):
+    """依點號路徑取值；途中遇到陣列時展開成多個候選值，找不到時回傳 [_MISSING]。"""
+    current = [doc]
+    for part in path.split("."):
+        found = []
+        for value in current:
+            if isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                    continue
+                found.extend(item.get(part, _MISSING) for item in value if isinstance(item, dict))
+            elif isinstance(value, dict):
+                found.append(value.get(part, _MISSING))
+        current = found
+    return current or [_MISSING]
+
+
+def _comparable(value, bound):
+    if value is _MISSING or value is None:
+        return False
+    rank = _type_rank(value)
+    return rank == _type_rank(bound) and rank not in (4, 5)
+
+
+def _match_operator(value, operator, argument):
+    if operator == "$eq":
+        return _equals(value, argument)
+    if operator == "$ne":
+        return not _equals(value, argument)
+    if operator == "$in":
+        return any(_equals(value, item) for item in argument)
+    if operator == "$nin":
+        return not any(_equals(value, item) for item in argument)
+    if operator in ("$lt", "$lte", "$gt", "$gte"):
+        candidates = value if isinstance(value, list) else [value]
+        for candidate in candidates:
+            if not _comparable(candidate, argument):
+                continue
+            left, right = _normalize(candidate), _normalize(argument)
+            if {"$lt": left < right, "$lte": left <= right, "$gt": left > right, "$gte": left >= right}[operator]:
+                return True
+        return False
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(argument)
+    if operator == "$type":
+        return isinstance(value, {"string": str, "date": datetime}[argument])
+    if operator == "$not":
+        return not _match_condition(value, argument)
+    if operator == "$elemMatch":
+        return isinstance(value, list) and any(_match_element(item, argument) for item in value)
+    if operator == "$all":
+        return isinstance(value, list) and all(item in value for item in argument)
+    if operator == "$regex":
+        return isinstance(value, str) and re.search(argument, value) is not None
+    raise NotImplementedError(operator)
+
+
+def _match_element(item, condition):
+    if isinstance(item, dict) and not any(key.startswith("$") for key in condition):
+        return matches(item, condition)
+    return _match_condition(item, condition)
+
+
+def _equals(value, expected):
+    if expected is None:
+        return value is _MISSING or value is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return any(_equals(item, expected) for item in value)
+    return value is not _MISSING and _normalize(value) == _normalize(expected)
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        if "$regex" in condition:
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            pattern = condition["$regex"]
+            if not (isinstance(value, str) and re.search(pattern, value, flags)):
+                return False
+            condition = {key: arg for key, arg in condition.items() if key not in ("$regex", "$options")}
+        return all(_match_operator(value, operator, argument) for operator, argument in condition.items())
+    return _equals(value, condition)
+
+
+def _evaluate(doc, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _values(doc, expression[1:])[0]
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        (operator, arguments), = expression.items()
+        values = [_evaluate(doc, argument) for argument in arguments]
+        if operator == "$add":
+            return sum(values)
+        if operator == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        left, right = values
+        return {
+            "$eq": lambda: left == right,
+            "$lt": lambda: left < right,
+            "$lte": lambda: left <= right,
+            "$gt": lambda: left > right,
+            "$gte": lambda: left >= right,
+        }[operator]()
+    return expression
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$expr":
+            if not _evaluate(doc, condition):
+                return False
+        else:
+            # 否定條件（$ne / $nin / $not / $exists: false）要每個候選值都成立，其餘只要任一個成立
+            negative = isinstance(condition, dict) and (
+                any(op in condition for op in ("$ne", "$nin", "$not")) or condition.get("$exists") is False
+            )
+            check = all if negative else any
+            if not check(_match_condition(value, condition) for value in _values(doc, key)):
+                return False
+    return True
+
+
+def _positional_index(doc, query, array_field):
+    """filter 中針對 array_field 的條件第一個命中的元素位置，供 "field.$.x" 更新使用。"""
+    array = doc.get(array_field) or []
+    for index, item in enumerate(array):
+        conditions = {}
+        for key, condition in query.items():
+            if key == array_field and isinstance(condition, dict) and "$elemMatch" in condition:
+                conditions.update(condition["$elemMatch"])
+            elif key.startswith(array_field + "."):
+                conditions[key[len(array_field) + 1:]] = condition
+        if conditions and matches(item, conditions):
+            return index
+    raise ValueError(f"positional operator did not match any element of {array_field}")
+
+
+def _resolve_path(doc, path, query):
+    parts = path.split(".")
+    if "$" in parts:
+        position = parts.index("$")
+        parts[position] = str(_positional_index(doc, query, ".".join(parts[:position])))
+    return parts
+
+
+def _set_path(doc, parts, value):
+    target = doc
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target.setdefault(part, {})
+    if isinstance(target, list):
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _get_path(doc, parts):
+    target = doc
+    for part in parts:
+        if isinstance(target, list):
+            target = target[int(part)]
+        elif isinstance(target, dict) and part in target:
+            target = target[part]
+        else:
+            return _MISSING
+    return target
+
+
+def _apply_update(doc, update, query, inserting=False):
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, argument in fields.items():
+            parts = _resolve_path(doc, path, query)
+            current = _get_path(doc, parts)
+            if operator in ("$set", "$setOnInsert"):
+                _set_path(doc, parts, copy.deepcopy(argument))
+            elif operator == "$inc":
+                if current is not _MISSING and not isinstance(current, (int, float)):
+                    raise TypeError(f"Cannot apply $inc to a value of non-numeric type at {path}")
+                _set_path(doc, parts, (0 if current is _MISSING else current) + argument)
+            elif operator == "$unset":
+                if current is not _MISSING:
+                    parent = _get_path(doc, parts[:-1]) if len(parts) > 1 else doc
+                    parent.pop(parts[-1], None)
+            elif operator == "$push":
+                items = argument["$each"] if isinstance(argument, dict) and "$each" in argument else [argument]
+                array = ([] if current is _MISSING else list(current)) + copy.deepcopy(items)
+                if isinstance(argument, dict) and "$slice" in argument:
+                    limit = argument["$slice"]
+                    array = array[limit:] if limit < 0 else array[:limit]
+                _set_path(doc, parts, array)
+            elif operator == "$pull":
+                if current is not _MISSING:
+                    _set_path(doc, parts, [item for item in current if not _match_element(item, argument)])
+            else:
+                raise NotImplementedError(operator)
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {key.split(".")[0]: bool(value) for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+    if any(fields.values()):
+        result = {key: copy.deepcopy(value) for key, value in doc.items() if fields.get(key)}
+    else:
+        result = {key: copy.deepcopy(value) for key, value in doc.items() if key not in fields}
+    if include_id and "_id" in doc:
+        result["_id"] = doc["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+
+class FakeResult:
+    def __init__(self, **counts):
+        self.matched_count = counts.get("matched_count", 0)
+        self.modified_count = counts.get("modified_count", 0)
+        self.deleted_count = counts.get("deleted_count", 0)
+        self.inserted_count = counts.get("inserted_count", 0)
+        self.upserted_count = counts.get("upserted_count", 0)
+        self.upserted_id = counts.get("upserted_id")
+        self.inserted_id = counts.get("inserted_id")
+
+
+class FakeCursor(list):
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        for field, order in reversed(keys):
+            super().sort(key=lambda doc: _sort_key(_values(doc, field)[0]), reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        if count:
+            del self[count:]
+        return self
+
+    def skip(self, count):
+        del self[:count]
+        return self
+
+    def batch_size(self, _size):
+        return self
+
+
+class FakeCollection:
+    """記憶體版 collection。before_write / after_find 設定後只在下一次寫入 / 查詢時觸發一次，用來模擬並行請求。"""
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+        self.before_write = None
+        self.after_find = None
+        self.writes = []
+
+    def _before_write(self, operation):
+        self.writes.append(operation)
+        if self.before_write:
+            hook, self.before_write = self.before_write, None
+            hook(self)
+
+    def _after_find(self):
+        if self.after_find:
+            hook, self.after_find = self.after_find, None
+            hook(self)
+
+    def get(self, doc_id):
+        return next((doc for doc in self.docs if doc.get("_id") == doc_id), None)
+
+    def find(self, query=None, projection=None, sort=None):
+        cursor = FakeCursor(_project(doc, projection) for doc in self.docs if matches(doc, query or {}))
+        self._after_find()
+        return cursor.sort(sort) if sort else cursor
+
+    def find_one(self, query=None, projection=None, sort=None):
+        if query is not None and not isinstance(query, dict):
+            query = {"_id": query}
+        cursor = self.find(query, projection, sort)
+        return cursor[0] if cursor else None
+
+    def count_documents(self, query):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    def _insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if self.get(doc["_id"]) is not None:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+        self.docs.append(doc)
+        return doc["_id"]
+
+    def insert_one(self, doc):
+        self._before_write(("insert_one", doc))
+        inserted_id = self._insert(copy.deepcopy(doc))
+        doc.setdefault("_id", inserted_id)
+        return FakeResult(inserted_id=inserted_id)
+
+    def insert_many(self, docs, ordered=True):
+        self._before_write(("insert_many", docs))
+        for doc in docs:
+            self._insert(doc)
+        return FakeResult(inserted_count=len(docs))
+
+    def _update(self, query, update, upsert=False, many=False):
+        targets = [doc for doc in self.docs if matches(doc, query)]
+        if not many:
+            targets = targets[:1]
+        modified = 0
+        for doc in targets:
+            before = copy.deepcopy(doc)
+            _apply_update(doc, update, query)
+            modified += doc != before
+        if targets or not upsert:
+            return FakeResult(matched_count=len(targets), modified_count=modified), targets
+        doc = {
+            key: copy.deepcopy(value)
+            for key, value in query.items()
+            if not key.startswith("$") and "." not in key
+            and not (isinstance(value, dict) and any(op.startswith("$") for op in value))
+        }
+        _apply_update(doc, update, query, inserting=True)
+        upserted_id = self._insert(doc)
+        return FakeResult(upserted_id=upserted_id, upserted_count=1), [doc]
+
+    def update_one(self, query, update, upsert=False):
+        self._before_write(("update_one", query, update))
+        return self._update(query, update, upsert)[0]
+
+    def update_many(self, query, update, upsert=False):
+        self._before_write(("update_many", query, update))
+        return self._update(query, update, upsert, many=True)[0]
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, sort=None):
+        self._before_write(("find_one_and_update", query, update))
+        existing = next((doc for doc in self.find(query, sort=sort)), None) if sort else None
+        if existing is not None:
+            query = {"_id": existing["_id"]}
+        before = next((copy.deepcopy(doc) for doc in self.docs if matches(doc, query)), None)
+        _result, docs = self._update(query, update, upsert)
+        if not docs:
+            return None
+        if return_document == ReturnDocument.AFTER:
+            return _project(docs[0], projection)
+        return _project(before, projection) if before is not None else None
+
+    def delete_one(self, query):
+        self._before_write(("delete_one", query))
+        doc = next((doc for doc in self.docs if matches(doc, query)), None)
+        if doc is None:
+            return FakeResult()
+        self.docs.remove(doc)
+        return FakeResult(deleted_count=1)
+
+    def delete_many(self, query):
+        self._before_write(("delete_many", query))
+        removed = [doc for doc in self.docs if matches(doc, query)]
+        self.docs = [doc for doc in self.docs if doc not in removed]
+        return FakeResult(deleted_count=len(removed))
+
+    def bulk_write(self, operations, ordered=True):
+        self._before_write(("bulk_write", operations))
+        totals = {"matched_count": 0, "modified_count": 0, "deleted_count": 0, "inserted_count": 0, "upserted_count": 0}
+        errors = []
+        for index, operation in enumerate(operations):
+            try:
+                if isinstance(operation, UpdateOne):
+                    result, _docs = self._update(operation._filter, operation._doc, operation._upsert)
+                elif isinstance(operation, InsertOne):
+                    self._insert(operation._doc)
+                    result = FakeResult(inserted_count=1)
+                elif isinstance(operation, (DeleteOne, DeleteMany)):
+                    removed = [doc for doc in self.docs if matches(doc, operation._filter)]
+                    if isinstance(operation, DeleteOne):
+                        removed = removed[:1]
+                    self.docs = [doc for doc in self.docs if doc not in removed]
+                    result = FakeResult(deleted_count=len(removed))
+                else:
+                    raise NotImplementedError(type(operation).__name__)
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000})
+                if ordered:
+                    break
+                continue
+            for key in totals:
+                totals[key] += getattr(result, key)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, **totals})
+        return FakeResult(**totals)
+
+
+class FakeDb:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """以記憶體版資料庫取代 database.db；repository 都透過 database.db 存取，換這一處即可。"""
+    db = FakeDb()
+    monkeypatch.setattr(database, "db", db)
+    return db
@@ -0,0 +1,170 @@
+from repositories import committee_quota_repository
+from repositories.committee_quota_repository import (
+    _merge_quota_checks,
+    _reserve_operation,
+    committee_release_quantities,
+)
+
+
+def test_merge_quota_checks_sums_quantities_per_role():
+    checks = [
+        {"name": "主委", "limit": 1, "qty": 1},
+        {"name": "委員", "limit": 10, "qty": 2},
+        {"name": "委員", "limit": 10},
+    ]
+
+    merged = _merge_quota_checks(checks)
+
+    assert merged == [
+        {"name": "主委", "limit": 1, "qty": 1},
+        {"name": "委員", "limit": 10, "qty": 3},
+    ]
+
+
+def test_reserve_operation_guards_against_passed_limit():
+    query, update = _reserve_operation("委員", 5, 2)
+
+    assert query == {"_id": "委員", "$expr": {"$lte": [{"$add": ["$used", 2]}, 5]}}
+    assert update["$inc"] == {"used": 2, "rev": 1}
+    assert update["$set"]["limit"] == 5
+
+
+def test_committee_release_quantities_aggregates_active_committee_orders():
+    orders = [
+        {"orderType": "committee", "status": "pending", "items": [{"name": "委員", "qty": 1}]},
+        {"orderType": "committee", "status": "paid", "items": [{"name": "委員", "qty": 2}, {"name": "主委"}]},
+        {"orderType": "committee", "status": "cancelled", "items": [{"name": "委員", "qty": 5}]},
+        {"orderType": "donation", "status": "pending", "items": [{"name": "委員", "qty": 1}]},
+    ]
+
+    assert committee_release_quantities(orders) == {"委員": 3, "主委": 1}
+
+
+def _snapshot(used, version=1):
+    doc = {"_id": "public", "roles": [{"name": "委員", "limit": 2, "price": 0, "used": used}]}
+    if version is not None:
+        doc["version"] = version
+    return doc
+
+
+def _seed(fake_db, used, snapshot=None):
+    fake_db.committee_quota_usage.insert_many([{"_id": name, "used": count} for name, count in used.items()])
+    if snapshot:
+        fake_db.committee_status.insert_many([snapshot])
+
+
+def _used(fake_db, name="委員"):
+    snapshot = fake_db.committee_status.get("public")
+    return next(role["used"] for role in snapshot["roles"] if role["name"] == name)
+
+
+def test_reserve_committee_quota_stops_at_limit_and_adjusts_snapshot(fake_db):
+    _seed(fake_db, {"委員": 1}, _snapshot(1))
+
+    assert committee_quota_repository.reserve_committee_quota("委員", 2) is True
+    assert committee_quota_repository.reserve_committee_quota("委員", 2) is False
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 2
+    assert _used(fake_db) == 2
+
+
+def test_release_committee_quota_never_goes_below_zero(fake_db):
+    _seed(fake_db, {"委員": 1}, _snapshot(1))
+
+    committee_quota_repository.release_committee_quota("委員", 2)
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 1
+    committee_quota_repository.release_committee_quota("委員", 1)
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 0
+    assert _used(fake_db) == 0
+
+
+def test_rebuild_snapshot_retries_when_a_reservation_lands_mid_rebuild(fake_db):
+    # 舊快照沒有 version 欄位
+    _seed(fake_db, {"委員": 0}, _snapshot(0, version=None))
+    # 重建讀完 usage 之後、寫入快照之前，另一個請求扣了名額並調整快照（第一次 find 是檢查 usage 是否存在）
+    fake_db.committee_quota_usage.after_find = lambda usage: setattr(
+        usage, "after_find", lambda _usage: committee_quota_repository.reserve_committee_quota("委員", 2),
+    )
+
+    snapshot = committee_quota_repository.rebuild_committee_status_snapshot([{"name": "委員", "limit": 2}])
+
+    assert snapshot["roles"][0]["used"] == 1
+    assert _used(fake_db) == 1
+    assert fake_db.committee_status.get("public")["version"] == 2
+
+
+def test_rebuild_snapshot_creates_missing_snapshot(fake_db):
+    _seed(fake_db, {"委員": 1})
+
+    committee_quota_repository.rebuild_committee_status_snapshot([{"name": "委員", "limit": 2}, {"limit": 3}])
+
+    assert fake_db.committee_status.get("public")["roles"] == [
+        {"name": "委員", "limit": 2, "price": 0, "used": 1, "rev": 0},
+    ]
+    assert fake_db.committee_status.get("public")["version"] == 1
+
+
+def test_rebuild_snapshot_initializes_roles_without_usage(fake_db, monkeypatch):
+    monkeypatch.setattr(committee_quota_repository, "calculate_committee_usage", lambda name: 2)
+
+    snapshot = committee_quota_repository.rebuild_committee_status_snapshot([{"name": "委員", "limit": 2}])
+
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 2
+    assert snapshot["roles"][0]["used"] == 2
+
+
+def test_late_snapshot_sync_does_not_double_count_after_rebuild(fake_db):
+    _seed(fake_db, {"委員": 0}, _snapshot(0))
+    # usage 已扣減、快照同步尚未落地時，重建先讀到新的 used 寫入快照
+    fake_db.committee_status.before_write = lambda status: committee_quota_repository.rebuild_committee_status_snapshot(
+        [{"name": "委員", "limit": 2}],
+    )
+
+    assert committee_quota_repository.reserve_committee_quota("委員", 2) is True
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 1
+    assert _used(fake_db) == 1
+
+
+def test_out_of_order_snapshot_syncs_keep_newest_usage(fake_db):
+    _seed(fake_db, {"委員": 0}, _snapshot(0))
+    first = committee_quota_repository._reserve_usage("委員", 2, 1)
+    second = committee_quota_repository._reserve_usage("委員", 2, 1)
+
+    committee_quota_repository._sync_snapshot_roles([second])
+    committee_quota_repository._sync_snapshot_roles([first])
+
+    assert _used(fake_db) == 2
+
+
+def test_reserve_committee_quotas_rolls_back_own_reservation_under_contention(fake_db):
+    _seed(fake_db, {"委員": 0, "主委": 1})
+    usage = fake_db.committee_quota_usage
+    original_update = usage.find_one_and_update
+
+    def find_one_and_update(query, update, **kwargs):
+        if query["_id"] == "主委" and usage.get("委員")["used"] == 2:
+            # 第二個職稱寫入前，其他請求已對第一個職稱扣了大量名額
+            for _ in range(60):
+                usage.update_one({"_id": "委員"}, {"$inc": {"used": 1}})
+        return original_update(query, update, **kwargs)
+
+    usage.find_one_and_update = find_one_and_update
+
+    failed = committee_quota_repository.reserve_committee_quotas([
+        {"name": "委員", "limit": 100, "qty": 2},
+        {"name": "主委", "limit": 1},
+    ])
+
+    assert failed == ["主委"]
+    assert usage.get("委員")["used"] == 60
+    assert usage.get("主委")["used"] == 1
+
+
+def test_reserve_committee_quotas_adjusts_snapshot_when_all_roles_fit(fake_db):
+    _seed(fake_db, {"委員": 0}, _snapshot(0))
+
+    assert committee_quota_repository.reserve_committee_quotas([
+        {"name": "委員", "limit": 2},
+        {"name": "委員", "limit": 2},
+    ]) == []
+    assert fake_db.committee_quota_usage.get("委員")["used"] == 2
+    assert _used(fake_db) == 2
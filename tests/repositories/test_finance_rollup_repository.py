@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+
+from repositories.finance_rollup_repository import UNKNOWN_DAY, taipei_day
+
+
+def test_taipei_day_uses_taipei_calendar_boundary():
+    assert taipei_day(datetime(2026, 10, 1, 15, 59, tzinfo=timezone.utc)) == "2026-10-01"
+    assert taipei_day(datetime(2026, 10, 1, 16, 0, tzinfo=timezone.utc)) == "2026-10-02"
+    assert taipei_day(datetime(2026, 10, 1, 16, 0)) == "2026-10-02"
+
+
+def test_taipei_day_groups_missing_created_at_as_unknown():
+    assert taipei_day(None) == UNKNOWN_DAY
+
+
+def test_taipei_day_groups_legacy_string_created_at_as_unknown():
+    assert taipei_day("2024/01/01 10:00") == UNKNOWN_DAY
@@ -0,0 +1,85 @@
+from repositories import fund_total_repository
+
+
+def test_fund_contribution_counts_only_paid_fund_orders():
+    assert fund_total_repository.fund_contribution({"orderType": "fund", "status": "paid", "total": 500}) == 500
+    assert fund_total_repository.fund_contribution({"orderType": "fund", "status": "pending", "total": 500}) == 0
+    assert fund_total_repository.fund_contribution({"orderType": "donation", "status": "paid", "total": 500}) == 0
+    assert fund_total_repository.fund_contribution({"orderType": "fund", "status": "paid", "total": "500"}) == 0
+
+
+def test_record_fund_order_change_applies_status_and_amount_deltas(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fund_total_repository, "adjust_fund_total", lambda *args: calls.append(args))
+    paid = {"orderType": "fund", "status": "paid", "total": 300}
+
+    fund_total_repository.record_fund_order_change(None, paid)
+    fund_total_repository.record_fund_order_change(paid, dict(paid, total=450))
+    fund_total_repository.record_fund_order_change(paid, None)
+
+    assert calls == [(300, 1), (150, 0), (-300, -1)]
+
+
+def test_record_fund_order_changes_merges_into_one_increment(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fund_total_repository, "adjust_fund_total", lambda *args: calls.append(args))
+    paid = {"orderType": "fund", "status": "paid", "total": 300}
+    shop = {"orderType": "shop", "status": "paid", "total": 999}
+
+    fund_total_repository.record_fund_order_changes([
+        (dict(paid, status="pending"), paid),
+        (dict(paid, status="pending"), dict(paid, total=200)),
+        (dict(shop, status="pending"), shop),
+    ])
+
+    assert calls == [(500, 2)]
+
+
+def _seed_total(fake_db, amount, orders):
+    fake_db.temple_fund.insert_many([{"_id": "fund_total", "type": "fund_total", "amount": amount, "paidOrders": orders}])
+
+
+def test_reconcile_records_first_drift_without_overwriting(fake_db, monkeypatch):
+    _seed_total(fake_db, 1000, 2)
+    monkeypatch.setattr(fund_total_repository, "calculate_fund_total", lambda: (1300, 3))
+
+    result = fund_total_repository.reconcile_fund_total()
+
+    assert result["drift"] == 300
+    assert result["corrected"] is False
+    doc = fake_db.temple_fund.get("fund_total")
+    assert doc["amount"] == 1000
+    assert doc["pendingDrift"] == {"amount": 300, "paidOrders": 1}
+
+    assert fund_total_repository.reconcile_fund_total()["corrected"] is True
+    doc = fake_db.temple_fund.get("fund_total")
+    assert (doc["amount"], doc["paidOrders"]) == (1300, 3)
+    assert "pendingDrift" not in doc
+
+
+def test_reconcile_skips_drift_from_increment_still_in_flight(fake_db, monkeypatch):
+    _seed_total(fake_db, 1000, 2)
+    monkeypatch.setattr(fund_total_repository, "calculate_fund_total", lambda: (1300, 3))
+    fund_total_repository.reconcile_fund_total()
+
+    # 下一輪核對前該筆訂單的 $inc 已落地，差額消失，不應再覆寫
+    fund_total_repository.adjust_fund_total(300, 1)
+    result = fund_total_repository.reconcile_fund_total()
+
+    assert result["corrected"] is False
+    doc = fake_db.temple_fund.get("fund_total")
+    assert (doc["amount"], doc["paidOrders"]) == (1300, 3)
+    assert "pendingDrift" not in doc
+
+
+def test_rebuild_fund_total_replaces_legacy_type_documents(fake_db, monkeypatch):
+    fake_db.temple_fund.insert_many([
+        {"type": "fund_total", "amount": 10},
+        {"type": "fund_total", "amount": 20},
+        {"type": "main_fund", "goal_amount": 100},
+    ])
+    monkeypatch.setattr(fund_total_repository, "calculate_fund_total", lambda: (500, 1))
+
+    assert fund_total_repository.get_fund_total() == 500
+    assert [doc["_id"] for doc in fake_db.temple_fund.find({"type": "fund_total"})] == ["fund_total"]
+    assert fake_db.temple_fund.count_documents({"type": "main_fund"}) == 1
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from repositories import history_repository
+from repositories.history_repository import history_sort_key, merge_history_streams
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _doc(minutes, doc_type="order"):
+    return {
+        "_id": ObjectId(),
+        "createdAt": datetime(2025, 1, 1) + timedelta(minutes=minutes),
+        "_docType": doc_type,
+    }
+
+
+def test_merge_history_streams_interleaves_newest_first():
+    orders = [_doc(50), _doc(30), _doc(10)]
+    feedback = [_doc(40, "feedback"), _doc(20, "feedback")]
+
+    merged = merge_history_streams(iter(orders), iter(feedback), 4)
+
+    assert [doc["createdAt"].minute for doc in merged] == [50, 40, 30, 20]
+
+
+def test_merge_history_streams_breaks_ties_by_id_and_puts_missing_dates_last():
+    first, second = ObjectId(), ObjectId()
+    created_at = datetime(2025, 1, 1)
+    orders = [{"_id": first, "createdAt": created_at}, {"_id": ObjectId()}]
+    feedback = [{"_id": second, "createdAt": created_at}]
+
+    merged = merge_history_streams(orders, feedback, 10)
+
+    assert [doc["_id"] for doc in merged[:2]] == [second, first]
+    assert "createdAt" not in merged[-1]
+
+
+def test_keyset_pages_through_dates_legacy_strings_and_missing_dates(fake_db):
+    orders = [_doc(30), _doc(10), {"_id": ObjectId(), "createdAt": "2024/01/02 09:00"}, {"_id": ObjectId()}]
+    feedback = [
+        _doc(20, "feedback"),
+        {"_id": ObjectId(), "createdAt": "2024/01/01 10:00"},
+        {"_id": ObjectId(), "createdAt": None},
+    ]
+    fake_db.orders.insert_many([dict(doc) for doc in orders])
+    fake_db.feedback.insert_many([dict(doc) for doc in feedback])
+
+    seen = []
+    after = None
+    while True:
+        page = history_repository.get_history_page_after({}, {}, after, 2)
+        if not page:
+            break
+        seen.extend(doc["_id"] for doc in page)
+        after = decode_cursor(encode_cursor(page[-1].get("createdAt"), page[-1]["_id"]))
+
+    expected = sorted(orders + feedback, key=history_sort_key, reverse=True)
+    assert seen == [doc["_id"] for doc in expected]
+    assert len(set(seen)) == 7
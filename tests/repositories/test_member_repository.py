@@ -0,0 +1,51 @@
+from repositories import member_repository
+
+
+class _FakeUsers:
+    def __init__(self):
+        self.operations = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+
+class _FakeDb:
+    def __init__(self):
+        self.users = _FakeUsers()
+
+
+def test_record_member_orders_merges_deltas_per_line_id(monkeypatch):
+    db = _FakeDb()
+    monkeypatch.setattr(member_repository.database, "db", db)
+
+    member_repository.record_member_orders(
+        [{"lineId": "U1"}, {"lineId": "U1"}, {"lineId": "U2"}, {"lineId": ""}, {}],
+        -1,
+    )
+
+    updates = {op._filter["lineId"]: op._doc["$inc"]["orderCount"] for op in db.users.operations}
+    assert updates == {"U1": -2, "U2": -1}
+
+
+def test_record_member_feedback_skips_empty_batches(monkeypatch):
+    db = _FakeDb()
+    monkeypatch.setattr(member_repository.database, "db", db)
+
+    member_repository.record_member_feedback([{"lineId": None}])
+
+    assert db.users.operations == []
+
+
+def test_find_members_page_matches_normalized_names_case_insensitively(fake_db):
+    fake_db.users.insert_many([
+        {"_id": 1, "lineId": "U1", "displayName": "Amy Chen", "lastLoginAt": 1,
+         **member_repository.member_search_fields(display_name="Amy Chen", real_name="")},
+        {"_id": 2, "lineId": "U2", "displayName": "amanda", "lastLoginAt": 2},
+        {"_id": 3, "lineId": "U3", "displayName": "Bob", "lastLoginAt": 3,
+         **member_repository.member_search_fields(display_name="Bob", real_name="王小明")},
+    ])
+
+    assert [doc["_id"] for doc in member_repository.find_members_page("amyc", None, 10)] == [1]
+    # 尚未回填正規化欄位的會員仍以原始欄位前綴比對
+    assert [doc["_id"] for doc in member_repository.find_members_page("am", None, 10)] == [2, 1]
+    assert [doc["_id"] for doc in member_repository.find_members_page("王小", None, 10)] == [3]
@@ -0,0 +1,66 @@
+from repositories import pickup_calendar_repository
+
+
+def _pickup(day, cloth_id, pickup_type="self"):
+    return {
+        "pickupDate": day,
+        "pickupType": pickup_type,
+        "clothes": [{"clothId": cloth_id, "name": "王小明", "birthYear": "70"}],
+    }
+
+
+def _cloth_ids(calendar, day):
+    doc = calendar.get(day)
+    return sorted(
+        cloth["clothId"]
+        for pickup_type in pickup_calendar_repository.PICKUP_TYPES
+        for entry in doc.get(pickup_type, [])
+        for cloth in entry["clothes"]
+    )
+
+
+def test_refresh_rereads_day_changed_by_another_writer(fake_db):
+    fake_db.pickups.insert_many([_pickup("2026-10-20", "A1")])
+    fake_db.pickup_calendar.insert_many([{"_id": "2026-10-20", "self": [], "delivery": [], "rev": 3}])
+
+    def concurrent_refresh(calendar):
+        # 另一個程序在本次讀取之後新增預約並先完成寫入
+        fake_db.pickups.insert_many([_pickup("2026-10-20", "A2", "delivery")])
+        calendar.get("2026-10-20")["rev"] += 1
+
+    fake_db.pickup_calendar.before_write = concurrent_refresh
+
+    assert pickup_calendar_repository.refresh_pickup_calendar_days(["2026-10-20", None]) == []
+    assert _cloth_ids(fake_db.pickup_calendar, "2026-10-20") == ["A1", "A2"]
+    assert fake_db.pickup_calendar.get("2026-10-20")["rev"] == 5
+
+
+def test_refresh_keeps_emptied_day_and_hides_it_from_calendar(fake_db):
+    fake_db.pickup_calendar.insert_many([{"_id": "2026-10-20", "self": [{"clothes": []}], "delivery": []}])
+
+    pickup_calendar_repository.refresh_pickup_calendar_days(["2026-10-20"])
+
+    assert fake_db.pickup_calendar.get("2026-10-20")["rev"] == 1
+    assert pickup_calendar_repository.find_pickup_calendar("2026-10-01") == []
+
+
+def test_rebuild_writes_future_days_and_drops_past_ones(fake_db):
+    fake_db.pickups.insert_many([
+        _pickup("2026-10-10", "P1"),
+        _pickup("2026-10-20", "A1"),
+        _pickup("2026-10-21", "B1", "delivery"),
+    ])
+    fake_db.pickup_calendar.insert_many([
+        {"_id": "2026-10-10", "self": [], "delivery": [], "rev": 1},
+        {"_id": "2026-10-20", "self": [], "delivery": [], "rev": 2},
+        {"_id": "2026-10-22", "self": [{"clothes": [{"clothId": "C1"}]}], "delivery": [], "rev": 4},
+    ])
+
+    assert pickup_calendar_repository.rebuild_pickup_calendar("2026-10-15") == 2
+
+    days = pickup_calendar_repository.find_pickup_calendar("2026-10-15")
+    assert [day["date"] for day in days] == ["2026-10-20", "2026-10-21"]
+    assert days[0]["self"][0]["clothes"][0]["name"] == "王O明"
+    assert fake_db.pickup_calendar.get("2026-10-10") is None
+    assert fake_db.pickup_calendar.get("2026-10-21")["rev"] == 1
+    assert fake_db.pickup_calendar.get("2026-10-22")["rev"] == 5
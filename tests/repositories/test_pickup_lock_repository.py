@@ -0,0 +1,63 @@
+from pymongo.errors import BulkWriteError
+
+from repositories import pickup_lock_repository
+
+
+class _DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class _FakeLocks:
+    def __init__(self, held, expired=()):
+        self.held = set(held)
+        self.expired = set(expired)
+        self.docs = []
+        self.deleted = []
+
+    def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["clothId"] in self.held or doc["clothId"] in self.expired:
+                errors.append({"index": index, "code": 11000})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    def delete_many(self, query):
+        self.deleted.append(query)
+        if "token" in query:
+            before = len(self.docs)
+            self.docs = [doc for doc in self.docs if doc["token"] != query["token"]]
+            return _DeleteResult(before - len(self.docs))
+        swept = self.expired & set(query["clothId"]["$in"])
+        self.expired -= swept
+        return _DeleteResult(len(swept))
+
+
+class _FakeDb:
+    def __init__(self, locks):
+        self.pickup_cloth_locks = locks
+
+
+def test_acquire_cloth_locks_reports_conflicts_and_releases_own_locks(monkeypatch):
+    locks = _FakeLocks(held={"B2", "B4"})
+    monkeypatch.setattr(pickup_lock_repository.database, "db", _FakeDb(locks))
+
+    token, conflicts = pickup_lock_repository.acquire_cloth_locks(["B1", "B2", "B3", "B4"], "U1", "2026-10-20", None)
+
+    assert token is None
+    assert conflicts == ["B2", "B4"]
+    assert locks.docs == []
+
+
+def test_acquire_cloth_locks_retries_after_sweeping_expired_locks(monkeypatch):
+    locks = _FakeLocks(held=(), expired={"B2"})
+    monkeypatch.setattr(pickup_lock_repository.database, "db", _FakeDb(locks))
+
+    token, conflicts = pickup_lock_repository.acquire_cloth_locks(["B1", "B2"], "U1", "2026-10-20", None)
+
+    assert conflicts == []
+    assert token is not None
+    assert sorted(doc["clothId"] for doc in locks.docs) == ["B1", "B2"]
@@ -0,0 +1,37 @@
+from services import cache_service
+
+
+def test_get_or_build_reuses_value_until_version_changes(monkeypatch):
+    versions = {"products": 1}
+    monkeypatch.setattr(cache_service, "get_cache_version", lambda name: versions[name])
+    monkeypatch.setattr(cache_service, "CACHE_VERSION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(cache_service, "_versions", {})
+    monkeypatch.setattr(cache_service, "_values", {})
+    calls = []
+
+    def build():
+        calls.append(1)
+        return len(calls)
+
+    assert cache_service.get_or_build("products", build) == (1, 1)
+    assert cache_service.get_or_build("products", build) == (1, 1)
+
+    versions["products"] = 2
+    assert cache_service.get_or_build("products", build) == (2, 2)
+    assert len(calls) == 2
+
+
+def test_get_or_build_rebuilds_when_variant_changes(monkeypatch):
+    monkeypatch.setattr(cache_service, "get_cache_version", lambda name: 3)
+    monkeypatch.setattr(cache_service, "CACHE_VERSION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(cache_service, "_versions", {})
+    monkeypatch.setattr(cache_service, "_values", {})
+    calls = []
+
+    def build():
+        calls.append(1)
+        return len(calls)
+
+    assert cache_service.get_or_build("pickup_calendar", build, variant="2026-10-17") == (3, 1)
+    assert cache_service.get_or_build("pickup_calendar", build, variant="2026-10-17") == (3, 1)
+    assert cache_service.get_or_build("pickup_calendar", build, variant="2026-10-18") == (3, 2)
@@ -0,0 +1,162 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+from services import export_service, history_service
+from services.export_service import (
+    HISTORY_CSV_HEADER,
+    _iter_text_chunks,
+    export_kind_allowed,
+    iter_history_csv,
+    serialize_export_job,
+)
+
+
+def test_iter_text_chunks_flushes_every_chunk_and_reports_rows():
+    progress = []
+
+    chunks = list(_iter_text_chunks((f"{i}\n" for i in range(5)), 2, progress.append, header="H\n"))
+
+    assert chunks == ["H\n0\n1\n", "2\n3\n", "4\n"]
+    assert progress == [2, 4, 5]
+
+
+def test_export_kind_allowed_checks_kind_roles():
+    assert export_kind_allowed("history_csv", ["finance"])
+    assert not export_kind_allowed("feedback_txt", ["finance"])
+    assert export_kind_allowed("feedback_txt", ["super_admin"])
+    assert not export_kind_allowed("unknown", ["super_admin"])
+
+
+def test_serialize_export_job_progress_percent():
+    job = {"_id": "j1", "kind": "donations_txt", "status": "running", "rowCount": 50, "totalRows": 200}
+
+    assert serialize_export_job(job)["progress"] == 25
+    assert serialize_export_job({**job, "status": "done"})["progress"] == 100
+
+
+def test_iter_history_csv_writes_bom_header_and_keeps_legacy_dates(monkeypatch):
+    docs = [
+        {
+            "_id": 1,
+            "_docType": "order",
+            "orderId": "ORD1",
+            "orderType": "shop",
+            "status": "paid",
+            "customer": {"name": "=王小明", "phone": "0912"},
+            "items": [{"name": "平安符", "variantName": "紅", "qty": 2}],
+            "total": 600,
+            "createdAt": datetime(2026, 10, 1, 16, 30, tzinfo=timezone.utc),
+        },
+        {"_id": 2, "_docType": "order", "orderId": "ORD2", "orderType": "fund", "createdAt": "2024/01/01 10:00"},
+        # $unionWith 子 pipeline 已補上 orderType / orderId
+        {"_id": 3, "_docType": "feedback", "orderType": "feedback", "orderId": "FB1", "nickname": "小明", "content": "感謝"},
+    ]
+    monkeypatch.setattr(history_service, "iter_history", lambda orders_match, feedback_match: iter(docs))
+
+    text = "".join(iter_history_csv({}, chunk_rows=2))
+
+    assert text.startswith("\ufeff")
+    rows = list(csv.reader(io.StringIO(text[1:])))
+    assert rows[0] == HISTORY_CSV_HEADER
+    assert rows[1][:5] == ["訂單", "ORD1", "🛍️ 結緣品", "paid", "'=王小明"]
+    assert rows[1][8:11] == ["平安符(紅)x2", "600", "2026-10-02 00:30"]
+    assert rows[2][10] == "2024/01/01 10:00"
+    assert rows[3][:3] == ["回饋", "FB1", "💬 回饋"]
+    assert len(rows) == 4
+
+
+class _FakeUpload:
+    _id = "file-1"
+
+    def __init__(self):
+        self.data = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        self.data += data
+
+
+def _stub_export_job(monkeypatch, job, claimed, iter_chunks):
+    updates = []
+    upload = _FakeUpload()
+    monkeypatch.setattr(export_service, "find_export_job", lambda job_id: job)
+    monkeypatch.setattr(export_service, "claim_export_job", lambda job_id: claimed)
+    monkeypatch.setattr(export_service, "update_export_job", lambda job_id, fields: updates.append(fields))
+    monkeypatch.setattr(export_service, "open_export_upload", lambda filename, metadata: upload)
+    spec = {**export_service.EXPORT_KINDS["feedback_txt"], "iter_chunks": iter_chunks, "count": lambda params: 2}
+    monkeypatch.setitem(export_service.EXPORT_KINDS, "feedback_txt", spec)
+    return updates, upload
+
+
+def test_run_export_job_marks_done_with_file_and_row_count(monkeypatch):
+    job = {"_id": "j1", "kind": "feedback_txt", "status": "queued"}
+
+    def iter_chunks(params, on_progress=None):
+        yield "a\nb\n"
+        on_progress(2)
+
+    updates, upload = _stub_export_job(monkeypatch, job, {**job, "status": "running"}, iter_chunks)
+
+    assert export_service.run_export_job("j1") is True
+    assert upload.data == b"a\nb\n"
+    assert updates[0] == {"totalRows": 2}
+    assert {key: updates[-1][key] for key in ("status", "fileId", "rowCount")} == {
+        "status": "done", "fileId": "file-1", "rowCount": 2,
+    }
+
+
+def test_run_export_job_marks_failed_when_export_raises(monkeypatch):
+    job = {"_id": "j1", "kind": "feedback_txt", "status": "queued"}
+
+    def iter_chunks(params, on_progress=None):
+        raise RuntimeError("cursor lost")
+        yield  # pragma: no cover
+
+    updates, _ = _stub_export_job(monkeypatch, job, {**job, "status": "running"}, iter_chunks)
+
+    assert export_service.run_export_job("j1") is False
+    assert updates[-1]["status"] == "failed"
+    assert updates[-1]["error"] == "cursor lost"
+
+
+def test_run_export_job_skips_jobs_claimed_elsewhere_and_fails_unknown_kinds(monkeypatch):
+    job = {"_id": "j1", "kind": "feedback_txt", "status": "running"}
+    updates, _ = _stub_export_job(monkeypatch, job, None, lambda params, on_progress=None: iter(()))
+
+    assert export_service.run_export_job("j1") is False
+    assert updates == []
+
+    monkeypatch.setattr(export_service, "find_export_job", lambda job_id: {"_id": "j2", "kind": "pdf"})
+    assert export_service.run_export_job("j2") is False
+    assert updates[-1]["status"] == "failed"
+    assert updates[-1]["error"] == "unknown_kind"
+
+
+def test_expire_stale_export_job_fails_orphaned_running_job(fake_db):
+    now = datetime.now(timezone.utc)
+    stale = {"_id": "j1", "kind": "feedback_txt", "status": "running", "updatedAt": now - timedelta(hours=1)}
+    fresh = {"_id": "j2", "kind": "feedback_txt", "status": "running", "updatedAt": now}
+    fake_db.export_jobs.insert_many([stale, fresh])
+
+    expired = export_service.expire_stale_export_job(stale)
+
+    assert serialize_export_job(expired)["status"] == "failed"
+    assert fake_db.export_jobs.get("j1")["error"] == "worker_lost"
+    assert export_service.expire_stale_export_job(fresh) is fresh
+    assert fake_db.export_jobs.get("j2")["status"] == "running"
+
+
+def test_expire_stale_export_job_keeps_job_updated_after_read(fake_db):
+    now = datetime.now(timezone.utc)
+    job = {"_id": "j1", "kind": "feedback_txt", "status": "running", "updatedAt": now - timedelta(hours=1)}
+    # 讀取後 worker 才回寫進度：條件更新不成立，維持 running
+    fake_db.export_jobs.insert_many([{**job, "updatedAt": now}])
+
+    assert export_service.expire_stale_export_job(job) is job
+    assert fake_db.export_jobs.get("j1")["status"] == "running"
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from services import finance_service
+
+
+def _stub_summary(monkeypatch, watermark, refresh):
+    monkeypatch.setattr(finance_service, "get_job_state", lambda job: {"watermark": watermark})
+    monkeypatch.setattr(finance_service, "refresh_finance_rollups", refresh)
+    monkeypatch.setattr(
+        finance_service,
+        "aggregate_finance_rollups",
+        lambda start, end: [{"_id": {"type": "shop", "status": "paid"}, "count": 2, "total": 600}],
+    )
+
+
+def test_finance_summary_skips_refresh_when_rollups_are_fresh(monkeypatch):
+    calls = []
+    fresh = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=30)
+    _stub_summary(monkeypatch, fresh, lambda: calls.append(1))
+
+    assert finance_service.get_finance_summary() == {"shop": {"paid": {"count": 2, "total": 600}}}
+    assert calls == []
+
+
+def test_finance_summary_tolerates_stale_refresh_failure(monkeypatch):
+    def broken_refresh():
+        raise RuntimeError("aggregation failed")
+
+    _stub_summary(monkeypatch, None, broken_refresh)
+
+    assert finance_service.get_finance_summary() == {"shop": {"paid": {"count": 2, "total": 600}}}
@@ -0,0 +1,27 @@
+from services import history_service
+
+
+def _use_backfill_state(monkeypatch, state):
+    monkeypatch.setattr(history_service, "get_job_state", lambda job: state)
+    monkeypatch.setattr(history_service, "_search_tokens_state", {"ready": False, "checkedAt": None})
+
+
+def test_history_search_keeps_regex_until_backfill_completes(monkeypatch):
+    _use_backfill_state(monkeypatch, None)
+
+    orders_match, feedback_match = history_service.build_history_matches("", "ORD2026", "王小明", "", "", "")
+
+    assert "searchTokens" not in orders_match
+    assert "searchTokens" not in feedback_match
+    assert orders_match["orderId"]["$regex"] == "ORD2026"
+    assert orders_match["customer.name"]["$regex"] == "王小明"
+
+
+def test_history_search_uses_tokens_after_backfill(monkeypatch):
+    _use_backfill_state(monkeypatch, {"completedAt": "2026-10-18"})
+
+    orders_match, feedback_match = history_service.build_history_matches("", "ORD2026", "王小明", "", "", "")
+
+    assert orders_match["searchTokens"]["$all"][0] == "i:ord2026"
+    assert "orderId" not in orders_match
+    assert feedback_match["searchTokens"] == orders_match["searchTokens"]
@@ -0,0 +1,54 @@
+from pymongo import ASCENDING, DESCENDING
+
+from database import INDEX_SPECS
+from repositories.query_shapes import QUERY_SHAPES
+from services.index_advisor_service import (
+    declared_indexes,
+    find_overlaps,
+    find_prefix_redundancy,
+    plan_summary,
+    write_amplification,
+)
+
+
+SPECS = (
+    ('orders', [('orderId', ASCENDING)], {'name': 'order_id', 'unique': True}),
+    ('orders', [('orderId', ASCENDING), ('createdAt', DESCENDING)], {'name': 'order_id_created'}),
+    ('orders', [('status', ASCENDING)], {'name': 'status'}),
+    ('orders', [('status', ASCENDING), ('createdAt', DESCENDING)], {'name': 'status_created'}),
+    ('orders', [('orderType', ASCENDING), ('status', ASCENDING), ('updatedAt', DESCENDING)], {'name': 'type_status_updated'}),
+    ('orders', [('status', ASCENDING), ('orderType', ASCENDING), ('updatedAt', DESCENDING)], {'name': 'status_type_updated'}),
+)
+
+
+def test_static_analysis_flags_prefix_and_overlapping_indexes():
+    indexes = declared_indexes(SPECS)
+
+    # unique 索引即使是前綴也不可移除
+    assert find_prefix_redundancy(indexes) == {"status": "status_created"}
+    assert find_overlaps(indexes) == [("type_status_updated", "status_type_updated")]
+    assert write_amplification(indexes, ["status"])["orders"]["writesPerInsert"] == 8
+    assert write_amplification(indexes, ["status"])["orders"]["leanWritesPerInsert"] == 7
+
+
+def test_plan_summary_reads_classic_and_sbe_plans():
+    classic = {
+        "stage": "FETCH",
+        "inputStage": {"stage": "SORT", "inputStage": {"stage": "IXSCAN", "indexName": "status_created"}},
+    }
+    sbe = {"queryPlan": {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN", "indexName": "a"},
+        {"stage": "COLLSCAN"},
+    ]}}
+
+    assert plan_summary(classic) == {"indexes": ["status_created"], "collscan": False, "blockingSort": True}
+    assert plan_summary(sbe)["indexes"] == ["a"]
+    assert plan_summary(sbe)["collscan"] is True
+
+
+def test_query_shapes_target_declared_collections():
+    collections = {collection for collection, _keys, _kwargs in INDEX_SPECS}
+    names = [shape[1] for shape in QUERY_SHAPES]
+
+    assert len(names) == len(set(names))
+    assert {shape[0] for shape in QUERY_SHAPES} <= collections
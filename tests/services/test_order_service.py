@@ -0,0 +1,72 @@
+from bson import ObjectId
+
+from services import order_service
+
+
+def _stub_side_effects(monkeypatch):
+    audit = []
+    fund_changes = []
+    monkeypatch.setattr(order_service.database, "write_audit_log", lambda *args: audit.append(args))
+    monkeypatch.setattr(order_service, "record_committee_payment", lambda order: None)
+    monkeypatch.setattr(order_service, "record_fund_order_changes", lambda changes: fund_changes.extend(changes))
+    return audit, fund_changes
+
+
+def test_bulk_confirm_payment_reports_each_outcome(monkeypatch, fake_db):
+    pending, paid, missing = ObjectId(), ObjectId(), ObjectId()
+    fake_db.orders.insert_many([
+        {"_id": pending, "orderId": "D1", "status": "pending", "total": 600},
+        {"_id": paid, "orderId": "D2", "status": "paid", "total": 300},
+    ])
+    audit, fund_changes = _stub_side_effects(monkeypatch)
+
+    results, updated = order_service.bulk_confirm_payment(
+        [str(pending), "bad-id", str(pending), str(paid), str(missing)],
+        "admin",
+    )
+
+    assert [result["result"] for result in results] == [
+        "confirmed", "invalid_id", "duplicate", "invalid_status", "not_found",
+    ]
+    assert results[3]["status"] == "paid"
+    assert [order["orderId"] for order in updated] == ["D1"]
+    assert fake_db.orders.get(pending)["paidBy"] == "admin"
+    assert fund_changes[0][0]["status"] == "pending"
+    assert audit[0][1:3] == ("bulk_confirm_payment", fake_db.orders.get(pending)["paidBatchId"])
+
+
+def test_bulk_confirm_payment_does_not_claim_orders_confirmed_by_a_concurrent_batch(monkeypatch, fake_db):
+    order_id = ObjectId()
+    fake_db.orders.insert_many([{"_id": order_id, "orderId": "D1", "status": "pending"}])
+
+    def concurrent_batch(orders):
+        orders.get(order_id).update({"status": "paid", "paidBatchId": "other-batch"})
+
+    fake_db.orders.before_write = concurrent_batch
+    audit, fund_changes = _stub_side_effects(monkeypatch)
+
+    results, updated = order_service.bulk_confirm_payment([str(order_id)], "admin")
+
+    assert results == [{"id": str(order_id), "orderId": "D1", "result": "invalid_status", "status": "paid"}]
+    assert updated == []
+    assert audit == []
+    assert fund_changes == []
+
+
+def test_bulk_mark_shipped_sets_tracking_number_per_order(monkeypatch, fake_db):
+    first, second = ObjectId(), ObjectId()
+    fake_db.orders.insert_many([
+        {"_id": first, "orderId": "S1", "status": "paid"},
+        {"_id": second, "orderId": "S2", "status": "pending"},
+    ])
+    audit, _ = _stub_side_effects(monkeypatch)
+
+    results, updated = order_service.bulk_mark_shipped([(str(first), "T001"), (str(second), "T002")], "admin")
+
+    assert [(result["result"], result["trackingNumber"]) for result in results] == [
+        ("shipped", "T001"), ("invalid_status", "T002"),
+    ]
+    assert fake_db.orders.get(first)["trackingNumber"] == "T001"
+    assert fake_db.orders.get(second)["status"] == "pending"
+    assert [order["orderId"] for order in updated] == ["S1"]
+    assert "S1(T001)" in audit[0][3]
@@ -0,0 +1,90 @@
+import io
+from datetime import date, datetime, timezone
+
+from services import reconciliation_service
+from services.reconciliation_service import (
+    build_pending_index,
+    match_statement,
+    parse_statement_amount,
+    parse_statement_date,
+    read_statement_rows,
+)
+
+
+def _order(oid, last5, total, day):
+    return {
+        "_id": oid,
+        "orderId": f"O{oid}",
+        "total": total,
+        "createdAt": datetime(2024, 10, day, 2, tzinfo=timezone.utc),
+        "customer": {"last5": last5, "name": "王小明"},
+    }
+
+
+def test_parse_statement_amount_and_date():
+    assert parse_statement_amount("NT$1,200") == 1200
+    assert parse_statement_amount("1200.50") is None
+    assert parse_statement_amount("") is None
+    assert parse_statement_date("113/10/18") == date(2024, 10, 18)
+    assert parse_statement_date("20241018") == date(2024, 10, 18)
+    assert parse_statement_date("備註") is None
+
+
+def test_match_statement_claims_unique_matches_and_ranks_ambiguous_ones():
+    index = build_pending_index([
+        _order(1, "12345", 600, 17),
+        _order(2, "22222", 1000, 17),
+        _order(3, "22222", 1000, 14),
+        _order(4, "33333", 500, 17),
+    ])
+    statement = "\n".join([
+        "帳戶明細",
+        "交易日期,支出金額,存入金額(元),轉出帳號",
+        "2024/10/18,,600,0001234512345",
+        "2024/10/18,,1000,99922222",
+        "2024/10/18,300,,",
+        "2024/10/18,,700,00033333",
+        "2024/10/18,,600,0001234512345",
+    ]).encode("cp950")
+
+    results, summary = match_statement(read_statement_rows(io.BytesIO(statement), "cp950"), index)
+
+    assert [result["status"] for result in results] == [
+        "matched", "ambiguous", "amount_mismatch", "already_matched",
+    ]
+    assert results[0]["order"]["orderId"] == "O1"
+    assert results[1]["suggested"] == "2"
+    assert summary["skipped"] == 1
+    assert summary["matchedAmount"] == 600
+
+
+def test_confirm_only_auto_confirms_matches_dated_on_or_after_the_order(monkeypatch):
+    index = build_pending_index([
+        _order(1, "12345", 600, 17),
+        _order(2, "22222", 1000, 19),
+        _order(3, "33333", 500, 17),
+    ])
+    statement = "\n".join([
+        "交易日期,存入金額,轉出帳號",
+        "2024/10/18,600,12345",
+        "2024/10/18,1000,22222",
+        ",500,33333",
+    ]).encode("utf-8")
+    calls = []
+
+    def fake_bulk_confirm(order_ids, admin_user):
+        calls.append(order_ids)
+        return [{"id": oid, "result": "confirmed"} for oid in order_ids], [{"_id": oid} for oid in order_ids]
+
+    monkeypatch.setattr(reconciliation_service, "iter_pending_payment_orders", lambda: iter(()))
+    monkeypatch.setattr(reconciliation_service, "build_pending_index", lambda orders: index)
+    monkeypatch.setattr(reconciliation_service, "bulk_confirm_payment", fake_bulk_confirm)
+    monkeypatch.setattr(reconciliation_service, "queue_payment_confirmed_emails", lambda orders: None)
+
+    report = reconciliation_service.reconcile_statement(io.BytesIO(statement), confirm=True, admin_user="admin")
+
+    assert calls == [["1"]]
+    assert report["summary"]["confirmed"] == 1
+    assert [(row["status"], row["confirmed"]) for row in report["rows"]] == [
+        ("matched", True), ("matched", False), ("matched", False),
+    ]
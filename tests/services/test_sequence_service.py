@@ -0,0 +1,49 @@
+from services.sequence_service import SequenceBlockAllocator
+
+
+class FakeCounters:
+    def __init__(self):
+        self.values = {}
+        self.wasted = {}
+
+    def reserve(self, counter_key, metadata=None, increment=1):
+        self.values[counter_key] = self.values.get(counter_key, 0) + increment
+        return self.values[counter_key]
+
+    def record_waste(self, counter_key, count):
+        self.wasted[counter_key] = self.wasted.get(counter_key, 0) + count
+
+
+def test_block_allocator_hands_out_reserved_numbers_locally():
+    counters = FakeCounters()
+    allocator = SequenceBlockAllocator(
+        3,
+        reserve=counters.reserve,
+        record_waste=counters.record_waste,
+        date_part=lambda: "20250101",
+    )
+
+    values = [allocator.next_value("orders", "DON")[1] for _ in range(4)]
+
+    assert values == [1, 2, 3, 4]
+    assert counters.values == {"orders:DON:20250101": 6}
+
+
+def test_block_allocator_rolls_over_at_day_boundary_and_reports_waste():
+    counters = FakeCounters()
+    today = {"value": "20250101"}
+    allocator = SequenceBlockAllocator(
+        5,
+        reserve=counters.reserve,
+        record_waste=counters.record_waste,
+        date_part=lambda: today["value"],
+    )
+
+    assert allocator.next_value("orders", "DON") == ("20250101", 1)
+    today["value"] = "20250102"
+    assert allocator.next_value("orders", "DON") == ("20250102", 1)
+    assert counters.wasted == {"orders:DON:20250101": 4}
+
+    assert allocator.release() == 4
+    assert counters.wasted["orders:DON:20250102"] == 4
+    assert allocator.wasted == 8
@@ -0,0 +1,130 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from services import store_service
+from utils.cache import LocalCache
+
+
+STORE_XML = """<?xml version="1.0" encoding="utf-8"?>
+<iMapSDKOutput><GeoPosition><POIID>123456</POIID><POIName>測試門市</POIName>
+<Address>台北市中正路1號</Address><Telno>02-1234</Telno><OP_TIME>24小時</OP_TIME></GeoPosition></iMapSDKOutput>"""
+EMPTY_XML = """<?xml version="1.0" encoding="utf-8"?><iMapSDKOutput></iMapSDKOutput>"""
+
+
+@pytest.fixture
+def fake_pcsc(monkeypatch):
+    """本機假 PCSC 服務：123456 有資料、其餘查無；記錄每次收到的店號。"""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            store_id = parse_qs(self.rfile.read(length).decode("utf-8")).get("ID", [""])[0]
+            calls.append(store_id)
+            release.wait(5)
+            body = (STORE_XML if store_id == "123456" else EMPTY_XML).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(store_service, "PCSC_EMAP_URL", f"http://127.0.0.1:{server.server_port}/EMapSDK.aspx")
+    monkeypatch.setattr(store_service, "_local_cache", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_failures", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_breaker", store_service._CircuitBreaker(5, 60))
+    monkeypatch.setattr(store_service.database, "db", None)
+    yield calls, release
+    server.shutdown()
+
+
+def test_get_711_store_caches_hits_and_misses(fake_pcsc):
+    calls, _ = fake_pcsc
+
+    assert store_service.get_711_store("123456")["name"] == "測試門市"
+    assert store_service.get_711_store("123456")["address"] == "台北市中正路1號"
+    assert store_service.get_711_store("999999") is None
+    assert store_service.get_711_store("999999") is None
+
+    assert calls == ["123456", "999999"]
+
+
+def test_get_711_store_coalesces_concurrent_lookups(fake_pcsc):
+    calls, release = fake_pcsc
+    release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store_service.get_711_store("123456"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for _ in range(500):
+        if calls:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["123456"]
+    assert [store["id"] for store in results] == ["123456"] * 5
+
+
+def test_get_711_store_backs_off_after_upstream_failure(monkeypatch):
+    attempts = []
+
+    def failing_fetch(store_id):
+        attempts.append(store_id)
+        raise store_service.StoreLookupError("down")
+
+    monkeypatch.setattr(store_service, "fetch_711_store", failing_fetch)
+    monkeypatch.setattr(store_service, "_local_cache", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_failures", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_breaker", store_service._CircuitBreaker(5, 60))
+    monkeypatch.setattr(store_service.database, "db", None)
+
+    for _ in range(3):
+        with pytest.raises(store_service.StoreLookupError):
+            store_service.get_711_store("123456")
+
+    assert attempts == ["123456"]
+
+
+def test_circuit_breaker_stops_upstream_calls_across_store_ids(monkeypatch):
+    now = [0.0]
+    attempts = []
+    upstream_down = [True]
+
+    def fetch(store_id):
+        attempts.append(store_id)
+        if upstream_down[0]:
+            raise store_service.StoreLookupError("down")
+        return None
+
+    monkeypatch.setattr(store_service, "fetch_711_store", fetch)
+    monkeypatch.setattr(store_service, "_local_cache", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_failures", LocalCache(16, 60))
+    monkeypatch.setattr(store_service, "_breaker", store_service._CircuitBreaker(2, 30, clock=lambda: now[0]))
+    monkeypatch.setattr(store_service.database, "db", None)
+
+    for store_id in ("100001", "100002", "100003"):
+        with pytest.raises(store_service.StoreLookupError):
+            store_service.get_711_store(store_id)
+    assert attempts == ["100001", "100002"]
+
+    # 冷卻期滿只放行一個試探請求；上游恢復後斷路關閉
+    now[0] = 31
+    upstream_down[0] = False
+    assert store_service.get_711_store("100004") is None
+    assert store_service.get_711_store("100005") is None
+    assert attempts == ["100001", "100002", "100004", "100005"]
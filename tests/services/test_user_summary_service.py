@@ -0,0 +1,11 @@
+from services.user_summary_service import NO_TITLE_RANK, highest_committee_title
+
+
+def test_highest_committee_title_picks_best_rank_and_strips_prefix():
+    names = ["[建廟] 委員", "一般商品", "[本府] 籌備副主委", "功德主"]
+
+    assert highest_committee_title(names) == ("副主委", 2)
+
+
+def test_highest_committee_title_without_committee_items():
+    assert highest_committee_title(["平安符"]) == ("", NO_TITLE_RANK)
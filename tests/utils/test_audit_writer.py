@@ -0,0 +1,34 @@
+import threading
+
+from utils.audit_writer import BufferedAuditWriter
+
+
+def test_audit_writer_batches_entries_in_background():
+    batches = []
+    written = threading.Event()
+
+    def write_many(entries):
+        batches.append(list(entries))
+        written.set()
+
+    writer = BufferedAuditWriter(write_many, batch_size=3, flush_seconds=30, max_pending=10)
+    for index in range(3):
+        assert writer.write({"n": index}) is True
+
+    assert written.wait(2)
+    assert batches == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+    writer.close()
+
+
+def test_audit_writer_flush_and_full_buffer_write_synchronously():
+    batches = []
+    writer = BufferedAuditWriter(batches.append, batch_size=2, flush_seconds=30, max_pending=2)
+    writer._thread = object()  # 不啟動背景執行緒，紀錄只會留在佇列
+
+    assert writer.write({"n": 1}) is True
+    assert writer.write({"n": 2}) is True
+    assert writer.write({"n": 3}) is False
+    assert batches == [[{"n": 3}]]
+
+    assert writer.flush() == 2
+    assert batches == [[{"n": 3}], [{"n": 1}, {"n": 2}]]
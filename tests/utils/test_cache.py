@@ -0,0 +1,32 @@
+from utils import cache
+from utils.cache import LocalCache, build_cache_backend
+
+
+def test_local_cache_evicts_least_recently_used():
+    store = LocalCache(max_entries=2, ttl_seconds=60)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+
+    store.set("c", 3)
+
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+
+
+def test_local_cache_expires_entries(monkeypatch):
+    now = {"value": 100.0}
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now["value"])
+    store = LocalCache(ttl_seconds=10)
+    store.set("page", "<html>")
+
+    now["value"] = 111.0
+
+    assert store.get("page") is None
+
+
+def test_build_cache_backend_falls_back_to_local_without_redis_url(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+
+    assert isinstance(build_cache_backend("page", backend="redis"), LocalCache)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from utils.db_profiler import (
+    RequestCommandListener,
+    finish_request_profile,
+    start_request_profile,
+)
+
+
+def _events(request_id, command_name, command, duration_micros):
+    base = {"connection_id": ("localhost", 27017), "request_id": request_id, "command_name": command_name}
+    return (
+        SimpleNamespace(**base, command=command),
+        SimpleNamespace(**base, duration_micros=duration_micros),
+    )
+
+
+def test_listener_collects_count_total_and_slowest_command():
+    listener = RequestCommandListener()
+    token = start_request_profile()
+    try:
+        for started, succeeded in (
+            _events(1, "find", {"find": "users"}, 2000),
+            _events(2, "aggregate", {"aggregate": "orders"}, 9000),
+            _events(3, "getMore", {"getMore": 1, "collection": "orders"}, 1000),
+        ):
+            listener.started(started)
+            listener.succeeded(succeeded)
+    finally:
+        profile = finish_request_profile(token)
+
+    assert profile.count == 3
+    assert profile.total_ms == 12.0
+    assert profile.slowest_label == "orders.aggregate"
+    assert profile.server_timing() == 'db;dur=12.0;desc="3 queries", db-slowest;dur=9.0;desc="orders.aggregate"'
+
+
+def test_listener_ignores_commands_outside_requests():
+    listener = RequestCommandListener()
+    started, succeeded = _events(1, "find", {"find": "users"}, 1000)
+
+    listener.started(started)
+    listener.succeeded(succeeded)
+
+    assert listener._pending == {}
@@ -0,0 +1,102 @@
+import smtplib
+
+from utils.email import SMTPConnectionPool
+
+
+class FakeServer:
+    def __init__(self, fail_first_send=False, fail_during_data=False):
+        self.sent = []
+        self.fail_first_send = fail_first_send
+        self.fail_during_data = fail_during_data
+        self.recipient = None
+        self.closed = False
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        if self.fail_first_send:
+            self.fail_first_send = False
+            raise smtplib.SMTPServerDisconnected("gone")
+        return (250, b"OK")
+
+    def rcpt(self, recipient):
+        self.recipient = recipient
+        return (250, b"OK")
+
+    def data(self, payload):
+        if self.fail_during_data:
+            self.fail_during_data = False
+            self.sent.append(self.recipient)
+            raise smtplib.SMTPServerDisconnected("gone after DATA")
+        self.sent.append(self.recipient)
+        return (250, b"OK")
+
+    def rset(self):
+        return (250, b"OK")
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def _settings():
+    return {
+        "server": "localhost",
+        "port": 2525,
+        "username": "sender@example.com",
+        "password": "secret",
+        "starttls": False,
+        "timeout": 5,
+    }
+
+
+def _message(index):
+    return {"to_email": f"user{index}@example.com", "subject": "hi", "body": "body", "is_html": False}
+
+
+def test_pool_reuses_one_connection_across_sends():
+    servers = []
+
+    def factory(settings):
+        servers.append(FakeServer())
+        return servers[-1]
+
+    pool = SMTPConnectionPool(settings_loader=_settings, connection_factory=factory)
+
+    assert pool.send_many([_message(1)]) == [True]
+    assert pool.send_many([_message(2), _message(3)]) == [True, True]
+    assert len(servers) == 1
+    assert servers[0].sent == ["user1@example.com", "user2@example.com", "user3@example.com"]
+
+
+def test_pool_reconnects_after_server_disconnect():
+    servers = [FakeServer(fail_first_send=True), FakeServer()]
+    opened = iter(servers)
+    pool = SMTPConnectionPool(settings_loader=_settings, connection_factory=lambda settings: next(opened))
+
+    assert pool.send_many([_message(1)]) == [True]
+    assert servers[0].closed
+    assert servers[1].sent == ["user1@example.com"]
+
+
+def test_pool_does_not_resend_after_data_was_sent():
+    servers = [FakeServer(fail_during_data=True), FakeServer()]
+    opened = iter(servers)
+    pool = SMTPConnectionPool(settings_loader=_settings, connection_factory=lambda settings: next(opened))
+
+    assert pool.send_many([_message(1), _message(2)]) == [False, True]
+    assert servers[0].closed
+    assert servers[0].sent == ["user1@example.com"]
+    assert servers[1].sent == ["user2@example.com"]
+
+
+def test_pool_skips_sending_without_credentials():
+    pool = SMTPConnectionPool(settings_loader=lambda: {**_settings(), "password": None})
+
+    assert pool.send_many([_message(1), _message(2)]) == [False, False]
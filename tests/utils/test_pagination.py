@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.errors import ValidationError
+from utils.pagination import decode_cursor, encode_cursor, keyset_predicate
+
+
+def test_cursor_round_trip_keeps_sort_value_and_id():
+    created_at = datetime(2025, 2, 3, 4, 5, 6, 789000)
+    doc_id = ObjectId()
+
+    token = encode_cursor(created_at, doc_id)
+
+    assert "=" not in token
+    assert decode_cursor(token) == (created_at, doc_id)
+
+
+def test_cursor_keeps_legacy_string_and_missing_sort_values():
+    doc_id = ObjectId()
+
+    assert decode_cursor(encode_cursor("2024/01/01 10:00", doc_id)) == ("2024/01/01 10:00", doc_id)
+    assert decode_cursor(encode_cursor(None, doc_id)) == (None, doc_id)
+
+
+@pytest.mark.parametrize("token", ["", "not-base64!", "e30", "eyJ2IjpudWxsLCJpZCI6Inh4In0"])
+def test_decode_cursor_rejects_tampered_tokens(token):
+    with pytest.raises(ValidationError):
+        decode_cursor(token)
+
+
+def test_keyset_predicate_uses_given_field_and_brackets_by_type():
+    doc_id = ObjectId()
+
+    assert keyset_predicate("lastLoginAt", (None, doc_id)) == {"lastLoginAt": None, "_id": {"$lt": doc_id}}
+    assert keyset_predicate("createdAt", ("2024/01/01", doc_id))["$or"][0] == {
+        "createdAt": {"$type": "string", "$lt": "2024/01/01"},
+    }
+    assert {"lastLoginAt": {"$type": "string"}} in keyset_predicate("lastLoginAt", (datetime(2025, 1, 1), doc_id))["$or"]
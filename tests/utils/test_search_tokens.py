@@ -0,0 +1,38 @@
+from utils.search_tokens import (
+    feedback_search_tokens,
+    name_tokens,
+    order_search_tokens,
+    plan_id_query,
+    plan_name_query,
+)
+
+
+def test_name_tokens_are_normalized_bigrams():
+    assert name_tokens("王 小明") == ["n:王小", "n:小明"]
+    assert name_tokens("Ａｂ") == ["n:ab"]
+    assert name_tokens("王") == []
+
+
+def test_order_tokens_cover_id_prefixes_and_customer_name():
+    tokens = order_search_tokens({"orderId": "ORD202610180001", "customer": {"name": "陳美玲"}})
+
+    assert "i:ord" in tokens
+    assert "i:ord202610180001" in tokens
+    assert "i:20261018" in tokens
+    assert "n:美玲" in tokens
+    assert "i:or" not in tokens
+
+
+def test_feedback_tokens_handle_missing_feedback_id():
+    assert feedback_search_tokens({"nickname": "阿明", "realName": None}) == ["n:阿明"]
+
+
+def test_query_planner_falls_back_to_regex_for_short_or_tail_fragments():
+    assert plan_id_query("ord2026") == ["i:ord2026"]
+    assert plan_id_query("20261018") == ["i:20261018"]
+    assert plan_id_query("0001") is None
+    assert plan_id_query("FB") is None
+    assert plan_id_query("fb2026") == ["i:fb2026"]
+    assert plan_id_query("abc123") is None
+    assert plan_name_query("小明") == ["n:小明"]
+    assert plan_name_query("明") is None
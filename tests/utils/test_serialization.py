@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from utils.serialization import format_taipei_fields, taipei_text, to_jsonable
+from utils.timezone import format_taipei
+
+
+def test_taipei_text_matches_format_taipei():
+    values = [
+        datetime(2026, 10, 18, 16, 30),
+        datetime(2026, 12, 31, 20, 0, tzinfo=timezone.utc),
+        datetime(2026, 1, 1, 7, 59, tzinfo=timezone(timedelta(hours=-5))),
+        datetime(1975, 6, 1, 12, 0),
+        "2026-01-01 10:00",
+        None,
+        "",
+    ]
+    for value in values:
+        for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+            assert taipei_text(value, fmt) == format_taipei(value, fmt)
+
+
+def test_format_taipei_fields_skips_empty_values():
+    doc = {"paidAt": datetime(2026, 10, 18, 16, 30), "shippedAt": None}
+
+    format_taipei_fields(doc, ("paidAt", "shippedAt", "reportedAt"))
+
+    assert doc == {"paidAt": "2026-10-19 00:30", "shippedAt": None}
+
+
+def test_to_jsonable_converts_nested_mongo_types():
+    oid = ObjectId()
+    created = datetime(2026, 10, 18, 16, 30)
+
+    result = to_jsonable({"_id": oid, "items": [{"at": created, "qty": 2}], "tags": ("a",), "price": 1.5})
+
+    assert result == {"_id": str(oid), "items": [{"at": created.isoformat(), "qty": 2}], "tags": ["a"], "price": 1.5}
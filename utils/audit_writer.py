@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedAuditWriter:
+    """操作日誌的背景批次寫入器；每個 gunicorn worker 各自一份。
+
+    write() 只把紀錄放進記憶體佇列，由背景執行緒在累積到 batch_size 筆或等待 flush_seconds 後以一次 insert_many 寫入。
+    佇列滿了（資料庫變慢或斷線）就改成當下同步寫入，不丟棄紀錄。
+    """
+
+    def __init__(self, write_many, batch_size=100, flush_seconds=2.0, max_pending=1000):
+        self._write_many = write_many
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = max(0.05, float(flush_seconds))
+        self.max_pending = max(self.batch_size, int(max_pending))
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._pending = []
+        self._writing = 0
+        self._thread = None
+        self._closed = False
+
+    def _ensure_started(self):
+        # gunicorn preload 後 fork 出來的 worker 不會繼承父程序的執行緒，要重新建立；父程序尚未寫入的紀錄由父程序自己負責。
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, entry):
+        with self._cond:
+            self._ensure_started()
+            if not self._closed and len(self._pending) < self.max_pending:
+                self._pending.append(entry)
+                if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                    self._cond.notify_all()
+                return True
+        logger.warning("Audit log buffer full; writing synchronously", extra={"event": "audit_log_buffer_full"})
+        self._write([entry])
+        return False
+
+    def _write(self, batch):
+        try:
+            self._write_many(batch)
+        except Exception:
+            logger.exception(
+                "Audit log write failed",
+                extra={"event": "audit_log_failed", "count": len(batch)},
+            )
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._closed:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.batch_size,
+                    timeout=self.flush_seconds,
+                )
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._writing += 1
+            return batch
+
+    def _finish_batch(self):
+        with self._cond:
+            self._writing -= 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                self._finish_batch()
+            with self._cond:
+                if self._closed and not self._pending:
+                    return
+
+    def flush(self, timeout=5.0):
+        """把佇列中的紀錄在呼叫端同步寫完，並等待背景執行緒手上的批次完成；回傳本次寫入筆數。"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return 0
+            pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            self._write(pending[start:start + self.batch_size])
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writing, timeout=timeout)
+        return len(pending)
+
+    def close(self, timeout=5.0):
+        """程序結束時呼叫：停止背景執行緒並寫完剩餘紀錄。"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return 0
+            self._closed = True
+            self._cond.notify_all()
+        return self.flush(timeout)
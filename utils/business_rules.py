@@ -1,21 +1,16 @@
-import os
-
-
-def _env_int(name, default):
-    try:
-        return int(os.environ.get(name, default))
-    except (TypeError, ValueError):
-        return default
+from utils.env import env_int
 
 
 SHOP_SHIPPING_FEES = {
-    "711": _env_int("SHOP_SHIPPING_711_FEE", 60),
-    "home": _env_int("SHOP_SHIPPING_HOME_FEE", 120),
+    "711": env_int("SHOP_SHIPPING_711_FEE", 60),
+    "home": env_int("SHOP_SHIPPING_HOME_FEE", 120),
 }
 
-ORDER_PAYMENT_DEADLINE_HOURS = _env_int("ORDER_PAYMENT_DEADLINE_HOURS", 2)
-UNPAID_ORDER_GRACE_HOURS = _env_int("UNPAID_ORDER_GRACE_HOURS", 76)
-SHIPPED_ORDER_RETENTION_DAYS = _env_int("SHIPPED_ORDER_RETENTION_DAYS", 14)
+ORDER_PAYMENT_DEADLINE_HOURS = env_int("ORDER_PAYMENT_DEADLINE_HOURS", 2)
+UNPAID_ORDER_GRACE_HOURS = env_int("UNPAID_ORDER_GRACE_HOURS", 76)
+SHIPPED_ORDER_RETENTION_DAYS = env_int("SHIPPED_ORDER_RETENTION_DAYS", 14)
+# 批次確認收款 / 批次出貨單次最多處理的訂單數
+BULK_ORDER_MAX_IDS = max(1, env_int("BULK_ORDER_MAX_IDS", 100))
 
 
 def get_shop_shipping_fee(shipping_method):
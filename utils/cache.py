@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """程序內 LRU + TTL 快取；每個 gunicorn worker 各自一份。"""
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= now:
+                self._items.pop(key, None)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = time.monotonic() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class RedisCache:
+    """跨 worker 共用的 Redis 快取；連線異常時視同 cache miss，不影響頁面輸出。"""
+
+    def __init__(self, client, prefix, ttl_seconds=300):
+        self._client = client
+        self.prefix = prefix
+        self.ttl_seconds = max(1, int(ttl_seconds))
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get(self, key):
+        try:
+            value = self._client.get(self._key(key))
+        except Exception:
+            logger.warning("Redis cache read failed", extra={"event": "cache_redis_read_failed", "target": self.prefix})
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl_seconds=None):
+        try:
+            self._client.setex(self._key(key), int(ttl_seconds or self.ttl_seconds), value)
+        except Exception:
+            logger.warning("Redis cache write failed", extra={"event": "cache_redis_write_failed", "target": self.prefix})
+
+    def delete(self, key):
+        try:
+            self._client.delete(self._key(key))
+        except Exception:
+            logger.warning("Redis cache delete failed", extra={"event": "cache_redis_delete_failed", "target": self.prefix})
+
+    def clear(self):
+        try:
+            for key in self._client.scan_iter(match=f"{self.prefix}:*", count=500):
+                self._client.delete(key)
+        except Exception:
+            logger.warning("Redis cache clear failed", extra={"event": "cache_redis_clear_failed", "target": self.prefix})
+
+
+def build_cache_backend(prefix, backend=None, redis_url=None, max_entries=256, ttl_seconds=300):
+    """依設定建立快取後端；要求 redis 但無法使用時退回本地快取。"""
+    backend = (backend or "local").lower()
+    if backend == "redis":
+        redis_url = redis_url or os.environ.get("REDIS_URL")
+        if redis_url:
+            try:
+                import redis
+
+                client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                return RedisCache(client, prefix, ttl_seconds)
+            except Exception:
+                logger.exception("Redis cache unavailable", extra={"event": "cache_redis_unavailable", "target": prefix})
+        else:
+            logger.warning("Redis cache requested without REDIS_URL", extra={"event": "cache_redis_missing_url", "target": prefix})
+    return LocalCache(max_entries, ttl_seconds)
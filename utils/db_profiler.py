@@ -0,0 +1,121 @@
+import os
+import threading
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+
+_current_profile = ContextVar("db_request_profile", default=None)
+
+
+def profiling_enabled():
+    value = os.environ.get("DB_PROFILING_ENABLED")
+    if value is None:
+        return True
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class RequestDbProfile:
+    """單一請求內的 MongoDB 指令統計：次數、總耗時與最慢的一筆。"""
+
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_command", "slowest_collection")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_command = None
+        self.slowest_collection = None
+
+    def record(self, command_name, collection, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms >= self.slowest_ms:
+            self.slowest_ms = duration_ms
+            self.slowest_command = command_name
+            self.slowest_collection = collection
+
+    @property
+    def slowest_label(self):
+        if not self.slowest_command:
+            return ""
+        if self.slowest_collection:
+            return f"{self.slowest_collection}.{self.slowest_command}"
+        return self.slowest_command
+
+    def server_timing(self):
+        entries = [f'db;dur={self.total_ms:.1f};desc="{self.count} queries"']
+        if self.slowest_command:
+            entries.append(f'db-slowest;dur={self.slowest_ms:.1f};desc="{self.slowest_label}"')
+        return ", ".join(entries)
+
+    def log_fields(self):
+        return {
+            "db_count": self.count,
+            "db_ms": round(self.total_ms, 1),
+            "db_slowest": self.slowest_label,
+            "db_slowest_ms": round(self.slowest_ms, 1),
+        }
+
+
+def _command_collection(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else None
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """把 pymongo 指令事件累計到目前請求的 profile；沒有進行中的請求時直接略過。
+
+    pymongo 同步驅動在發出指令的執行緒上呼叫 listener，因此可以用 ContextVar 找到所屬請求。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if _current_profile.get() is None:
+            return
+        collection = _command_collection(event.command_name, event.command)
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._pending.pop(self._key(event), None)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(event.command_name, collection, event.duration_micros / 1000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+
+command_listener = RequestCommandListener()
+
+
+def mongo_event_listeners():
+    return [command_listener] if profiling_enabled() else []
+
+
+def start_request_profile():
+    return _current_profile.set(RequestDbProfile())
+
+
+def current_request_profile():
+    return _current_profile.get()
+
+
+def finish_request_profile(token):
+    profile = _current_profile.get()
+    _current_profile.reset(token)
+    return profile
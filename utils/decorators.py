@@ -14,6 +14,14 @@ def login_required(f):
     return decorated_function
 
 
+def current_admin_permissions():
+    """取得目前管理員的權限陣列；舊 session 只有 role 字串時轉為陣列。"""
+    permissions = session.get('admin_permissions', [])
+    if not permissions:
+        permissions = [session.get('admin_role', 'super_admin')]
+    return permissions
+
+
 def admin_required(roles=None):
     """RBAC 角色權限裝飾器 — 支援陣列式權限。
     roles: 允許存取的權限列表，例如 ['super_admin', 'finance']。
@@ -27,13 +35,7 @@ def admin_required(roles=None):
                     return jsonify({"error": "未授權，請先登入"}), 403
                 return redirect(url_for('auth.admin_page'))
 
-            # 取得使用者權限陣列
-            permissions = session.get('admin_permissions', [])
-
-            # 向下相容：若 session 只有 role (字串)，轉為陣列
-            if not permissions:
-                legacy_role = session.get('admin_role', 'super_admin')
-                permissions = [legacy_role]
+            permissions = current_admin_permissions()
 
             # super_admin 繞過所有檢查
             if 'super_admin' in permissions:
@@ -1,13 +1,16 @@
-import os 
+import atexit
+import os
 import json
 import logging
 import smtplib
 import threading
+import time
 import urllib.request
 import urllib.error
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from utils.env import env_int
 from utils.helpers import get_tw_now
 from utils.task_queue import celery_app, queue_available
 
@@ -16,65 +19,263 @@ logger = logging.getLogger(__name__)
 
 
 # =========================================
-# 寄信核心功能 (SendGrid API)
+# 寄信核心功能 (SMTP 連線池)
 # =========================================
 
-def send_email_task(to_email, subject, body, is_html, **kwargs):
+def _smtp_settings():
     # 從環境變數讀取 Namecheap SMTP 設定
-    mail_server = os.environ.get('MAIL_SERVER', 'mail.privateemail.com')
-    mail_port = int(os.environ.get('MAIL_PORT', 465))
-    mail_sender = os.environ.get('MAIL_USERNAME')
-    mail_password = os.environ.get('MAIL_PASSWORD')
-
-    if not mail_sender or not mail_password:
-        logger.warning(
-            "SMTP credentials are not configured",
-            extra={"event": "email_missing_credentials", "target": to_email},
-        )
-        return False
+    mail_port = env_int('MAIL_PORT', 465)
+    starttls_default = '0' if mail_port == 465 else '1'
+    return {
+        "server": os.environ.get('MAIL_SERVER', 'mail.privateemail.com'),
+        "port": mail_port,
+        "username": os.environ.get('MAIL_USERNAME'),
+        "password": os.environ.get('MAIL_PASSWORD'),
+        "starttls": os.environ.get('MAIL_STARTTLS', starttls_default).lower() in ('1', 'true', 'yes', 'on'),
+        "timeout": env_int('MAIL_TIMEOUT_SECONDS', 20),
+    }
+
 
+def _build_message(mail_sender, to_email, subject, body, is_html):
     msg = MIMEMultipart()
     msg['From'] = mail_sender
     msg['To'] = to_email
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'html' if is_html else 'plain', 'utf-8'))
+    return msg
+
+
+class _DeliveryUncertain(Exception):
+    """DATA 已送出後連線中斷，無法得知伺服器是否已收下這封信。"""
+
 
-    server = None
+def _reset(server):
     try:
-        if mail_port == 465:
-            server = smtplib.SMTP_SSL(mail_server, mail_port)
+        server.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def _transmit(server, sender, to_email, msg):
+    """等同 server.send_message，但把 DATA 之前與之後的失敗分開；DATA 階段的斷線改拋 _DeliveryUncertain。"""
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(sender)
+    if code != 250:
+        _reset(server)
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+    code, resp = server.rcpt(to_email)
+    if code not in (250, 251):
+        _reset(server)
+        raise smtplib.SMTPRecipientsRefused({to_email: (code, resp)})
+    payload = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+    try:
+        code, resp = server.data(payload)
+    except (smtplib.SMTPServerDisconnected, OSError) as exc:
+        raise _DeliveryUncertain(str(exc)) from exc
+    if code != 250:
+        _reset(server)
+        raise smtplib.SMTPDataError(code, resp)
+
+
+class _PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """同一個 worker 程序內重複使用已登入的 SMTP 連線，省去每封信的 TLS 握手與登入。
+
+    閒置超過 health_check_seconds 的連線在使用前先 NOOP 確認；斷線就丟棄重連。
+    """
+
+    def __init__(self, settings_loader=_smtp_settings, max_idle=2, health_check_seconds=30,
+                 max_messages_per_connection=100, connection_factory=None):
+        self._settings_loader = settings_loader
+        self.max_idle = max(0, int(max_idle))
+        self.health_check_seconds = max(0, int(health_check_seconds))
+        self.max_messages_per_connection = max(1, int(max_messages_per_connection))
+        self._connection_factory = connection_factory or self._open_server
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+        self.connections_opened = 0
+
+    @staticmethod
+    def _open_server(settings):
+        if settings["port"] == 465 and not settings["starttls"]:
+            server = smtplib.SMTP_SSL(settings["server"], settings["port"], timeout=settings["timeout"])
         else:
-            server = smtplib.SMTP(mail_server, mail_port)
-            server.starttls()
-            
-        server.login(mail_sender, mail_password)
-        server.send_message(msg)
-        logger.info(
-            "Email sent",
-            extra={"event": "email_sent", "target": to_email},
-        )
-        return True
-    except Exception:
-        logger.exception(
-            "SMTP email send failed",
-            extra={"event": "email_send_failed", "target": to_email},
-        )
-        return False
-        
-    finally:
-        if server:
+            server = smtplib.SMTP(settings["server"], settings["port"], timeout=settings["timeout"])
+            if settings["starttls"]:
+                server.starttls()
+        server.login(settings["username"], settings["password"])
+        return server
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.server.quit()
+        except Exception:
             try:
-                server.quit()
+                connection.server.close()
             except Exception:
                 pass
 
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            return connection.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self, settings):
+        with self._lock:
+            if self._pid != os.getpid():
+                # prefork 之後父程序的 socket 不可共用，直接放掉重建。
+                self._idle = []
+                self._pid = os.getpid()
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is not None:
+            idle_for = time.monotonic() - connection.last_used
+            if idle_for < self.health_check_seconds or self._is_healthy(connection):
+                return connection
+            self._close(connection)
+
+        connection = _PooledConnection(self._connection_factory(settings))
+        self.connections_opened += 1
+        return connection
+
+    def _release(self, connection):
+        connection.last_used = time.monotonic()
+        if connection.sent >= self.max_messages_per_connection:
+            self._close(connection)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle and self._pid == os.getpid():
+                self._idle.append(connection)
+                return
+        self._close(connection)
+
+    def _send_one(self, connection, settings, message):
+        """寄出單封信，回傳 (ok, connection)。
+
+        只有 DATA 之前（MAIL/RCPT 階段）的連線錯誤才換新連線重試一次；DATA 已送出後斷線，
+        伺服器可能已收下這封信，重送會讓收件者收到兩封，因此記錄後直接放棄這條連線。
+        """
+        to_email = message["to_email"]
+        msg = _build_message(settings["username"], to_email, message["subject"], message["body"], message.get("is_html", False))
+        for attempt in range(2):
+            try:
+                _transmit(connection.server, settings["username"], to_email, msg)
+                connection.sent += 1
+                logger.info("Email sent", extra={"event": "email_sent", "target": to_email})
+                return True, connection
+            except _DeliveryUncertain:
+                self._close(connection)
+                logger.exception("SMTP connection lost after DATA", extra={"event": "email_delivery_uncertain", "target": to_email})
+                return False, None
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPHeloError, OSError):
+                self._close(connection)
+                if attempt:
+                    raise
+                connection = _PooledConnection(self._connection_factory(settings))
+                self.connections_opened += 1
+            except smtplib.SMTPException:
+                # 收件者被拒等單封錯誤，連線本身仍可繼續使用。
+                logger.exception("SMTP email send failed", extra={"event": "email_send_failed", "target": to_email})
+                return False, connection
+        return False, connection
+
+    def send_many(self, messages):
+        """以同一個 SMTP session 依序寄出多封信，回傳每封是否成功。"""
+        settings = self._settings_loader()
+        if not settings["username"] or not settings["password"]:
+            logger.warning(
+                "SMTP credentials are not configured",
+                extra={"event": "email_missing_credentials", "count": len(messages)},
+            )
+            return [False] * len(messages)
+
+        results = []
+        connection = None
+        try:
+            for message in messages:
+                if not message.get("to_email"):
+                    results.append(False)
+                    continue
+                if connection is None:
+                    connection = self._acquire(settings)
+                try:
+                    ok, connection = self._send_one(connection, settings, message)
+                except Exception:
+                    logger.exception(
+                        "SMTP email send failed",
+                        extra={"event": "email_send_failed", "target": message.get("to_email")},
+                    )
+                    connection = None
+                    ok = False
+                results.append(ok)
+                if connection is not None and connection.sent >= self.max_messages_per_connection:
+                    self._close(connection)
+                    connection = None
+        except Exception:
+            logger.exception("SMTP connection failed", extra={"event": "email_connection_failed"})
+            results.extend([False] * (len(messages) - len(results)))
+            connection = None
+        finally:
+            if connection is not None:
+                self._release(connection)
+        return results
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+
+smtp_pool = SMTPConnectionPool(
+    max_idle=env_int('MAIL_POOL_SIZE', 2),
+    health_check_seconds=env_int('MAIL_HEALTH_CHECK_SECONDS', 30),
+    max_messages_per_connection=env_int('MAIL_MAX_MESSAGES_PER_CONNECTION', 100),
+)
+atexit.register(smtp_pool.close_all)
+
+
+def send_email_task(to_email, subject, body, is_html, **kwargs):
+    return smtp_pool.send_many([{
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "is_html": is_html,
+    }])[0]
+
+
+def send_email_batch(messages):
+    """messages 為 {to_email, subject, body, is_html} 清單，共用一個 SMTP session 寄出。"""
+    results = smtp_pool.send_many(messages)
+    logger.info(
+        "Email batch finished",
+        extra={"event": "email_batch_sent", "count": sum(1 for ok in results if ok)},
+    )
+    return results
+
 
 if celery_app is not None:
     @celery_app.task(name="email.send")
     def send_email_task_queued(to_email, subject, body, is_html=False):
         return send_email_task(to_email, subject, body, is_html)
+
+
+    @celery_app.task(name="email.send_batch")
+    def send_email_batch_queued(messages):
+        return send_email_batch(messages)
 else:
     send_email_task_queued = None
+    send_email_batch_queued = None
 
 
 def send_email(to_email, subject, body, sendgrid_api_key=None, mail_sender=None, is_html=False):
@@ -102,6 +303,27 @@ def send_email(to_email, subject, body, sendgrid_api_key=None, mail_sender=None,
         daemon=True
     )
     thread.start()
+
+
+def send_emails(messages):
+    """多封信合併成一個 batch task；佇列不可用時在背景執行緒共用同一個 session 寄出。"""
+    messages = [message for message in messages if message.get("to_email")]
+    if not messages:
+        return
+
+    if queue_available() and send_email_batch_queued is not None:
+        try:
+            send_email_batch_queued.delay(messages)
+            logger.info("Email batch queued", extra={"event": "email_batch_queued", "count": len(messages)})
+            return
+        except Exception:
+            logger.exception(
+                "Email batch queue failed; falling back to local background thread",
+                extra={"event": "email_queue_failed", "count": len(messages)},
+            )
+
+    thread = threading.Thread(target=send_email_batch, args=(messages,), daemon=True)
+    thread.start()
 # =========================================
 # 銀行資訊（從 DB 讀取）
 # =========================================
@@ -0,0 +1,9 @@
+import os
+
+
+def env_int(name, default):
+    """讀取整數環境變數；未設定或格式錯誤時回傳 default。"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
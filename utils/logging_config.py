@@ -25,6 +25,11 @@ class JsonFormatter(logging.Formatter):
             "target",
             "action",
             "task",
+            "count",
+            "db_count",
+            "db_ms",
+            "db_slowest",
+            "db_slowest_ms",
         ):
             if hasattr(record, key):
                 payload[key] = getattr(record, key)
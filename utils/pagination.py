@@ -1,4 +1,13 @@
+import base64
+import binascii
+import json
 from dataclasses import dataclass
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from utils.errors import ValidationError
 
 
 @dataclass(frozen=True)
@@ -37,3 +46,59 @@ def page_response(results, total, pagination):
         "has_next": pagination.page < pages,
         "has_prev": pagination.page > 1,
     }
+
+
+def keyset_predicate(field, after):
+    """(field, _id) 由新到舊的 keyset 條件；after 為 decode_cursor 的結果。
+
+    依 MongoDB 跨型別排序，由新到舊依序是日期、舊資料的字串、沒有值；$lt 只比較同型別的值，所以每種型別各自一段條件。
+    """
+    sort_value, last_id = after
+    if sort_value is None:
+        return {field: None, "_id": {"$lt": last_id}}
+    if isinstance(sort_value, str):
+        return {"$or": [
+            {field: {"$type": "string", "$lt": sort_value}},
+            {field: sort_value, "_id": {"$lt": last_id}},
+            {field: None},
+        ]}
+    return {"$or": [
+        {field: {"$lt": sort_value}},
+        {field: sort_value, "_id": {"$lt": last_id}},
+        {field: {"$type": "string"}},
+        {field: None},
+    ]}
+
+
+def encode_cursor(sort_value, doc_id):
+    """將 (排序欄位, _id) 編成不透明字串；前端只需原樣帶回。
+
+    排序欄位連同型別一起編碼（日期、字串，其餘視為 null），舊資料存成字串的值也能接續分頁。
+    """
+    if isinstance(sort_value, datetime):
+        payload = {"t": "date", "v": sort_value.isoformat()}
+    elif isinstance(sort_value, str):
+        payload = {"t": "string", "v": sort_value}
+    else:
+        payload = {"v": None}
+    payload["id"] = str(doc_id)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """解回 (排序欄位, ObjectId)；格式不符一律視為無效 cursor。"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort_value = payload.get("v")
+        # 沒有 "t" 的是舊版 cursor，當時只會編入日期
+        sort_type = payload.get("t", "date")
+        if sort_value is not None:
+            if sort_type == "date":
+                sort_value = datetime.fromisoformat(sort_value)
+            elif sort_type != "string" or not isinstance(sort_value, str):
+                raise ValueError("unknown cursor type")
+        return sort_value, ObjectId(payload["id"])
+    except (AttributeError, KeyError, TypeError, ValueError, InvalidId, binascii.Error, UnicodeError):
+        raise ValidationError("Invalid cursor")
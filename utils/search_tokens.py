@@ -0,0 +1,95 @@
+import re
+import unicodedata
+
+
+# searchTokens 內以前綴區分來源，名字與單號共用同一個 multikey 索引。
+NAME_TOKEN_PREFIX = "n:"
+ID_TOKEN_PREFIX = "i:"
+# 單號前綴至少 3 碼才建 token（"FB"、"OR" 這種前綴命中率太高，交給 regex 也不會更慢）。
+MIN_ID_PREFIX = 3
+MAX_SEARCH_SOURCE_LENGTH = 40
+# job_state 中記錄 scripts/backfill_search_tokens.py 已跑完；在那之前歷史查詢維持 regex 比對。
+SEARCH_TOKENS_BACKFILL_JOB = "search_tokens_backfill"
+# 系統產生的單號字頭（services/sequence_service.py），正規化後比對；其他英文開頭仍用 regex 包含比對。
+KNOWN_ID_PREFIXES = frozenset({"ord", "don", "fnd", "com", "fb"})
+
+_WHITESPACE = re.compile(r"\s+")
+_ID_LETTERS = re.compile(r"^[a-z]+")
+_ID_DATE_PREFIX = re.compile(r"^20\d{6}")
+
+
+def normalize_search_text(value):
+    """NFKC 全半形統一、不分大小寫、去除空白；寫入與查詢兩端都用同一套規則。"""
+    if not isinstance(value, str):
+        return ""
+    text = unicodedata.normalize("NFKC", value).casefold()
+    return _WHITESPACE.sub("", text)[:MAX_SEARCH_SOURCE_LENGTH]
+
+
+def _bigrams(text):
+    return [text[index:index + 2] for index in range(len(text) - 1)]
+
+
+def name_tokens(*values):
+    """中文姓名切成相鄰雙字（bigram）；單一字元的名字不產生 token。"""
+    tokens = []
+    for value in values:
+        for gram in _bigrams(normalize_search_text(value)):
+            token = NAME_TOKEN_PREFIX + gram
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def id_tokens(value):
+    """單號前綴 token：完整單號與去掉英文字頭的數字部分各自建前綴，支援輸入 ORD2026… 或 20261018…。"""
+    text = normalize_search_text(value)
+    sources = [text]
+    digits = _ID_LETTERS.sub("", text)
+    if digits and digits != text:
+        sources.append(digits)
+
+    tokens = []
+    for source in sources:
+        for end in range(MIN_ID_PREFIX, len(source) + 1):
+            token = ID_TOKEN_PREFIX + source[:end]
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def order_search_tokens(order):
+    customer = order.get("customer")
+    if not isinstance(customer, dict):
+        customer = {}
+    return id_tokens(order.get("orderId")) + name_tokens(customer.get("name"))
+
+
+def feedback_search_tokens(feedback):
+    return id_tokens(feedback.get("feedbackId")) + name_tokens(feedback.get("nickname"), feedback.get("realName"))
+
+
+def plan_id_query(value):
+    """單號查詢可用 token 時回傳 [token]，否則回傳 None 由呼叫端改用 regex。
+
+    以已知字頭（ORD/DON/FND/COM/FB）開頭視為完整單號前綴；純數字須含完整日期（YYYYMMDD）才視為前綴，
+    較短的數字多半是流水號尾碼、其他英文開頭也可能是單號中段，維持原本的包含比對。
+    """
+    text = normalize_search_text(value)
+    if len(text) < MIN_ID_PREFIX:
+        return None
+    letters = _ID_LETTERS.match(text)
+    if letters:
+        return [ID_TOKEN_PREFIX + text] if letters.group() in KNOWN_ID_PREFIXES else None
+    if _ID_DATE_PREFIX.match(text):
+        return [ID_TOKEN_PREFIX + text]
+    return None
+
+
+def plan_name_query(value):
+    """姓名查詢轉成 bigram token；只有一個字時回傳 None。
+
+    bigram 全部命中不代表字串相連，呼叫端仍需保留 regex 做最後確認，但只會套用在索引篩出的候選上。
+    """
+    tokens = name_tokens(value)
+    return tokens or None
@@ -0,0 +1,113 @@
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from utils.timezone import API_DATE_FORMAT, API_DATETIME_FORMAT, UTC, format_taipei
+
+
+# 台北自 1980 年起固定 UTC+8、沒有日光節約；這段期間直接加位移，不必每次查時區規則。
+TAIPEI_OFFSET = timedelta(hours=8)
+TAIPEI_FIXED_OFFSET_SINCE = datetime(1980, 1, 1)
+_ZERO = timedelta(0)
+
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _format_minutes(value):
+    return f"{value.year:04d}-{value.month:02d}-{value.day:02d} {value.hour:02d}:{value.minute:02d}"
+
+
+def _format_day(value):
+    return f"{value.year:04d}-{value.month:02d}-{value.day:02d}"
+
+
+# 最常用的兩種格式直接組字串，比 strftime 快；其他格式仍用 strftime。
+_FAST_FORMATTERS = {
+    API_DATETIME_FORMAT: _format_minutes,
+    API_DATE_FORMAT: _format_day,
+}
+
+
+def taipei_text(value, fmt=API_DATETIME_FORMAT):
+    """format_taipei 的快速版本：MongoDB 取出的 UTC datetime 直接加 8 小時格式化，其餘交回 format_taipei。"""
+    if type(value) is datetime:
+        tzinfo = value.tzinfo
+        if tzinfo is None:
+            naive = value
+        elif tzinfo is UTC or tzinfo.utcoffset(value) == _ZERO:
+            naive = value.replace(tzinfo=None)
+        else:
+            naive = value.astimezone(UTC).replace(tzinfo=None)
+        if naive >= TAIPEI_FIXED_OFFSET_SINCE:
+            local = naive + TAIPEI_OFFSET
+            formatter = _FAST_FORMATTERS.get(fmt)
+            return formatter(local) if formatter else local.strftime(fmt)
+    return format_taipei(value, fmt)
+
+
+def format_taipei_fields(doc, fields, fmt=API_DATETIME_FORMAT):
+    """有值的欄位就地轉成台北時間字串；空值保持原樣。"""
+    for field in fields:
+        value = doc.get(field)
+        if value:
+            doc[field] = taipei_text(value, fmt)
+    return doc
+
+
+# 文件內非 JSON 原生型別的轉換；以 type() 直接查表，不跑 isinstance 串列。
+DOCUMENT_ENCODERS = {
+    ObjectId: str,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal128: str,
+}
+
+
+def _encode_fallback(value, encoders):
+    """子類別（如 SON、bson Int64）查不到表時才走 isinstance；仍無法辨識就轉字串。"""
+    if isinstance(value, dict):
+        return {key: to_jsonable(item, encoders) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item, encoders) for item in value]
+    if isinstance(value, (str, int, float)):
+        return value
+    for value_type, encoder in encoders.items():
+        if isinstance(value, value_type):
+            return encoder(value)
+    return str(value)
+
+
+def to_jsonable(value, encoders=DOCUMENT_ENCODERS):
+    """單次走訪把 MongoDB 文件轉成可 JSON 化的結構；ObjectId 轉字串、datetime 轉 ISO 格式。"""
+    value_type = type(value)
+    if value_type in _PRIMITIVE_TYPES:
+        return value
+    if value_type is dict:
+        return {key: to_jsonable(item, encoders) for key, item in value.items()}
+    if value_type is list:
+        return [to_jsonable(item, encoders) for item in value]
+    encoder = encoders.get(value_type)
+    if encoder is not None:
+        return encoder(value)
+    return _encode_fallback(value, encoders)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider：直接輸出 ObjectId / Decimal128；datetime 維持 Flask 預設的 HTTP date 格式。"""
+
+    ENCODERS = {
+        ObjectId: str,
+        Decimal128: str,
+        datetime: http_date,
+        date: http_date,
+    }
+
+    @staticmethod
+    def default(o):
+        encoder = MongoJSONProvider.ENCODERS.get(type(o))
+        if encoder is not None:
+            return encoder(o)
+        return DefaultJSONProvider.default(o)
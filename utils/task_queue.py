@@ -1,6 +1,8 @@
 import logging
 import os
 
+from utils.env import env_int
+
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +28,7 @@ if Celery is not None and broker_url:
         "chentien_temple",
         broker=broker_url,
         backend=result_backend,
-        include=["utils.email", "tasks.notifications"],
+        include=["utils.email", "tasks.notifications", "tasks.exports", "tasks.maintenance"],
     )
     celery_app.conf.update(
         accept_content=["json"],
@@ -36,6 +38,27 @@ if Celery is not None and broker_url:
         enable_utc=True,
         task_ignore_result=True,
     )
+    # 以 `celery -A celery_app beat` 啟動排程；間隔設為 0 可關閉對應排程。
+    beat_schedule = {}
+    cleanup_interval_minutes = env_int("CLEANUP_UNPAID_INTERVAL_MINUTES", 30)
+    if cleanup_interval_minutes > 0:
+        beat_schedule["cleanup-unpaid-orders"] = {
+            "task": "maintenance.cleanup_unpaid_orders",
+            "schedule": cleanup_interval_minutes * 60,
+        }
+    fund_reconcile_minutes = env_int("FUND_RECONCILE_INTERVAL_MINUTES", 60)
+    if fund_reconcile_minutes > 0:
+        beat_schedule["reconcile-fund-total"] = {
+            "task": "maintenance.reconcile_fund_total",
+            "schedule": fund_reconcile_minutes * 60,
+        }
+    finance_rollup_minutes = env_int("FINANCE_ROLLUP_INTERVAL_MINUTES", 10)
+    if finance_rollup_minutes > 0:
+        beat_schedule["refresh-finance-rollups"] = {
+            "task": "maintenance.refresh_finance_rollups",
+            "schedule": finance_rollup_minutes * 60,
+        }
+    celery_app.conf.beat_schedule = beat_schedule
 elif broker_url and Celery is None:
     logger.warning(
         "CELERY_BROKER_URL is configured but celery is not installed",